@@ -1,5 +1,5 @@
 from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
@@ -9,6 +9,7 @@ from app.db.session import get_db
 from app.core.config import settings
 from app.models.user import User
 from app.api.schemas.user import TokenPayload
+from app.llm_services.common import LLMQuotaExceeded, bind_usage, check_quota
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
@@ -43,4 +44,19 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
     """
     获取当前活跃用户
     """
-    return current_user 
\ No newline at end of file
+    return current_user
+
+async def get_llm_user(request: Request, current_user: User = Depends(get_current_active_user)) -> User:
+    """
+    调用LLM的接口使用的当前用户：检查当日LLM用量配额，并将本请求的LLM用量记到该用户和接口
+    """
+    try:
+        await check_quota(current_user.id)
+    except LLMQuotaExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=e.message,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    bind_usage(current_user.id, request.scope["route"].path)
+    return current_user
@@ -1,7 +1,7 @@
 import shutil
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
 from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_active_user
+from app.api.deps import get_db, get_llm_user
 from app.api.schemas.image import ImageProcessingResponse
 from app.models.user import User
 from app.services import image as image_service
@@ -13,7 +13,7 @@ router = APIRouter()
 async def process_image(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_llm_user)
 ):
     """
     处理错题图像并提取文本
@@ -94,7 +94,7 @@ async def process_image(
 async def process_answer_image(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_llm_user)
 ):
     """
     处理错题图像并提取答案文本
@@ -3,16 +3,20 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from app.db.session import get_db
 from app.services import knowledge as knowledge_service
-from app.api.deps import get_current_user, get_current_active_user
+from app.services import solving as solving_service
+from app.services import knowledge_autocomplete
+from app.api.deps import get_current_user, get_current_active_user, get_llm_user
 from app.api.schemas.knowledge import (
     KnowledgePoint,
     KnowledgePointCreate,
     KnowledgePointSearch,
+    KnowledgePointSuggestion,
     KnowledgeStructure,
     MarkCreate,
     Mark,
     KnowledgeAnalyzeRequest,
     KnowledgeAnalyzeResponse,
+    KnowledgeAnalyzeRetrieveResponse,
     KnowledgeCategory,
     KnowledgeExtractRequest,
     KnowledgeExtractResponse,
@@ -54,7 +58,7 @@ async def search_knowledge_points(
     chapter: Optional[str] = Query(None, description="章节"),
     section: Optional[str] = Query(None, description="小节"),
     item: Optional[str] = Query(None, description="知识点名称（支持模糊搜索）"),
-    sort_by: Optional[str] = Query(None, description="排序字段，例如：mark_count, created_at"),
+    sort_by: Optional[str] = Query(None, description="排序字段，例如：mark_count, created_at；未指定且提供item时按名称相似度排序"),
     skip: int = Query(0, description="跳过的记录数"),
     limit: int = Query(100, description="返回的最大记录数"),
     db: Session = Depends(get_db),
@@ -72,6 +76,19 @@ async def search_knowledge_points(
     }
     return knowledge_service.get_knowledge_points_by_params(db, params, skip, limit)
 
+@router.get("/autocomplete", response_model=List[KnowledgePointSuggestion])
+async def autocomplete_knowledge_points(
+    prefix: str = Query(..., min_length=1, max_length=100, description="已输入的知识点名称前缀"),
+    limit: int = Query(10, ge=1, le=50, description="返回的最大记录数"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    按名称前缀补全知识点，按标记次数降序排列
+
+    由进程内的前缀索引返回，不查询知识点表，适合输入时逐键调用
+    """
+    return await knowledge_autocomplete.autocomplete_items(prefix, limit)
+
 @router.get("/popular", response_model=List[KnowledgePoint])
 async def get_popular_knowledge_points(
     limit: int = Query(10, description="返回的记录数"),
@@ -202,16 +219,23 @@ async def create_knowledge_point(
         )
 
     # 创建知识点
-    return knowledge_service.create_knowledge_point(
+    knowledge_point = knowledge_service.create_knowledge_point(
         db=db,
         knowledge_point_data=knowledge_point_data.model_dump()
     )
 
+    # 在后台为新出现的知识点类别计算向量
+    knowledge_service.index_categories(
+        [(knowledge_point.subject, knowledge_point.chapter, knowledge_point.section)]
+    )
+
+    return knowledge_point
+
 @router.post("/analyze-from-question", response_model=KnowledgeAnalyzeResponse)
 async def analyze_knowledge_from_question(
     request: KnowledgeAnalyzeRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_llm_user)
 ):
     """
     分析题目文本，返回可能的知识点类别
@@ -223,41 +247,52 @@ async def analyze_knowledge_from_question(
 
 
     """
-    # 获取所有知识点类别的CSV格式
-    categories_csv = knowledge_service.get_all_categories_csv(db)
-
-    # 创建知识点检索器
-    retriever = LLMKnowledgeRetriever()
+    # 本地分类器高置信度命中时直接返回，否则经向量索引预筛选候选类别后调用检索LLM
+    categories = await knowledge_service.analyze_question_categories(db, request.question_text)
 
-    # 分析题目
-    categories_data = await retriever.analyze_knowledge_category(
-        question_text=request.question_text,
-        categories_csv=categories_csv
+    return KnowledgeAnalyzeResponse(
+        categories=[
+            KnowledgeCategory(subject=subject, chapter=chapter, section=section)
+            for subject, chapter, section in categories
+        ]
     )
 
-    # 转换为响应格式
-    categories = [
-        KnowledgeCategory(
-            subject=cat["subject"],
-            chapter=cat["chapter"],
-            section=cat["section"]
-        )
-        for cat in categories_data
-    ]
-
-    return KnowledgeAnalyzeResponse(
-        categories=categories,
+@router.post("/analyze-and-retrieve", response_model=KnowledgeAnalyzeRetrieveResponse)
+async def analyze_and_retrieve_knowledge_points(
+    request: KnowledgeAnalyzeRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_llm_user)
+):
+    """
+    分析题目文本得到知识点类别，并一次性返回这些类别下的全部知识点
+    替代 analyze-from-question 之后对每个类别逐一调用 /structure 的流程
+    参数：
+        question_text: 题目文本
 
+    返回：
+        categories: 知识点类别的列表
+        knowledge_points: 所有类别下的知识点，按标记次数降序
+    """
+    categories = await knowledge_service.analyze_question_categories(db, request.question_text)
+    knowledge_points = knowledge_service.get_knowledge_points_by_categories(db, categories)
+
+    return KnowledgeAnalyzeRetrieveResponse(
+        categories=[
+            KnowledgeCategory(subject=subject, chapter=chapter, section=section)
+            for subject, chapter, section in categories
+        ],
+        knowledge_points=knowledge_points
     )
 
 @router.post("/extract-from-solution", response_model=KnowledgeExtractResponse)
 async def extract_knowledge_from_solution(
     request: KnowledgeExtractRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_llm_user)
 ):
     """
     从解题过程中提取使用的知识点，区分"已有知识点"和"新知识点"
+    如果该解题过程由合并模式的解题接口生成，则直接返回解题时输出的知识点，不再调用LLM
     参数：
         question_text: 题目文本
         solution_text: 解题过程文本
@@ -267,41 +302,48 @@ async def extract_knowledge_from_solution(
         existing_knowledge_points: 已存在的知识点列表
         new_knowledge_points: 新识别的知识点列表
     """
-    # 初始化知识点提取器
-    extractor = KnowledgeExtractor()
-
-    # 获取可能用到的知识点
-    existing_knowledge_points = []
-    if request.existing_knowledge_point_ids:
-        # 获取已有知识点详情
-        for kp_id in request.existing_knowledge_point_ids:
-            kp = knowledge_service.get_knowledge_point_by_id(db, kp_id)
-            if kp:
-                existing_knowledge_points.append({
-                    "id": kp.id,
-                    "subject": kp.subject,
-                    "chapter": kp.chapter,
-                    "section": kp.section,
-                    "item": kp.item,
-                    "details": kp.details
-                })
-
-    # 从解题过程提取知识点，等待异步方法完成
-    used_existing_points, new_points = await extractor.extract_knowledge_points_from_solution(
-        question_text=request.question_text,
-        solution_text=request.solution_text,
-        existing_knowledge_points=existing_knowledge_points
-    )
-
+    # 合并模式下解题步骤已输出用到的知识点，直接复用，无需再次调用LLM
+    stored = await solving_service.get_solution_knowledge(request.question_text, request.solution_text)
+    if stored is not None:
+        used_ids = stored["used_knowledge_point_ids"]
+        if request.existing_knowledge_point_ids:
+            candidate_ids = set(request.existing_knowledge_point_ids)
+            used_ids = [kp_id for kp_id in used_ids if kp_id in candidate_ids]
+        used_existing_knowledge_points = knowledge_service.get_knowledge_points_by_ids(db, used_ids)
+        new_points = stored["new_knowledge_points"]
+    else:
+        # 初始化知识点提取器
+        extractor = KnowledgeExtractor()
+
+        # 一次查询获取全部候选知识点，LLM判定用到的知识点直接从中取出，不再逐个查询
+        candidate_ids = list(dict.fromkeys(request.existing_knowledge_point_ids or []))
+        candidates = {
+            kp.id: kp for kp in knowledge_service.get_knowledge_points_by_ids(db, candidate_ids)
+        }
+        existing_knowledge_points = [
+            {
+                "id": kp.id,
+                "subject": kp.subject,
+                "chapter": kp.chapter,
+                "section": kp.section,
+                "item": kp.item,
+                "details": kp.details
+            }
+            for kp in (candidates.get(kp_id) for kp_id in candidate_ids)
+            if kp is not None
+        ]
+
+        # 从解题过程提取知识点，等待异步方法完成
+        used_existing_points, new_points = await extractor.extract_knowledge_points_from_solution(
+            question_text=request.question_text,
+            solution_text=request.solution_text,
+            existing_knowledge_points=existing_knowledge_points
+        )
 
-    # 获取已使用的知识点完整信息
-    used_existing_knowledge_points = []
-    for point in used_existing_points:
-        kp_id = point.get("id")
-        if kp_id:
-            kp = knowledge_service.get_knowledge_point_by_id(db, kp_id)
-            if kp:
-                used_existing_knowledge_points.append(kp)
+        # 已使用的知识点即候选知识点的子集
+        used_existing_knowledge_points = [
+            candidates[point["id"]] for point in used_existing_points if point.get("id") in candidates
+        ]
 
     # 准备新识别的知识点
     new_knowledge_points = [
@@ -349,6 +391,21 @@ async def mark_confirmed_knowledge_points(
         new_knowledge_points=new_knowledge_points_data
     )
 
+    # 新知识点已提交，前缀补全索引在下次查询时后台重建
+    if request.new_knowledge_points:
+        knowledge_autocomplete.invalidate_item_index()
+
+    # 以确认的知识点类别增量训练本地分类器
+    knowledge_service.train_category_classifier(
+        db, request.question_id, [(kp.subject, kp.chapter, kp.section) for kp in marked_points]
+    )
+
+    # 在后台为新出现的知识点类别计算向量
+    if request.new_knowledge_points:
+        knowledge_service.index_categories(
+            [(kp.subject, kp.chapter, kp.section) for kp in marked_points]
+        )
+
     return KnowledgeMarkResponse(
         question_id=request.question_id,
         marked_knowledge_points=marked_points
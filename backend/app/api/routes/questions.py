@@ -1,11 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
 from sqlalchemy.orm import Session
 import logging
 from app.api.deps import get_db, get_current_active_user
 from app.models.user import User
 from app.models.question import WrongQuestion
-from app.api.schemas.question import Question, QuestionCreate, QuestionUpdate, QuestionResponse
+from app.api.schemas.question import (
+    Question, QuestionCreate, QuestionUpdate, QuestionResponse, QuestionSearchHit, QuestionSearchResponse
+)
+from app.services import question as question_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -44,6 +47,29 @@ async def read_questions(
     ).offset(skip).limit(limit).all()
     return questions
 
+@router.get("/search", response_model=QuestionSearchResponse)
+async def search_questions(
+    q: str = Query(..., min_length=1, max_length=100, description="搜索词，多个词以空格分隔，需全部命中"),
+    limit: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    在当前用户的错题内容、解答和备注中搜索
+
+    结果按相关度排序并附带命中片段的高亮，使用 next_cursor 获取下一页
+    """
+    try:
+        results, next_cursor = question_service.search_questions(db, current_user.id, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    items = [
+        QuestionSearchHit(**Question.model_validate(question).model_dump(), score=score, highlights=highlights)
+        for question, score, highlights in results
+    ]
+    return QuestionSearchResponse(items=items, next_cursor=next_cursor)
+
 @router.get("/{question_id}", response_model=Question)
 async def read_question(
     question_id: int,
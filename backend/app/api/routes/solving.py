@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from app.api.deps import get_db, get_current_active_user
+from app.api.deps import get_db, get_llm_user
 from app.models.user import User
 from app.api.schemas.solving import SolveResponse, SolveRequest
 from app.services import solving as solving_service
@@ -12,7 +12,7 @@ async def solve_question(
     question_id: int,
     request_data: SolveRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_llm_user)
 ):
     """
     解答错题
@@ -27,6 +27,14 @@ class KnowledgePoint(KnowledgePointBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class KnowledgePointSuggestion(BaseModel):
+    id: int
+    subject: str
+    chapter: str
+    section: str
+    item: str
+    mark_count: int
+
 class KnowledgePointSearch(BaseModel):
     subject: Optional[str] = None
     chapter: Optional[str] = None
@@ -68,6 +76,9 @@ class KnowledgeCategory(BaseModel):
 class KnowledgeAnalyzeResponse(BaseModel):
     categories: List[KnowledgeCategory]
 
+class KnowledgeAnalyzeRetrieveResponse(KnowledgeAnalyzeResponse):
+    knowledge_points: List[KnowledgePoint] = []  # 所有类别下的知识点，按标记次数降序
+
 # 用于从解题过程中提取知识点的Schema
 class KnowledgePointInfo(BaseModel):
     subject: str
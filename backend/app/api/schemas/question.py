@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 from datetime import datetime
 
 class QuestionBase(BaseModel):
@@ -33,6 +33,14 @@ class Question(QuestionBase):
     class Config:
         from_attributes = True
 
+class QuestionSearchHit(Question):
+    score: int
+    highlights: Dict[str, str] = {}
+
+class QuestionSearchResponse(BaseModel):
+    items: List[QuestionSearchHit]
+    next_cursor: Optional[str] = None
+
 class QuestionResponse(BaseModel):
     status: str
     data: Optional[Any] = None
@@ -1,6 +1,6 @@
 from typing import List, Dict, Optional, Any
 from pydantic import BaseModel
-from app.api.schemas.knowledge import KnowledgePoint
+from app.api.schemas.knowledge import KnowledgePoint, KnowledgePointInfo
 from datetime import datetime
 
 class SolveResult(BaseModel):
@@ -9,6 +9,9 @@ class SolveResult(BaseModel):
     review_passed: Optional[bool] = None
     review_reason: Optional[str] = None
     knowledge_points: List[KnowledgePoint]
+    # 合并模式下解题步骤输出的知识点信息
+    used_knowledge_point_ids: Optional[List[int]] = None
+    new_knowledge_points: Optional[List[KnowledgePointInfo]] = None
 
 
 class SolveResponse(BaseModel):
@@ -0,0 +1,218 @@
+import re
+import math
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.deadline import get_remaining_seconds
+from app.core.rate_limit import LLM_ENDPOINTS, route_pattern
+
+# 读取错题和知识点列表的接口，使用独立的并发容量，LLM接口过载时仍能快速响应
+READ_ENDPOINTS = [
+    "GET /questions/",
+    "GET /questions/{question_id}",
+    "GET /knowledge/{name}",  # structure、search、autocomplete、popular、subjects、chapters、sections、user-marks 及知识点详情
+]
+
+# 未测得处理耗时前按该值估算排队时间（秒）
+_INITIAL_SERVICE_SECONDS = {"llm": 10.0, "read": 0.05}
+
+
+class AdmissionGate:
+    """
+    一类接口的准入控制：最多 concurrency 个请求同时处理，其余按到达顺序在有界队列中等待
+
+    新请求的预计等待时间按 (排队数 + 1) × 平均处理耗时 / 并发数 估算，队列已满或预计等待超过
+    max_wait 时立即拒绝，不再进入事件循环排队；已排队的请求等待超过 max_wait（或请求剩余时限）时同样放弃。
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, max_wait: float):
+        """
+        初始化准入控制
+
+        Args:
+            name: 接口类别名称
+            concurrency: 同时处理的请求数上限
+            queue_size: 排队请求数上限
+            max_wait: 允许的最长排队时间（秒）
+        """
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+
+        self.inflight = 0
+        self._queue: Deque[asyncio.Future] = deque()
+        self._service_seconds: Optional[float] = None
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def estimated_wait(self) -> float:
+        """新请求的预计排队秒数，有空闲槽位时为0"""
+        if self.inflight < self.concurrency and not self._queue:
+            return 0.0
+        service_seconds = self._service_seconds or _INITIAL_SERVICE_SECONDS.get(self.name, 1.0)
+        return (len(self._queue) + 1) * service_seconds / self.concurrency
+
+    def _dispatch(self) -> None:
+        """按到达顺序放行排队的请求，跳过已放弃的请求"""
+        while self._queue and self.inflight < self.concurrency:
+            future = self._queue.popleft()
+            if future.done():
+                continue
+            self.inflight += 1
+            future.set_result(None)
+
+    async def acquire(self) -> Optional[float]:
+        """
+        获取处理槽位
+
+        Returns:
+            None 表示已获得槽位；否则为建议客户端重试前等待的秒数
+        """
+        if self.inflight < self.concurrency and not self._queue:
+            self.inflight += 1
+            self.admitted += 1
+            return None
+
+        wait = self.estimated_wait()
+        remaining = get_remaining_seconds()
+        max_wait = self.max_wait if remaining is None else min(self.max_wait, remaining)
+        if len(self._queue) >= self.queue_size or wait > max_wait:
+            self.rejected += 1
+            return wait
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(future)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self.timed_out += 1
+                return self.estimated_wait()
+        except asyncio.CancelledError:
+            # 已被放行但客户端随即断开时归还槽位
+            if future.done() and not future.cancelled():
+                self.release(None)
+            else:
+                future.cancel()
+            raise
+        self.admitted += 1
+        return None
+
+    def release(self, elapsed: Optional[float]) -> None:
+        """
+        归还槽位并更新平均处理耗时
+
+        Args:
+            elapsed: 本次处理耗时（秒），None表示不计入统计
+        """
+        self.inflight -= 1
+        if elapsed is not None:
+            self._service_seconds = elapsed if self._service_seconds is None else 0.8 * self._service_seconds + 0.2 * elapsed
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取并发占用、排队深度与拒绝数"""
+        return {
+            "concurrency": self.concurrency,
+            "inflight": self.inflight,
+            "queue_depth": sum(1 for future in self._queue if not future.done()),
+            "queue_size": self.queue_size,
+            "service_seconds": round(self._service_seconds or 0.0, 3),
+            "estimated_wait": round(self.estimated_wait(), 3),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+
+_gates: Dict[str, AdmissionGate] = {}
+
+
+def _load_gates() -> List[Tuple[str, "re.Pattern", AdmissionGate]]:
+    """生成 (方法, 路径正则, 准入控制) 列表，并发数为0的类别不做限制"""
+    global _gates
+    _gates = {}
+    rules = []
+    for name, endpoints, concurrency, queue_size, max_wait in (
+        ("llm", LLM_ENDPOINTS, settings.ADMISSION_LLM_CONCURRENCY,
+         settings.ADMISSION_LLM_QUEUE_SIZE, settings.ADMISSION_LLM_MAX_WAIT),
+        ("read", READ_ENDPOINTS, settings.ADMISSION_READ_CONCURRENCY,
+         settings.ADMISSION_READ_QUEUE_SIZE, settings.ADMISSION_READ_MAX_WAIT),
+    ):
+        if concurrency <= 0:
+            continue
+        gate = _gates[name] = AdmissionGate(name, concurrency, queue_size, max_wait)
+        for endpoint in endpoints:
+            method, path = endpoint.split(" ", 1)
+            rules.append((method, route_pattern(settings.API_V1_STR + path), gate))
+    return rules
+
+
+class AdmissionMiddleware:
+    """
+    过载时的准入控制与降级：调用LLM的接口和读取列表的接口各自使用独立的并发容量和有界队列，
+    预计等待过长时立即返回503和Retry-After，避免请求在事件循环中堆积、内存上涨、所有接口同时变慢
+
+    位于限流之内，被限流的请求不占用队列；其他接口不受影响。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.rules = _load_gates()
+        self.methods = {method for method, _, _ in self.rules}
+
+    def _match(self, method: str, path: str) -> Optional[AdmissionGate]:
+        for rule_method, pattern, gate in self.rules:
+            if rule_method == method and pattern.match(path):
+                return gate
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+        gate = self._match(scope["method"], scope["path"])
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await gate.acquire()
+        if retry_after is not None:
+            body = json.dumps({"detail": "服务繁忙，请稍后再试"}, ensure_ascii=False).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(math.ceil(retry_after), 1)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start = time.monotonic()
+        elapsed = None
+        try:
+            await self.app(scope, receive, send)
+            elapsed = time.monotonic() - start
+        finally:
+            gate.release(elapsed)
+
+
+def get_admission_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取各类接口的准入控制状态
+
+    Returns:
+        按类别（llm / read）分组的并发占用、排队深度、平均处理耗时、预计等待和拒绝数
+    """
+    return {name: gate.stats() for name, gate in _gates.items()}
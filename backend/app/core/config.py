@@ -43,6 +43,7 @@ class Settings(BaseSettings):
     # Redis配置
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
+    REDIS_ENABLED: str = os.getenv("REDIS_ENABLED", "false")
     
     # LLM服务配置
     LLM_API_KEY: str = os.getenv("LLM_API_KEY", "")
@@ -66,6 +67,31 @@ class Settings(BaseSettings):
     API_PORT: str = os.getenv("API_PORT", "8000")
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    REQUEST_DEADLINE_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", "300"))  # 单个HTTP请求的处理时限
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "200"))  # 超过该耗时的SQL语句记录慢查询日志
+    N_PLUS_ONE_THRESHOLD: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))  # 单个请求中同一语句形状执行次数达到该值时输出N+1警告
+
+    # 调用LLM的接口限流（每个用户每个接口一个令牌桶）
+    RATE_LIMIT_ENABLED: str = os.getenv("RATE_LIMIT_ENABLED", "true")
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "5"))  # 令牌桶容量，即允许的突发请求数
+    RATE_LIMIT_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_PER_MINUTE", "10"))  # 每分钟补充的令牌数
+    RATE_LIMIT_RULES: str = os.getenv("RATE_LIMIT_RULES", "")  # 按接口覆盖，JSON: {"POST /solving/{question_id}": [容量, 每分钟补充数]}
+
+    # 过载时的准入控制（每个worker），预计排队时间超过上限时返回503；并发数为0时该类接口不做限制
+    ADMISSION_ENABLED: str = os.getenv("ADMISSION_ENABLED", "true")
+    ADMISSION_LLM_CONCURRENCY: int = int(os.getenv("ADMISSION_LLM_CONCURRENCY", "32"))  # 调用LLM的接口同时处理的请求数
+    ADMISSION_LLM_QUEUE_SIZE: int = int(os.getenv("ADMISSION_LLM_QUEUE_SIZE", "64"))  # 调用LLM的接口排队请求数上限
+    ADMISSION_LLM_MAX_WAIT: float = float(os.getenv("ADMISSION_LLM_MAX_WAIT", "30"))  # 调用LLM的接口最长排队秒数
+    ADMISSION_READ_CONCURRENCY: int = int(os.getenv("ADMISSION_READ_CONCURRENCY", "32"))  # 错题和知识点读取接口同时处理的请求数
+    ADMISSION_READ_QUEUE_SIZE: int = int(os.getenv("ADMISSION_READ_QUEUE_SIZE", "256"))
+    ADMISSION_READ_MAX_WAIT: float = float(os.getenv("ADMISSION_READ_MAX_WAIT", "2"))
+
+    # 链路追踪配置（需安装opentelemetry-sdk）
+    TRACING_ENABLED: str = os.getenv("TRACING_ENABLED", "false")
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "file")  # file / otlp
+    TRACING_FILE: str = os.getenv("TRACING_FILE", "traces.jsonl")
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACING_SAMPLE_RATE: float = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))  # 新链路的采样比例
     
     # CORS配置
     BACKEND_CORS_ORIGINS: List[str] = [
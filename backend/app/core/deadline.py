@@ -0,0 +1,71 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from app.core.config import settings
+
+# 当前请求的截止时间（time.monotonic()），None表示不限时
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# 客户端可通过该请求头缩短时限（秒），不能超过服务端配置
+DEADLINE_HEADER = b"x-request-timeout"
+
+
+def get_remaining_seconds() -> Optional[float]:
+    """
+    获取当前请求剩余的处理时间
+
+    Returns:
+        剩余秒数（可能为负），未设置截止时间时返回None
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """
+    在上下文内设置截止时间，嵌套时取更早的截止时间
+
+    Args:
+        seconds: 从现在起的时限（秒）
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class DeadlineMiddleware:
+    """
+    为每个HTTP请求设置截止时间，LLM调用据此计算单次调用的超时与是否继续重试
+
+    使用纯ASGI中间件，保证上下文变量在路由处理函数中可见。
+    """
+
+    def __init__(self, app, seconds: float = settings.REQUEST_DEADLINE_SECONDS):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        seconds = self.seconds
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER:
+                try:
+                    seconds = min(seconds, max(float(value), 0.0))
+                except ValueError:
+                    pass
+                break
+
+        with deadline_scope(seconds):
+            await self.app(scope, receive, send)
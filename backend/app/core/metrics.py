@@ -0,0 +1,312 @@
+import re
+import time
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认延迟分桶（秒），覆盖毫秒级数据库查询到分钟级的LLM调用
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10)
+
+_registry: List["Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """指标基类：同一指标按标签值元组分别计数"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        """返回 (指标名后缀, 标签字符串, 值) 列表"""
+        return []
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [("", _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Gauge(Metric):
+    """
+    瞬时值
+
+    提供 collect 时在抓取时调用它读取当前值（返回 {标签值元组: 值}），热路径上没有任何开销。
+    """
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._collect = collect
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def samples(self):
+        if self._collect is not None:
+            try:
+                items = list(self._collect().items())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [("", _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram(Metric):
+    """累积分桶直方图，每次观测只做一次二分查找和两次加法"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值元组 -> [各桶计数（非累积，最后一个为+Inf）..., 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        result = []
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                result.append(("_bucket", _format_labels(self.labelnames, key, le), cumulative))
+            labels = _format_labels(self.labelnames, key)
+            result.append(("_sum", labels, counts[-1]))
+            result.append(("_count", labels, cumulative))
+        return result
+
+
+def render_metrics() -> str:
+    """
+    以Prometheus文本格式输出所有已注册指标
+
+    Returns:
+        文本格式的指标
+    """
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# HTTP请求
+HTTP_REQUEST_DURATION = Histogram(
+    "gradnote_http_request_duration_seconds", "HTTP请求处理时间（按路由模板）", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "gradnote_http_requests_in_progress", "正在处理的HTTP请求数", ("method",)
+)
+
+# LLM调用（实际发起的调用，合并的重复请求不计）
+LLM_CALL_DURATION = Histogram(
+    "gradnote_llm_call_duration_seconds", "LLM调用耗时（含排队、重试和对冲）", ("module", "model")
+)
+LLM_TOKENS = Counter("gradnote_llm_tokens_total", "LLM token用量", ("module", "model", "type"))
+LLM_ERRORS = Counter("gradnote_llm_errors_total", "LLM调用失败次数", ("module", "model", "error"))
+
+# 数据库查询
+DB_QUERY_DURATION = Histogram(
+    "gradnote_db_query_duration_seconds", "数据库语句执行时间", ("operation", "table"), buckets=DB_BUCKETS
+)
+DB_ERRORS = Counter("gradnote_db_errors_total", "数据库语句执行失败次数", ("operation", "table"))
+
+
+class MetricsMiddleware:
+    """
+    按路由模板（如 /api/v1/solving/{question_id}）记录HTTP请求延迟
+
+    使用纯ASGI中间件，只在请求开始和结束时各读一次时钟；路由模板在路由匹配后从scope中读取，
+    未匹配任何路由的请求归入 unmatched，避免路径参数造成标签基数膨胀。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start, method, getattr(route, "path", "unmatched"), status[0]
+            )
+            HTTP_REQUESTS_IN_PROGRESS.dec(method)
+
+
+# 语句 -> (操作, 表名) 缓存，参数化语句的种类有限
+_statement_labels: Dict[str, Tuple[str, str]] = {}
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+\"?(\w+)", re.IGNORECASE)
+_STATEMENT_CACHE_SIZE = 2048
+
+
+def statement_labels(statement: str) -> Tuple[str, str]:
+    """
+    解析SQL语句的操作类型和主表名
+
+    Args:
+        statement: SQL语句
+
+    Returns:
+        (操作, 表名)，无法识别表名时表名为空字符串
+    """
+    labels = _statement_labels.get(statement)
+    if labels is None:
+        words = statement.lstrip().split(None, 1)
+        operation = words[0].upper() if words else "OTHER"
+        match = _TABLE_PATTERN.search(statement)
+        labels = (operation, match.group(1) if match else "")
+        if len(_statement_labels) < _STATEMENT_CACHE_SIZE:
+            _statement_labels[statement] = labels
+    return labels
+
+
+def instrument_engine(engine) -> None:
+    """
+    为SQLAlchemy引擎注册语句计时事件和连接池状态指标
+
+    Args:
+        engine: SQLAlchemy引擎
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if starts:
+            DB_QUERY_DURATION.observe(time.perf_counter() - starts.pop(), *statement_labels(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+        DB_ERRORS.inc(*statement_labels(context.statement or ""))
+
+    pool = engine.pool
+
+    def _pool_stats() -> Dict[Tuple[str, ...], float]:
+        stats = {("checked_out",): pool.checkedout()}
+        if hasattr(pool, "size"):
+            stats[("size",)] = pool.size()
+            stats[("overflow",)] = pool.overflow()
+            stats[("checked_in",)] = pool.checkedin()
+        return stats
+
+    Gauge("gradnote_db_pool_connections", "数据库连接池状态", ("state",), collect=_pool_stats)
+
+
+def _threadpool_stats() -> Dict[Tuple[str, ...], float]:
+    """同步依赖和路由函数所用的anyio线程池占用，只能在事件循环中读取"""
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    return {("limit",): limiter.total_tokens, ("busy",): limiter.borrowed_tokens}
+
+
+Gauge("gradnote_threadpool_threads", "anyio线程池的线程上限与占用数", ("state",), collect=_threadpool_stats)
+
+
+def _llm_limiter_stats() -> Dict[Tuple[str, ...], float]:
+    from app.llm_services.common.limiter import get_limiter_stats
+
+    stats = {}
+    for model, values in get_limiter_stats().items():
+        for key in ("limit", "inflight", "queue_depth"):
+            stats[(model, key)] = values[key]
+    return stats
+
+
+Gauge("gradnote_llm_limiter", "各模型LLM并发限制器的并发上限、执行中与排队数", ("model", "state"), collect=_llm_limiter_stats)
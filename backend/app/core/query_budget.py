@@ -0,0 +1,78 @@
+"""
+pytest插件：按端点限制SQL语句数（查询预算）
+
+测试中通过 TestClient/httpx 发出的每个请求都会经过 QueryTrackerMiddleware，插件收集各请求的语句数，
+超过预算的测试判定为失败，并列出超出预算的端点和重复次数最多的语句形状。
+
+启用方式:
+    pytest -p app.core.query_budget --query-budget=query_budgets.json
+    或在 conftest.py 中: pytest_plugins = ["app.core.query_budget"]
+
+预算来源（优先级从高到低）:
+    1. 测试标记: @pytest.mark.query_budget(10) 或 @pytest.mark.query_budget({"POST /api/v1/knowledge/mark-confirmed": 12})
+    2. --query-budget 指定的JSON文件: {"POST /api/v1/knowledge/mark-confirmed": 12, "default": 50}
+    3. --query-budget-default 指定的默认预算（默认不限制）
+"""
+import json
+from typing import Dict, List, Optional
+
+import pytest
+
+from app.core.query_tracker import RequestQueries, add_request_listener, remove_request_listener
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("query-budget", "按端点限制SQL语句数")
+    group.addoption("--query-budget", help="端点查询预算JSON文件，键为 \"方法 路由模板\"，可含 \"default\"")
+    group.addoption("--query-budget-default", type=int, help="未配置端点的默认预算")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "query_budget(budget): 本测试的查询预算，整数或 {端点: 预算} 字典")
+
+
+def _load_budgets(config) -> Dict[str, int]:
+    budgets: Dict[str, int] = {}
+    path = config.getoption("--query-budget")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            budgets.update(json.load(f))
+    default = config.getoption("--query-budget-default")
+    if default is not None:
+        budgets.setdefault("default", default)
+    return budgets
+
+
+def _budget_for(endpoint: str, budgets: Dict[str, int]) -> Optional[int]:
+    return budgets.get(endpoint, budgets.get("default"))
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    budgets = _load_budgets(item.config)
+    marker = item.get_closest_marker("query_budget")
+    if marker is not None and marker.args:
+        budget = marker.args[0]
+        budgets = {**budgets, **budget} if isinstance(budget, dict) else {**budgets, "default": budget}
+    if not budgets:
+        return (yield)
+
+    requests: List[RequestQueries] = []
+    add_request_listener(requests.append)
+    try:
+        result = yield
+    finally:
+        remove_request_listener(requests.append)
+
+    violations = []
+    for queries in requests:
+        endpoint = f"{queries.method} {queries.route}"
+        budget = _budget_for(endpoint, budgets)
+        if budget is not None and queries.count > budget:
+            shape, repeats = (queries.shapes.most_common(1) or [("", 0)])[0]
+            violations.append(
+                f"{endpoint}: {queries.count} 条SQL，超出预算 {budget}；重复最多的语句（{repeats} 次）: {shape[:300]}"
+            )
+    if violations:
+        pytest.fail("查询预算超出:\n" + "\n".join(violations), pytrace=False)
+    return result
@@ -0,0 +1,170 @@
+import re
+import time
+import logging
+from collections import Counter as ShapeCounter
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "gradnote_db_queries_per_request", "每个HTTP请求执行的SQL语句数", ("route",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+# IN列表展开后的占位符数量随参数变化，归一化为同一形状
+_IN_LIST = re.compile(r"\(\s*(?:%\(\w+\)s|\?)(?:\s*,\s*(?:%\(\w+\)s|\?))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+_shapes: Dict[str, str] = {}
+_SHAPE_CACHE_SIZE = 2048
+
+
+def statement_shape(statement: str) -> str:
+    """
+    获取语句形状：参数化语句本身即形状，只需合并IN列表和空白
+
+    Args:
+        statement: SQL语句
+
+    Returns:
+        归一化后的语句
+    """
+    shape = _shapes.get(statement)
+    if shape is None:
+        shape = _WHITESPACE.sub(" ", _IN_LIST.sub("(?)", statement)).strip()
+        if len(_shapes) < _SHAPE_CACHE_SIZE:
+            _shapes[statement] = shape
+    return shape
+
+
+class RequestQueries:
+    """一个HTTP请求内执行的SQL语句统计"""
+
+    def __init__(self, scope: Optional[Dict[str, Any]] = None):
+        self.scope = scope
+        self.count = 0
+        self.total_seconds = 0.0
+        self.shapes: ShapeCounter = ShapeCounter()
+
+    @property
+    def route(self) -> str:
+        """路由模板，路由匹配前或非HTTP上下文中为请求路径或 -"""
+        if self.scope is None:
+            return "-"
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "-")
+
+    @property
+    def method(self) -> str:
+        return self.scope.get("method", "-") if self.scope is not None else "-"
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """
+        重复执行达到阈值的语句形状（疑似N+1）
+
+        Args:
+            threshold: 同一形状的最少执行次数
+
+        Returns:
+            (语句形状, 次数) 列表，按次数降序
+        """
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+# 请求结束时的回调（如pytest插件），参数为该请求的统计
+_listeners: List[Callable[[RequestQueries], None]] = []
+
+
+def add_request_listener(listener: Callable[[RequestQueries], None]) -> None:
+    """注册请求结束回调"""
+    _listeners.append(listener)
+
+
+def remove_request_listener(listener: Callable[[RequestQueries], None]) -> None:
+    """移除请求结束回调"""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def get_request_queries() -> Optional[RequestQueries]:
+    """
+    获取当前请求的SQL统计
+
+    Returns:
+        RequestQueries，不在HTTP请求中时返回None
+    """
+    return _current.get()
+
+
+def track_queries(engine) -> None:
+    """
+    为SQLAlchemy引擎注册语句跟踪：统计当前请求的语句数和各语句形状的执行次数，
+    并记录超过 SLOW_QUERY_MS 的慢查询及其所属路由
+
+    Args:
+        engine: SQLAlchemy引擎
+    """
+    from sqlalchemy import event
+
+    threshold = settings.SLOW_QUERY_MS / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("tracker_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("tracker_start")
+        elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+        queries = _current.get()
+        if queries is not None:
+            queries.count += 1
+            queries.total_seconds += elapsed
+            queries.shapes[statement_shape(statement)] += 1
+        if elapsed >= threshold:
+            route = f"{queries.method} {queries.route}" if queries is not None else "-"
+            # 只记录参数化的语句形状，参数中可能含有用户内容和密码哈希
+            logger.warning(f"慢查询 {elapsed * 1000:.0f}ms [{route}] {statement_shape(statement)[:1000]}")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("tracker_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+class QueryTrackerMiddleware:
+    """
+    统计每个HTTP请求的SQL语句数，请求结束时对重复执行 N_PLUS_ONE_THRESHOLD 次以上的同一语句形状输出N+1警告
+
+    使用纯ASGI中间件，统计对象通过上下文变量传递，同步依赖在线程池中执行的查询同样计入。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope)
+        token = _current.set(queries)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            if queries.count:
+                DB_QUERIES_PER_REQUEST.observe(queries.count, getattr(scope.get("route"), "path", "unmatched"))
+                for shape, count in queries.repeated(settings.N_PLUS_ONE_THRESHOLD):
+                    logger.warning(
+                        f"疑似N+1查询 [{queries.method} {queries.route}] 同一语句执行 {count} 次"
+                        f"（本请求共 {queries.count} 条，{queries.total_seconds * 1000:.0f}ms）: {shape[:500]}"
+                    )
+            for listener in list(_listeners):
+                listener(queries)
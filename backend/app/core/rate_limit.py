@@ -0,0 +1,214 @@
+import re
+import json
+import math
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from jose import jwt, JWTError
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 调用LLM的接口，默认按 每个用户 × 每个接口 一个令牌桶限流
+LLM_ENDPOINTS = [
+    "POST /image/process",
+    "POST /image/process-answer",
+    "POST /solving/{question_id}",
+    "POST /knowledge/analyze-from-question",
+    "POST /knowledge/analyze-and-retrieve",
+    "POST /knowledge/extract-from-solution",
+]
+
+_KEY_PREFIX = "ratelimit"
+
+# 原子令牌桶：按Redis服务器时间补充令牌并尝试取出一个，返回 {是否放行, 需等待的毫秒数}
+# 桶在补满所需时间后过期，空闲用户不占用内存
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now_parts = redis.call("TIME")
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "ts", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {allowed, wait}
+"""
+
+# Redis出错后在该时间内直接使用进程内令牌桶，避免每个请求都等待失败的Redis调用
+_REDIS_RETRY_SECONDS = 5.0
+_MAX_LOCAL_BUCKETS = 100_000
+_MAX_CACHED_TOKENS = 10_000
+
+# 统计
+# allowed / limited: 放行与限流的请求数
+# redis_errors: Redis调用失败次数（失败时退回进程内令牌桶）
+_stats: Dict[str, int] = {"allowed": 0, "limited": 0, "redis_errors": 0}
+
+
+def route_pattern(template: str) -> "re.Pattern":
+    """路由模板转换为正则，路径参数匹配单个路径段"""
+    parts = re.split(r"(\{[^}]+\})", template)
+    return re.compile("^" + "".join("[^/]+" if part.startswith("{") else re.escape(part) for part in parts) + "$")
+
+
+class RateLimitRule:
+    """一个接口的令牌桶参数：容量（允许的突发请求数）和每秒补充的令牌数"""
+
+    def __init__(self, endpoint: str, burst: int, per_minute: float):
+        self.endpoint = endpoint
+        self.burst = burst
+        self.rate = per_minute / 60.0
+
+
+def load_rules() -> List[Tuple[str, "re.Pattern", RateLimitRule]]:
+    """
+    生成限流规则：LLM_ENDPOINTS 使用默认的 RATE_LIMIT_BURST / RATE_LIMIT_PER_MINUTE，
+    RATE_LIMIT_RULES 可按接口覆盖，如 {"POST /solving/{question_id}": [3, 6]}（容量, 每分钟补充数）
+
+    Returns:
+        (方法, 路径正则, 规则) 列表
+    """
+    overrides = json.loads(settings.RATE_LIMIT_RULES or "{}")
+    rules = []
+    for endpoint in dict.fromkeys(LLM_ENDPOINTS + list(overrides)):
+        burst, per_minute = overrides.get(endpoint, (settings.RATE_LIMIT_BURST, settings.RATE_LIMIT_PER_MINUTE))
+        if burst <= 0 or per_minute <= 0:
+            continue
+        method, path = endpoint.split(" ", 1)
+        rules.append((method, route_pattern(settings.API_V1_STR + path), RateLimitRule(endpoint, burst, per_minute)))
+    return rules
+
+
+class RateLimitMiddleware:
+    """
+    调用LLM的接口按 用户 × 接口 的令牌桶限流，超出时返回429和Retry-After
+
+    在路由和依赖之前执行，被限流的请求不会查询数据库。用户从JWT的sub读取（只验签不查库），
+    无有效令牌时按客户端IP限流。启用Redis时令牌桶由Lua脚本原子更新、多worker共享，
+    Redis不可用时退回进程内令牌桶。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.rules = load_rules()
+        self.methods = {method for method, _, _ in self.rules}
+        self._script = None
+        self._redis_retry_at = 0.0
+        # 进程内令牌桶：键 -> [令牌数, 上次更新时间]
+        self._buckets: Dict[str, List[float]] = {}
+        # 已验签的令牌 -> (限流标识, 过期时间)，同一令牌的后续请求不再验签
+        self._identities: Dict[str, Tuple[str, float]] = {}
+
+    def _match(self, method: str, path: str) -> Optional[RateLimitRule]:
+        for rule_method, pattern, rule in self.rules:
+            if rule_method == method and pattern.match(path):
+                return rule
+        return None
+
+    def _identity(self, scope) -> str:
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    cached = self._identities.get(token)
+                    if cached is not None and cached[1] > time.time():
+                        return cached[0]
+                    try:
+                        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+                    except JWTError:
+                        payload = {}
+                    if payload.get("sub") is not None:
+                        identity = f"user:{payload['sub']}"
+                        if len(self._identities) >= _MAX_CACHED_TOKENS:
+                            self._identities.clear()
+                        self._identities[token] = (identity, float(payload.get("exp", math.inf)))
+                        return identity
+                break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else '-'}"
+
+    def _take_local(self, key: str, rule: RateLimitRule) -> float:
+        """进程内令牌桶，返回需等待的秒数，0表示放行"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= _MAX_LOCAL_BUCKETS:
+                self._buckets.clear()
+            bucket = self._buckets[key] = [float(rule.burst), now]
+        tokens = min(rule.burst, bucket[0] + (now - bucket[1]) * rule.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / rule.rate
+
+    async def _take(self, key: str, rule: RateLimitRule) -> float:
+        redis = get_redis() if time.monotonic() >= self._redis_retry_at else None
+        if redis is not None:
+            try:
+                if self._script is None:
+                    self._script = redis.register_script(_TOKEN_BUCKET_SCRIPT)
+                allowed, wait_ms = await self._script(keys=[f"{_KEY_PREFIX}:{key}"], args=[rule.burst, rule.rate])
+                return 0.0 if int(allowed) else int(wait_ms) / 1000
+            except Exception as e:
+                _stats["redis_errors"] += 1
+                self._redis_retry_at = time.monotonic() + _REDIS_RETRY_SECONDS
+                logger.warning(f"Redis限流失败，{_REDIS_RETRY_SECONDS:.0f}秒内使用进程内令牌桶: {e}")
+        return self._take_local(key, rule)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+        rule = self._match(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = await self._take(f"{rule.endpoint}:{self._identity(scope)}", rule)
+        if wait <= 0:
+            _stats["allowed"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        _stats["limited"] += 1
+        body = json.dumps({"detail": "请求过于频繁，请稍后再试"}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(math.ceil(wait), 1)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def get_rate_limit_stats() -> Dict[str, int]:
+    """
+    获取限流统计
+
+    Returns:
+        放行数、限流数和Redis失败次数
+    """
+    return dict(_stats)
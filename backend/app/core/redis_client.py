@@ -0,0 +1,35 @@
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_redis():
+    """
+    获取异步Redis客户端
+
+    仅在 REDIS_ENABLED=true 时创建连接，未启用或redis库不可用时返回None，
+    调用方应退回进程内实现。
+
+    Returns:
+        redis.asyncio.Redis实例或None
+    """
+    global _client
+    if settings.REDIS_ENABLED.lower() != "true":
+        return None
+
+    if _client is None:
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            logger.warning("未安装redis库，使用进程内存储")
+            return None
+        _client = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            decode_responses=True
+        )
+    return _client
@@ -0,0 +1,215 @@
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable
+
+from app.core.config import settings
+from app.core.metrics import statement_labels
+
+logger = logging.getLogger(__name__)
+
+# 未启用或未安装opentelemetry时为None，所有埋点退化为空操作
+_tracer = None
+_provider = None
+
+
+def setup_tracing() -> bool:
+    """
+    初始化OpenTelemetry链路追踪
+
+    仅在 TRACING_ENABLED=true 时启用。按 TRACING_SAMPLE_RATE 对新链路采样（上游已采样的链路保持一致），
+    TRACING_EXPORTER=otlp 时通过OTLP/HTTP导出到 TRACING_OTLP_ENDPOINT（如本地Jaeger、OTel Collector），
+    否则以每行一个JSON span的格式追加写入 TRACING_FILE。
+
+    Returns:
+        是否已启用
+    """
+    global _tracer, _provider
+    if settings.TRACING_ENABLED.lower() != "true":
+        return False
+    if _tracer is not None:
+        return True
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        logger.warning("未安装opentelemetry-sdk，链路追踪未启用")
+        return False
+
+    if settings.TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("未安装opentelemetry-exporter-otlp-proto-http，链路追踪未启用")
+            return False
+        exporter = OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+        target = settings.TRACING_OTLP_ENDPOINT
+    else:
+        exporter = ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+        target = settings.TRACING_FILE
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": "gradnote-api"}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATE))
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    _tracer = trace.get_tracer("gradnote")
+    logger.info(f"链路追踪已启用: 导出到 {target}，采样率 {settings.TRACING_SAMPLE_RATE}")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """导出缓冲中剩余的span，应用关闭时调用"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+@contextmanager
+def span(name: str, **attributes: Any):
+    """
+    在当前链路下创建子span，异常会记录到span并标记为错误
+
+    Args:
+        name: span名称
+        **attributes: span属性，值为None的属性忽略
+
+    Yields:
+        span对象，未启用追踪时为None
+    """
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(
+        name, attributes={key: value for key, value in attributes.items() if value is not None}
+    ) as current:
+        yield current
+
+
+def traced(name: str) -> Callable:
+    """
+    为异步函数创建span的装饰器
+
+    Args:
+        name: span名称
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_span_attributes(**attributes: Any) -> None:
+    """
+    为当前span设置属性，未启用追踪或不在span中时忽略
+
+    Args:
+        **attributes: span属性，值为None的属性忽略
+    """
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attributes({key: value for key, value in attributes.items() if value is not None})
+
+
+class TracingMiddleware:
+    """
+    为每个HTTP请求创建服务端根span（名称为 方法 路由模板），并继承请求头 traceparent 中的上游链路
+
+    使用纯ASGI中间件；路由函数、同步依赖（在线程池中执行，上下文随之复制）中的SQL、文件写入和LLM调用
+    均成为该span的子span。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        from opentelemetry import propagate
+        from opentelemetry.trace import SpanKind, Status, StatusCode
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        method = scope["method"]
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        with _tracer.start_as_current_span(
+            method,
+            context=propagate.extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]}
+        ) as current:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    current.update_name(f"{method} {route}")
+                    current.set_attribute("http.route", route)
+                current.set_attribute("http.response.status_code", status[0])
+                if status[0] >= 500:
+                    current.set_status(Status(StatusCode.ERROR))
+
+
+def trace_engine(engine) -> None:
+    """
+    为SQLAlchemy引擎注册语句span，每条SQL语句一个span（名称为 操作 表名）
+
+    Args:
+        engine: SQLAlchemy引擎
+    """
+    if _tracer is None:
+        return
+
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+    from sqlalchemy import event
+
+    system = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        operation, table = statement_labels(statement)
+        current = _tracer.start_span(
+            f"{operation} {table}".strip(),
+            kind=SpanKind.CLIENT,
+            attributes={"db.system": system, "db.statement": " ".join(statement.split())[:2000]}
+        )
+        conn.info.setdefault("trace_spans", []).append(current)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            current = spans.pop()
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                current.set_attribute("db.rowcount", cursor.rowcount)
+            current.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            current = spans.pop()
+            current.record_exception(context.original_exception)
+            current.set_status(Status(StatusCode.ERROR))
+            current.end()
@@ -38,10 +38,33 @@ def create_indexes():
         ON user_marks(user_id, knowledge_point_id)
         """,
         
-        # 错题备注索引 - 提高备注内容搜索性能
+        # 错题内容、解答、备注的三元组索引 - 支持 /questions/search 的子串匹配（ILIKE '%词%'）
+        # 按字符n-gram建索引，中文无需分词；数据库 LC_CTYPE 需为UTF-8区域（非C），否则中文字符不生成三元组
         """
-        CREATE INDEX IF NOT EXISTS idx_wrong_questions_remark 
-        ON wrong_questions USING gin(to_tsvector('simple', remark))
+        CREATE EXTENSION IF NOT EXISTS pg_trgm
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_wrong_questions_content_trgm
+        ON wrong_questions USING gin(content gin_trgm_ops)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_wrong_questions_solution_trgm
+        ON wrong_questions USING gin(solution gin_trgm_ops)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_wrong_questions_remark_trgm
+        ON wrong_questions USING gin(remark gin_trgm_ops)
+        """,
+
+        # 知识点名称的三元组索引 - 支持 /knowledge/search 按名称模糊搜索（ILIKE）和相似度排序
+        """
+        CREATE INDEX IF NOT EXISTS idx_knowledge_item_trgm
+        ON knowledge_points USING gin(item gin_trgm_ops)
+        """,
+
+        # 原备注全文索引没有查询使用，由上面的三元组索引取代
+        """
+        DROP INDEX IF EXISTS idx_wrong_questions_remark
         """
     ]
     
@@ -50,10 +73,12 @@ def create_indexes():
         try:
             for index_sql in indexes:
                 try:
-                    connection.execute(text(index_sql))
+                    # 每条语句使用保存点，单条失败（如无权限安装pg_trgm）不影响其余索引
+                    with connection.begin_nested():
+                        connection.execute(text(index_sql))
                     logger.info(f"执行索引SQL: {index_sql}")
                 except Exception as e:
-                    logger.warning(f"索引创建出错: {e}，可能是GIN索引不支持或remark字段不存在")
+                    logger.warning(f"索引创建出错: {e}，可能是未安装pg_trgm扩展或字段不存在")
             
             connection.commit()
             logger.info("所有数据库索引创建成功！")
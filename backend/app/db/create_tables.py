@@ -1,5 +1,5 @@
 from app.db.session import Base, engine
-from app.models import User, WrongQuestion, KnowledgePoint, QuestionKnowledgeRelation, UserMark
+from app.models import User, WrongQuestion, KnowledgePoint, QuestionKnowledgeRelation, UserMark, KnowledgeCategoryEmbedding, LLMUsage
 import logging
 
 # 配置日志
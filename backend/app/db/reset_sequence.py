@@ -9,7 +9,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # 允许重置序列的表白名单
-ALLOWED_TABLES = {"wrong_questions", "knowledge_points", "question_knowledge_relation", "user_marks", "users"}
+ALLOWED_TABLES = {"wrong_questions", "knowledge_points", "question_knowledge_relation", "user_marks", "users", "knowledge_category_embeddings"}
 
 def reset_sequence(table_name):
     """
@@ -0,0 +1,66 @@
+from app.llm_services.common.structured_output import (
+    ainvoke_json,
+    parse_json_output,
+    repair_json,
+    get_parse_stats,
+    JSONRepairError
+)
+from app.llm_services.common.cassette import get_http_async_client, CassetteTransport, CassetteMissError
+from app.llm_services.common.invoke import ainvoke_llm, estimate_request_tokens
+from app.llm_services.common.limiter import get_limiter_stats
+from app.llm_services.common.resilience import resilient_call, get_resilience_stats, LLMDeadlineExceeded
+from app.llm_services.common.singleflight import request_key, singleflight, get_singleflight_stats
+from app.llm_services.common.tokens import estimate_tokens, truncate_to_tokens
+from app.llm_services.common.prompts import build_messages, clean_prompt, render_prompt
+from app.llm_services.common.usage import record_usage, extract_usage, get_usage_stats
+from app.llm_services.common.accounting import (
+    bind_usage,
+    check_quota,
+    account_usage,
+    flush_usage,
+    start_usage_flusher,
+    stop_usage_flusher,
+    get_accounting_stats,
+    LLMQuotaExceeded
+)
+from app.llm_services.common.observability import langfuse_callbacks, get_langfuse, shutdown_langfuse, get_langfuse_stats
+
+__all__ = [
+    "ainvoke_json",
+    "ainvoke_llm",
+    "get_http_async_client",
+    "CassetteTransport",
+    "CassetteMissError",
+    "estimate_request_tokens",
+    "get_limiter_stats",
+    "resilient_call",
+    "get_resilience_stats",
+    "LLMDeadlineExceeded",
+    "request_key",
+    "singleflight",
+    "get_singleflight_stats",
+    "parse_json_output",
+    "repair_json",
+    "get_parse_stats",
+    "JSONRepairError",
+    "estimate_tokens",
+    "truncate_to_tokens",
+    "build_messages",
+    "clean_prompt",
+    "render_prompt",
+    "record_usage",
+    "extract_usage",
+    "get_usage_stats",
+    "langfuse_callbacks",
+    "get_langfuse",
+    "shutdown_langfuse",
+    "get_langfuse_stats",
+    "bind_usage",
+    "check_quota",
+    "account_usage",
+    "flush_usage",
+    "start_usage_flusher",
+    "stop_usage_flusher",
+    "get_accounting_stats",
+    "LLMQuotaExceeded"
+]
@@ -0,0 +1,258 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 用量统计与配额配置
+LLM_DAILY_TOKEN_QUOTA = int(os.getenv("LLM_DAILY_TOKEN_QUOTA", "0"))  # 每个用户每日token上限（输入+输出），0为不限
+LLM_USAGE_FLUSH_SECONDS = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "30"))  # 用量写入数据库的间隔
+# 各模型每百万token的价格，如 {"deepseek-v3-250324": {"input": 2, "output": 8, "cached": 0.5}}，未配置的模型费用记为0
+LLM_PRICES: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_PRICES", "{}") or "{}")
+
+_KEY_PREFIX = "llm:quota"
+
+# 当前请求的 (用户ID, 端点)，不在用户请求中的调用记为 (0, "-")
+_account: ContextVar[Tuple[int, str]] = ContextVar("llm_account", default=(0, "-"))
+
+# 待写入数据库的用量：(日期, 用户ID, 端点, 模型) -> [调用次数, 输入, 输出, 缓存命中, 费用]
+_buffer: Dict[Tuple[date, int, str, str], list] = {}
+_buffer_lock = threading.Lock()
+
+# 未启用Redis时的进程内当日用量：(日期, 用户ID) -> token数
+_daily_tokens: Dict[Tuple[date, int], int] = {}
+
+# 统计
+# flushed: 写入数据库的行数
+# flush_failures: 写入失败次数（失败的用量并回缓冲区，下次重试）
+# quota_rejected: 因超出配额被拒绝的请求数
+_stats: Dict[str, int] = {"flushed": 0, "flush_failures": 0, "quota_rejected": 0}
+
+_flusher: Optional["asyncio.Task"] = None
+
+
+class LLMQuotaExceeded(Exception):
+    """用户当日LLM token用量已达配额"""
+    def __init__(self, used: int, quota: int, retry_after: int):
+        self.used = used
+        self.quota = quota
+        self.retry_after = retry_after
+        self.message = f"今日LLM用量已达上限（{used}/{quota} tokens），请明天再试"
+        super().__init__(self.message)
+
+
+def bind_usage(user_id: int, endpoint: str) -> None:
+    """
+    将当前请求后续的LLM调用用量记到指定用户和端点
+
+    Args:
+        user_id: 用户ID
+        endpoint: 路由模板
+    """
+    _account.set((user_id, endpoint))
+
+
+def estimate_cost(model: str, usage: Dict[str, int]) -> float:
+    """
+    按 LLM_PRICES 计算一次调用的费用，缓存命中的输入token按cached价格（未配置时按input价格）计费
+
+    Args:
+        model: 模型名称
+        usage: 包含 input_tokens、output_tokens、cached_tokens 的字典
+
+    Returns:
+        费用，未配置价格的模型为0
+    """
+    price = LLM_PRICES.get(model)
+    if not price:
+        return 0.0
+    input_price = price.get("input", 0.0)
+    cached = min(usage["cached_tokens"], usage["input_tokens"])
+    return (
+        (usage["input_tokens"] - cached) * input_price
+        + cached * price.get("cached", input_price)
+        + usage["output_tokens"] * price.get("output", 0.0)
+    ) / 1_000_000
+
+
+def _seconds_until_tomorrow() -> int:
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(int((tomorrow - now).total_seconds()), 1)
+
+
+async def _get_daily_tokens(user_id: int, day: date) -> int:
+    redis = get_redis()
+    if redis is not None:
+        try:
+            return int(await redis.get(f"{_KEY_PREFIX}:{day.isoformat()}:{user_id}") or 0)
+        except Exception as e:
+            logger.warning(f"Redis读取LLM用量失败，使用进程内计数: {e}")
+    return _daily_tokens.get((day, user_id), 0)
+
+
+async def _add_daily_tokens(user_id: int, day: date, tokens: int) -> None:
+    redis = get_redis()
+    if redis is not None:
+        try:
+            key = f"{_KEY_PREFIX}:{day.isoformat()}:{user_id}"
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.incrby(key, tokens)
+                pipe.expire(key, 2 * 86400)
+                await pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"Redis记录LLM用量失败，使用进程内计数: {e}")
+    if _daily_tokens and next(iter(_daily_tokens))[0] != day:
+        # 日期变更后清理前一天的计数
+        for key in [key for key in _daily_tokens if key[0] != day]:
+            del _daily_tokens[key]
+    _daily_tokens[(day, user_id)] = _daily_tokens.get((day, user_id), 0) + tokens
+
+
+async def check_quota(user_id: int) -> None:
+    """
+    检查用户当日LLM token用量是否已达配额，在发起LLM调用前执行
+
+    用量从Redis（REDIS_ENABLED=true）或进程内计数读取，不查询数据库；进程内计数只统计本worker的用量。
+
+    Args:
+        user_id: 用户ID
+
+    Raises:
+        LLMQuotaExceeded: 已达配额
+    """
+    if LLM_DAILY_TOKEN_QUOTA <= 0:
+        return
+    used = await _get_daily_tokens(user_id, date.today())
+    if used >= LLM_DAILY_TOKEN_QUOTA:
+        _stats["quota_rejected"] += 1
+        raise LLMQuotaExceeded(used, LLM_DAILY_TOKEN_QUOTA, _seconds_until_tomorrow())
+
+
+async def account_usage(model: str, usage: Dict[str, int]) -> None:
+    """
+    将一次LLM调用的用量计入当前请求的用户和端点
+
+    用量先累加到内存缓冲区，由后台任务定期批量写入 llm_usage 表；配额计数同步更新。
+
+    Args:
+        model: 模型名称
+        usage: 包含 input_tokens、output_tokens、cached_tokens 的字典
+    """
+    user_id, endpoint = _account.get()
+    day = date.today()
+    cost = estimate_cost(model, usage)
+    with _buffer_lock:
+        counters = _buffer.get((day, user_id, endpoint, model))
+        if counters is None:
+            counters = _buffer[(day, user_id, endpoint, model)] = [0, 0, 0, 0, 0.0]
+        counters[0] += 1
+        counters[1] += usage["input_tokens"]
+        counters[2] += usage["output_tokens"]
+        counters[3] += usage["cached_tokens"]
+        counters[4] += cost
+
+    tokens = usage["input_tokens"] + usage["output_tokens"]
+    if user_id and tokens and LLM_DAILY_TOKEN_QUOTA > 0:
+        await _add_daily_tokens(user_id, day, tokens)
+
+
+def flush_usage() -> int:
+    """
+    将缓冲区中的用量写入 llm_usage 表（按 日期/用户/端点/模型 累加），写入失败时并回缓冲区
+
+    Returns:
+        写入的行数
+    """
+    global _buffer
+    with _buffer_lock:
+        pending, _buffer = _buffer, {}
+    if not pending:
+        return 0
+
+    from sqlalchemy import func
+    from sqlalchemy.dialects.postgresql import insert
+    from app.db.session import SessionLocal
+    from app.models.usage import LLMUsage
+
+    rows = [
+        {
+            "day": day, "user_id": user_id, "endpoint": endpoint, "model": model,
+            "calls": calls, "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "cached_tokens": cached_tokens, "cost": cost
+        }
+        for (day, user_id, endpoint, model), (calls, input_tokens, output_tokens, cached_tokens, cost) in pending.items()
+    ]
+    statement = insert(LLMUsage).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["day", "user_id", "endpoint", "model"],
+        set_={
+            **{
+                column: getattr(LLMUsage, column) + getattr(statement.excluded, column)
+                for column in ("calls", "input_tokens", "output_tokens", "cached_tokens", "cost")
+            },
+            "updated_at": func.now()
+        }
+    )
+
+    db = SessionLocal()
+    try:
+        db.execute(statement)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        _stats["flush_failures"] += 1
+        logger.warning(f"LLM用量写入数据库失败，下次重试: {e}")
+        with _buffer_lock:
+            for key, counters in pending.items():
+                merged = _buffer.setdefault(key, [0, 0, 0, 0, 0.0])
+                for i, value in enumerate(counters):
+                    merged[i] += value
+        return 0
+    finally:
+        db.close()
+
+    _stats["flushed"] += len(rows)
+    return len(rows)
+
+
+async def _flush_loop() -> None:
+    while True:
+        await asyncio.sleep(LLM_USAGE_FLUSH_SECONDS)
+        await asyncio.to_thread(flush_usage)
+
+
+def start_usage_flusher() -> None:
+    """启动定期写入用量的后台任务，应用启动时调用"""
+    global _flusher
+    if _flusher is None:
+        _flusher = asyncio.create_task(_flush_loop())
+
+
+async def stop_usage_flusher() -> None:
+    """停止后台任务并写入剩余用量，应用关闭时调用"""
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+    await asyncio.to_thread(flush_usage)
+
+
+def get_accounting_stats() -> Dict[str, Any]:
+    """
+    获取用量统计与配额状态
+
+    Returns:
+        当日配额、待写入的行数、已写入行数、写入失败次数和因配额被拒绝的请求数
+    """
+    with _buffer_lock:
+        buffered = len(_buffer)
+    return {"daily_token_quota": LLM_DAILY_TOKEN_QUOTA, "buffered": buffered, **_stats}
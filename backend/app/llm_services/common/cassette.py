@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 录制/回放配置
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()  # off / record / replay
+LLM_CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", "cassettes")
+LLM_CASSETTE_LATENCY_MS = float(os.getenv("LLM_CASSETTE_LATENCY_MS", "-1"))  # 回放固定延迟，负数表示使用录制时的延迟
+LLM_CASSETTE_LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "1.0"))  # 录制延迟的缩放系数
+LLM_CASSETTE_JITTER = float(os.getenv("LLM_CASSETTE_JITTER", "0.1"))  # 回放延迟的随机抖动比例
+
+# 录制时不保存的响应头：正文以解码后的内容保存，长度和编码由httpx重新计算
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+
+class CassetteMissError(httpx.TransportError):
+    """回放模式下找不到对应的录制记录"""
+
+
+# OpenAI兼容接口的端点后缀，服务地址中的路径前缀（/v1、/api/v3等）不参与哈希
+_ENDPOINTS = ("/chat/completions", "/embeddings", "/completions")
+
+
+def _endpoint(path: str) -> str:
+    """去除服务地址中的路径前缀"""
+    for endpoint in _ENDPOINTS:
+        if path.endswith(endpoint):
+            return endpoint
+    return path
+
+
+def cassette_key(request: httpx.Request) -> str:
+    """
+    计算HTTP请求的规范化哈希
+
+    只使用方法、端点和按键排序后的JSON请求体，忽略服务地址、路径前缀和认证头，
+    同一份录制可以在不同环境下回放。
+
+    Args:
+        request: httpx请求
+
+    Returns:
+        十六进制哈希字符串
+    """
+    body = request.content or b""
+    try:
+        body = json.dumps(json.loads(body), ensure_ascii=False, sort_keys=True).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256()
+    digest.update(request.method.encode("utf-8"))
+    digest.update(_endpoint(request.url.path).encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    LLM请求的录制/回放传输层
+
+    record 模式下将请求转发给真实服务，并把请求与响应按请求哈希保存到录制目录；
+    replay 模式下不访问网络，直接返回录制的响应，并按录制延迟（或固定延迟）等待后返回。
+    同一请求录制多次时，回放按录制顺序轮流返回。
+    """
+
+    def __init__(self, mode: str, directory: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        初始化传输层
+
+        Args:
+            mode: record 或 replay
+            directory: 录制文件目录，每个请求哈希一个JSON文件
+            transport: record 模式下实际发送请求的传输层
+        """
+        self.mode = mode
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self._cursors: Dict[str, int] = {}
+        self._cache: Dict[str, List[Dict[str, Any]]] = {}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _load(self, key: str) -> List[Dict[str, Any]]:
+        """读取请求哈希对应的全部录制记录"""
+        if key not in self._cache:
+            path = self._path(key)
+            self._cache[key] = json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
+        return self._cache[key]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = cassette_key(request)
+        if self.mode == "replay":
+            return await self._replay(key, request)
+        return await self._record(key, request)
+
+    async def _record(self, key: str, request: httpx.Request) -> httpx.Response:
+        """转发请求并保存响应"""
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        latency_ms = (time.perf_counter() - start) * 1000
+        await response.aclose()
+
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        entries = self._load(key)
+        entries.append({
+            "request": {
+                "method": request.method,
+                "path": request.url.path,
+                "body": (request.content or b"").decode("utf-8", errors="replace")
+            },
+            "response": {
+                "status_code": response.status_code,
+                "headers": headers,
+                "body": content.decode("utf-8", errors="replace")
+            },
+            "latency_ms": round(latency_ms, 1)
+        })
+        self._path(key).write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def _replay(self, key: str, request: httpx.Request) -> httpx.Response:
+        """返回录制的响应"""
+        entries = self._load(key)
+        if not entries:
+            raise CassetteMissError(f"未找到录制记录: {request.method} {request.url.path} ({key[:12]})", request=request)
+
+        cursor = self._cursors.get(key, 0)
+        self._cursors[key] = cursor + 1
+        entry = entries[cursor % len(entries)]
+
+        latency_ms = LLM_CASSETTE_LATENCY_MS if LLM_CASSETTE_LATENCY_MS >= 0 else entry.get("latency_ms", 0) * LLM_CASSETTE_LATENCY_SCALE
+        latency_ms *= 1 + random.uniform(-LLM_CASSETTE_JITTER, LLM_CASSETTE_JITTER)
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+
+        recorded = entry["response"]
+        return httpx.Response(
+            recorded["status_code"],
+            headers=recorded["headers"],
+            content=recorded["body"].encode("utf-8"),
+            request=request
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+_http_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_async_client() -> Optional[httpx.AsyncClient]:
+    """
+    获取llm_services中所有ChatOpenAI/OpenAIEmbeddings客户端共用的httpx客户端
+
+    Returns:
+        录制或回放模式下返回挂载了CassetteTransport的客户端，关闭时返回None（使用SDK默认客户端）
+    """
+    global _http_async_client
+    if LLM_CASSETTE_MODE not in ("record", "replay"):
+        return None
+
+    if _http_async_client is None:
+        logger.info(f"LLM请求{'录制' if LLM_CASSETTE_MODE == 'record' else '回放'}模式，目录: {LLM_CASSETTE_DIR}")
+        _http_async_client = httpx.AsyncClient(
+            transport=CassetteTransport(LLM_CASSETTE_MODE, LLM_CASSETTE_DIR),
+            timeout=httpx.Timeout(600.0, connect=10.0)
+        )
+    return _http_async_client
@@ -0,0 +1,100 @@
+import time
+from typing import Any
+
+from langchain_core.messages import convert_to_messages
+
+from app.core.metrics import LLM_CALL_DURATION, LLM_ERRORS, LLM_TOKENS
+from app.core.tracing import set_span_attributes, span
+from app.llm_services.common.accounting import account_usage
+from app.llm_services.common.limiter import limited_call
+from app.llm_services.common.resilience import resilient_call
+from app.llm_services.common.singleflight import request_key, singleflight
+from app.llm_services.common.tokens import estimate_tokens
+from app.llm_services.common.usage import extract_usage, record_usage
+
+# 单张图片按高精度模式估算的输入token数
+IMAGE_TOKENS = 1000
+
+
+def estimate_request_tokens(llm: Any, messages: Any) -> int:
+    """
+    估算一次请求消耗的token数，用于限流
+
+    文本按 estimate_tokens 估算，图片按固定值计算，输出按max_tokens（未设置时不计）。
+
+    Args:
+        llm: ChatOpenAI实例
+        messages: 消息列表或提示词字符串
+
+    Returns:
+        预估token数
+    """
+    tokens = getattr(llm, "max_tokens", None) or 0
+    for message in convert_to_messages(messages):
+        content = message.content
+        if isinstance(content, str):
+            tokens += estimate_tokens(content)
+            continue
+        for part in content:
+            if isinstance(part, str):
+                tokens += estimate_tokens(part)
+            elif part.get("type") == "text":
+                tokens += estimate_tokens(part.get("text", ""))
+            else:
+                tokens += IMAGE_TOKENS
+    return tokens
+
+
+def _total_tokens(response: Any) -> int:
+    """读取响应的实际token用量，服务商未返回用量时为0"""
+    usage = extract_usage(response)
+    return usage["input_tokens"] + usage["output_tokens"]
+
+
+async def ainvoke_llm(llm: Any, messages: Any, name: str, **kwargs: Any) -> Any:
+    """
+    调用LLM的统一入口，llm_services中的所有模型调用都应经过此函数
+
+    内容完全相同的并发请求会合并为一次调用；实际发起的调用受请求截止时间约束，临时错误带退避重试，
+    每次尝试都经过按模型的自适应并发限制器排队，单次超时与对冲延迟从获得槽位时开始计算。token用量和调用指标只在实际发起调用时记录，
+    用量计入发起调用的请求所属的用户和端点。
+
+    Args:
+        llm: ChatOpenAI实例
+        messages: 消息列表或提示词字符串
+        name: 调用方名称（solve、review、retriever、extractor、vlm等）
+        **kwargs: 绑定到本次调用的额外参数（如response_format）
+
+    Returns:
+        LLM响应消息
+    """
+    runnable = llm.bind(**kwargs) if kwargs else llm
+    model = getattr(llm, "model_name", "") or name
+
+    async def call() -> Any:
+        tokens = estimate_request_tokens(llm, messages)
+        start = time.perf_counter()
+        try:
+            response = await resilient_call(
+                model,
+                lambda on_acquired: limited_call(
+                    model, tokens, lambda: runnable.ainvoke(messages), _total_tokens, on_acquired
+                )
+            )
+        except Exception as e:
+            LLM_ERRORS.inc(name, model, type(e).__name__)
+            raise
+        LLM_CALL_DURATION.observe(time.perf_counter() - start, name, model)
+        usage = record_usage(name, response)
+        await account_usage(model, usage)
+        for kind in ("input_tokens", "output_tokens", "cached_tokens"):
+            if usage[kind]:
+                LLM_TOKENS.inc(name, model, kind.split("_")[0], amount=usage[kind])
+        set_span_attributes(
+            input_tokens=usage["input_tokens"], output_tokens=usage["output_tokens"], cached_tokens=usage["cached_tokens"]
+        )
+        return response
+
+    # 合并到其他相同请求的调用同样有span，但没有token属性
+    with span(f"llm.{name}", module=name, model=model):
+        return await singleflight(request_key(llm, messages, **kwargs), call)
@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# 并发限制配置（所有模型的默认值，可通过 LLM_LIMITER_MODELS 按模型覆盖）
+LLM_LIMITER_ENABLED = os.getenv("LLM_LIMITER_ENABLED", "true").lower() == "true"
+LLM_LIMITER_INITIAL_CONCURRENCY = float(os.getenv("LLM_LIMITER_INITIAL_CONCURRENCY", "8"))
+LLM_LIMITER_MIN_CONCURRENCY = float(os.getenv("LLM_LIMITER_MIN_CONCURRENCY", "1"))
+LLM_LIMITER_MAX_CONCURRENCY = float(os.getenv("LLM_LIMITER_MAX_CONCURRENCY", "64"))
+LLM_LIMITER_TOKENS_PER_MINUTE = int(os.getenv("LLM_LIMITER_TOKENS_PER_MINUTE", "0"))  # 0表示不限制
+LLM_LIMITER_LATENCY_FACTOR = float(os.getenv("LLM_LIMITER_LATENCY_FACTOR", "2.0"))  # 短期延迟超过基线的倍数时收缩
+# 按模型覆盖，例如 {"gpt-4o": {"max_concurrency": 16, "tokens_per_minute": 200000}}
+LLM_LIMITER_MODELS: Dict[str, Dict[str, float]] = json.loads(os.getenv("LLM_LIMITER_MODELS", "") or "{}")
+
+# 用于计算排队等待时间分位数的最近样本数
+_WAIT_SAMPLES = 1000
+
+
+class TokenBucket:
+    """按每分钟token数补充的令牌桶，允许单个请求透支，透支部分由后续请求等待补齐"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, tokens: int) -> float:
+        """
+        获取满足请求所需的等待秒数，单个请求最多需要一整桶
+
+        Args:
+            tokens: 预估token数
+
+        Returns:
+            等待秒数，0表示可以立即发起
+        """
+        self._refill()
+        needed = min(float(tokens), self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, tokens: int) -> None:
+        """扣除token，实际用量与预估不同时可传入差值（可为负）"""
+        self._refill()
+        self.tokens -= tokens
+
+
+class ModelLimiter:
+    """
+    单个模型的自适应并发限制器
+
+    并发上限按AIMD调整：请求成功且延迟正常时每个完整窗口加1，遇到429或短期平均延迟
+    超过长期基线 LLM_LIMITER_LATENCY_FACTOR 倍时减半（每个延迟周期最多减半一次）。
+    等待中的请求按到达顺序放行。
+    """
+
+    def __init__(
+        self,
+        model: str,
+        initial_concurrency: float = LLM_LIMITER_INITIAL_CONCURRENCY,
+        min_concurrency: float = LLM_LIMITER_MIN_CONCURRENCY,
+        max_concurrency: float = LLM_LIMITER_MAX_CONCURRENCY,
+        tokens_per_minute: int = LLM_LIMITER_TOKENS_PER_MINUTE
+    ):
+        """
+        初始化限制器
+
+        Args:
+            model: 模型名称
+            initial_concurrency: 初始并发上限
+            min_concurrency: 并发上限下限
+            max_concurrency: 并发上限上限
+            tokens_per_minute: 每分钟token上限，0表示不限制
+        """
+        self.model = model
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = float(min_concurrency)
+        self.max_concurrency = float(max_concurrency)
+        self.bucket = TokenBucket(int(tokens_per_minute)) if tokens_per_minute > 0 else None
+
+        self.inflight = 0
+        self._queue: Deque[Tuple[asyncio.Future, int]] = deque()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        self._latency_short: Optional[float] = None
+        self._latency_long: Optional[float] = None
+        self._last_decrease = 0.0
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.decreases = 0
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    def _dispatch(self) -> None:
+        """在并发和令牌桶允许的范围内按顺序放行等待中的请求"""
+        while self._queue and self.inflight < max(int(self.limit), 1):
+            future, tokens = self._queue[0]
+            if future.done():
+                self._queue.popleft()
+                continue
+            if self.bucket is not None:
+                delay = self.bucket.delay(tokens)
+                if delay > 0:
+                    self._schedule_wakeup(delay)
+                    return
+                self.bucket.consume(tokens)
+            self._queue.popleft()
+            self.inflight += 1
+            future.set_result(None)
+
+    def _schedule_wakeup(self, delay: float) -> None:
+        """令牌不足时在补充足够令牌后重新放行"""
+        if self._wakeup is not None and not self._wakeup.cancelled():
+            return
+
+        def wakeup() -> None:
+            self._wakeup = None
+            self._dispatch()
+
+        self._wakeup = asyncio.get_running_loop().call_later(delay, wakeup)
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """
+        排队获取一个并发槽位
+
+        Args:
+            tokens: 预估token数，用于令牌桶
+
+        Returns:
+            排队等待的秒数
+        """
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((future, tokens))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已被放行但调用方随即取消时归还槽位
+            if future.done() and not future.cancelled():
+                self.release(None)
+            raise
+        waited = time.monotonic() - start
+        self._waits.append(waited)
+        return waited
+
+    def release(self, latency: Optional[float], rate_limited: bool = False, token_adjustment: int = 0) -> None:
+        """
+        归还并发槽位并根据本次调用结果调整并发上限
+
+        Args:
+            latency: 调用耗时（秒），None表示调用失败且不计入延迟统计
+            rate_limited: 是否收到429
+            token_adjustment: 实际token用量与预估的差值
+        """
+        saturated = self.inflight >= int(self.limit)
+        self.inflight -= 1
+        self.calls += 1
+        if self.bucket is not None and token_adjustment:
+            self.bucket.consume(token_adjustment)
+
+        now = time.monotonic()
+        if latency is not None and latency > 0:
+            self._latency_short = latency if self._latency_short is None else 0.8 * self._latency_short + 0.2 * latency
+            self._latency_long = latency if self._latency_long is None else 0.98 * self._latency_long + 0.02 * latency
+
+        overloaded = (
+            self._latency_long is not None
+            and self._latency_short > LLM_LIMITER_LATENCY_FACTOR * self._latency_long
+        )
+        if rate_limited:
+            self.rate_limited += 1
+
+        if rate_limited or overloaded:
+            # 同一延迟周期内的多个拥塞信号只减半一次
+            if now - self._last_decrease > (self._latency_short or 1.0):
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self._last_decrease = now
+                self.decreases += 1
+                logger.info(f"模型 {self.model} 并发上限降为 {self.limit:.1f}（{'429' if rate_limited else '延迟升高'}）")
+        elif latency is not None and saturated:
+            # 仅在并发槽位用满时增长，避免空闲期上限无依据地涨到最大值
+            self.limit = min(self.max_concurrency, self.limit + 1 / max(self.limit, 1.0))
+
+        self._dispatch()
+
+    def queue_depth(self) -> int:
+        """排队等待的请求数，不含已取消的请求"""
+        return sum(1 for future, _ in self._queue if not future.done())
+
+    def stats(self) -> Dict[str, Any]:
+        """获取限制器状态与排队指标"""
+        waits = sorted(self._waits)
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "queue_depth": self.queue_depth(),
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "decreases": self.decreases,
+            "latency_short": round(self._latency_short or 0.0, 3),
+            "latency_long": round(self._latency_long or 0.0, 3),
+            "wait_p50": round(waits[len(waits) // 2], 3) if waits else 0.0,
+            "wait_p95": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+            "wait_max": round(waits[-1], 3) if waits else 0.0,
+            "tokens_available": round(self.bucket.tokens) if self.bucket is not None else None
+        }
+
+
+_limiters: Dict[str, ModelLimiter] = {}
+
+
+def get_limiter(model: str) -> ModelLimiter:
+    """
+    获取模型对应的限制器，同一模型的所有调用方共享
+
+    Args:
+        model: 模型名称
+
+    Returns:
+        ModelLimiter实例
+    """
+    limiter = _limiters.get(model)
+    if limiter is None:
+        limiter = ModelLimiter(model, **LLM_LIMITER_MODELS.get(model, {}))
+        _limiters[model] = limiter
+    return limiter
+
+
+def has_spare_capacity(model: str) -> bool:
+    """
+    模型限制器是否没有排队请求且有空闲槽位，即新发起的调用无需排队
+
+    Args:
+        model: 模型名称
+
+    Returns:
+        未启用限制器或模型尚无调用时为True
+    """
+    limiter = _limiters.get(model)
+    if not LLM_LIMITER_ENABLED or limiter is None:
+        return True
+    return limiter.queue_depth() == 0 and limiter.inflight < max(int(limiter.limit), 1)
+
+
+async def limited_call(
+    model: str,
+    tokens: int,
+    call: Callable[[], Awaitable[Any]],
+    usage: Callable[[Any], int],
+    on_acquired: Optional[Callable[[], None]] = None
+) -> Any:
+    """
+    在模型限制器的约束下发起调用
+
+    Args:
+        model: 模型名称
+        tokens: 预估token数
+        call: 发起实际调用的协程函数
+        usage: 从响应中读取实际token用量的函数
+        on_acquired: 获得并发槽位、即将发起调用时的回调
+
+    Returns:
+        调用结果
+    """
+    if not LLM_LIMITER_ENABLED:
+        if on_acquired is not None:
+            on_acquired()
+        return await call()
+
+    limiter = get_limiter(model)
+    await limiter.acquire(tokens)
+    if on_acquired is not None:
+        on_acquired()
+    start = time.monotonic()
+    try:
+        response = await call()
+    except openai.RateLimitError:
+        limiter.release(None, rate_limited=True)
+        raise
+    except BaseException:
+        limiter.release(None)
+        raise
+    actual = usage(response)
+    limiter.release(time.monotonic() - start, token_adjustment=actual - tokens if actual and tokens else 0)
+    return response
+
+
+def get_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取各模型限制器的并发上限、排队深度和等待时间
+
+    Returns:
+        按模型分组的统计字典
+    """
+    return {model: limiter.stats() for model, limiter in _limiters.items()}
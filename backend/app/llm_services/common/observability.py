@@ -0,0 +1,158 @@
+import os
+import queue
+import random
+import logging
+from importlib import metadata
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Langfuse配置，公钥或私钥为空时不上报
+LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY", "")
+LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY", "")
+LANGFUSE_SAMPLE_RATE = float(os.getenv("LANGFUSE_SAMPLE_RATE", "1.0"))  # 上报的链路比例
+LANGFUSE_QUEUE_SIZE = int(os.getenv("LANGFUSE_QUEUE_SIZE", "10000"))  # 待上报事件队列上限，满时丢弃新事件
+LANGFUSE_FLUSH_AT = int(os.getenv("LANGFUSE_FLUSH_AT", "50"))  # 每批上报的事件数
+LANGFUSE_FLUSH_INTERVAL = float(os.getenv("LANGFUSE_FLUSH_INTERVAL", "2.0"))  # 不足一批时的最长上报间隔（秒）
+
+# 收紧上报队列和统计丢弃事件依赖Langfuse SDK TaskManager的内部属性（_ingestion_queue、add_task），
+# 仅在以下主版本中验证过（tests/test_observability.py），其他版本使用SDK默认的队列（10万个事件）
+_SUPPORTED_LANGFUSE_MAJOR_VERSIONS = ("2",)
+
+# 进程内共享的Langfuse客户端；每个 CallbackHandler 单独创建时都会新建客户端、HTTP连接池和上报线程
+_client: Any = None
+_bounded = False
+_disabled = not (LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY)
+
+# 上报统计
+# sampled: 被采样上报的链路数
+# skipped: 未被采样的链路数
+# dropped: 队列已满被丢弃的事件数
+_stats: Dict[str, int] = {"sampled": 0, "skipped": 0, "dropped": 0}
+
+
+def _bound_ingestion_queue(client: Any, size: int) -> bool:
+    """
+    收紧客户端上报队列的上限，并统计队列满时被丢弃的事件
+
+    SDK版本不在 _SUPPORTED_LANGFUSE_MAJOR_VERSIONS 中或内部结构不符时不做修改，只记录警告。
+
+    Args:
+        client: Langfuse客户端
+        size: 队列上限
+
+    Returns:
+        是否已收紧
+    """
+    version = metadata.version("langfuse")
+    task_manager = getattr(client, "task_manager", None)
+    ingestion_queue = getattr(task_manager, "_ingestion_queue", None)
+    add_task = getattr(task_manager, "add_task", None)
+    if (
+        version.split(".")[0] not in _SUPPORTED_LANGFUSE_MAJOR_VERSIONS
+        or not isinstance(ingestion_queue, queue.Queue)
+        or not callable(add_task)
+    ):
+        logger.warning(f"Langfuse {version} 的上报队列结构未经验证，使用SDK默认队列上限，不统计丢弃的事件")
+        return False
+
+    # 上报线程与队列已创建，直接收紧队列上限（默认10万个事件）
+    ingestion_queue.maxsize = size
+
+    def add_task_counting_drops(event: dict):
+        if add_task(event) is False:
+            _stats["dropped"] += 1
+
+    task_manager.add_task = add_task_counting_drops
+    return True
+
+
+def get_langfuse() -> Optional[Any]:
+    """
+    获取共享的Langfuse客户端
+
+    事件写入有界队列后立即返回，由后台线程按批上报；队列满时丢弃新事件并计数，不阻塞请求处理。
+
+    Returns:
+        Langfuse客户端，未配置密钥或初始化失败时返回None
+    """
+    global _client, _bounded, _disabled
+    if _disabled:
+        return None
+    if _client is None:
+        try:
+            from langfuse import Langfuse
+
+            client = Langfuse(
+                public_key=LANGFUSE_PUBLIC_KEY,
+                secret_key=LANGFUSE_SECRET_KEY,
+                flush_at=LANGFUSE_FLUSH_AT,
+                flush_interval=LANGFUSE_FLUSH_INTERVAL,
+                threads=1,
+                sample_rate=1.0  # 采样在创建链路时完成
+            )
+        except Exception as e:
+            logger.warning(f"Langfuse初始化失败，不上报LLM调用链路: {e}")
+            _disabled = True
+            return None
+
+        _bounded = _bound_ingestion_queue(client, LANGFUSE_QUEUE_SIZE)
+        _client = client
+    return _client
+
+
+def langfuse_callbacks(
+    tags: List[str],
+    session_id: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> List[Any]:
+    """
+    创建一条Langfuse链路并返回其LangChain回调
+
+    按 LANGFUSE_SAMPLE_RATE 采样，未被采样时不创建回调，请求处理中没有任何上报开销。
+    同一回调的所有LLM调用归入同一条链路。
+
+    Args:
+        tags: 链路标签，第一个标签同时作为链路名称
+        session_id: 会话ID
+        user_id: 用户ID
+
+    Returns:
+        回调列表，未配置密钥或未被采样时为空列表
+    """
+    client = get_langfuse()
+    if client is None:
+        return []
+    if random.random() >= LANGFUSE_SAMPLE_RATE:
+        _stats["skipped"] += 1
+        return []
+    _stats["sampled"] += 1
+
+    from langfuse.callback import CallbackHandler
+
+    trace = client.trace(name=tags[0] if tags else None, tags=tags, session_id=session_id, user_id=user_id)
+    return [CallbackHandler(stateful_client=trace, update_stateful_client=True)]
+
+
+def shutdown_langfuse() -> None:
+    """上报队列中剩余的事件并停止上报线程，应用关闭时调用"""
+    if _client is not None:
+        _client.shutdown()
+
+
+def get_langfuse_stats() -> Dict[str, Any]:
+    """
+    获取Langfuse上报统计
+
+    Returns:
+        是否启用、采样率、采样/跳过的链路数、丢弃的事件数、队列上限是否生效和当前队列深度
+    """
+    ingestion_queue = getattr(getattr(_client, "task_manager", None), "_ingestion_queue", None)
+    queue_depth = ingestion_queue.qsize() if isinstance(ingestion_queue, queue.Queue) else 0
+    return {
+        "enabled": not _disabled,
+        "sample_rate": LANGFUSE_SAMPLE_RATE,
+        **_stats,
+        "queue_bounded": _bounded,
+        "queue_depth": queue_depth
+    }
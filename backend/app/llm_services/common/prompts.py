@@ -0,0 +1,75 @@
+import re
+import textwrap
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+
+_BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+_PLACEHOLDER_LINE_PATTERN = re.compile(r"^\{(\w+)\}$")
+
+
+def clean_prompt(text: str) -> str:
+    """
+    去除提示词中的偶然空白
+
+    去除f-string缩进带来的公共前导空白、行尾空白以及多余空行，
+    保证相同内容渲染出的提示词逐字节一致，便于服务商前缀缓存命中。
+
+    Args:
+        text: 提示词文本
+
+    Returns:
+        清理后的提示词
+    """
+    text = textwrap.dedent(text or "")
+    text = "\n".join(line.rstrip() for line in text.splitlines())
+    return _BLANK_LINES_PATTERN.sub("\n\n", text).strip()
+
+
+def render_prompt(template: str, **values: str) -> str:
+    """
+    渲染提示词模板
+
+    先清理模板自身的缩进和空白，再填入变量，变量内容（题目、解题过程等）保持原样。
+    仅包含一个变量且该变量为空的模板行（如首次解题时的重试说明）在填入前删除，不留下多余空行。
+    模板中的字面花括号需写成 {{ }}。
+
+    Args:
+        template: 提示词模板
+        **values: 模板变量
+
+    Returns:
+        渲染后的提示词
+    """
+    lines = []
+    for line in clean_prompt(template).splitlines():
+        match = _PLACEHOLDER_LINE_PATTERN.match(line.strip())
+        if match and not values.get(match.group(1)):
+            continue
+        lines.append(line)
+    return clean_prompt("\n".join(lines)).format(**values)
+
+
+def build_messages(system: str, task: str, references: Optional[List[str]] = None) -> List[BaseMessage]:
+    """
+    按"稳定内容在前、可变内容在后"的顺序构建消息列表
+
+    系统提示词、任务说明、输出格式以及较大的参考资料（知识点类别、知识点列表）放在系统消息中，
+    题目、解题过程等每次请求都不同的内容放在用户消息中，使请求前缀在多次调用间保持一致。
+
+    Args:
+        system: 系统提示词与固定的任务说明（会被清理空白）
+        task: 本次请求的可变内容，通常由render_prompt渲染
+        references: 参考资料块，按稳定程度从高到低排列
+
+    Returns:
+        消息列表
+    """
+    blocks = [clean_prompt(system)] + [(block or "").strip() for block in references or []]
+    system_content = "\n\n".join(block for block in blocks if block)
+
+    messages: List[BaseMessage] = []
+    if system_content:
+        messages.append(SystemMessage(content=system_content))
+    messages.append(HumanMessage(content=(task or "").strip()))
+    return messages
@@ -0,0 +1,206 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import openai
+
+from app.core.deadline import get_remaining_seconds
+from app.llm_services.common.limiter import has_spare_capacity
+
+logger = logging.getLogger(__name__)
+
+# 重试与对冲配置
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # 临时错误的最大重试次数
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # 退避基数（秒）
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))  # 单次退避上限（秒）
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "120"))  # 单次调用超时（秒），不超过请求剩余时间
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGING_PERCENTILE = float(os.getenv("LLM_HEDGING_PERCENTILE", "0.95"))  # 超过该分位延迟仍未返回时发起对冲请求
+LLM_HEDGING_MIN_SAMPLES = int(os.getenv("LLM_HEDGING_MIN_SAMPLES", "20"))  # 延迟样本不足时不对冲
+
+# 可重试的临时错误：超时、连接错误、429、5xx
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+_LATENCY_SAMPLES = 200
+
+# 发起一次调用的协程函数，参数为获得限制器槽位时调用的回调
+Attempt = Callable[[Callable[[], None]], Awaitable[Any]]
+
+# 按模型记录的成功调用延迟
+_latencies: Dict[str, Deque[float]] = {}
+
+# 统计：重试次数、对冲次数、对冲请求胜出次数、截止时间耗尽次数
+_stats: Dict[str, int] = {"retries": 0, "hedged": 0, "hedge_wins": 0, "deadline_exceeded": 0}
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """请求剩余时间不足以完成LLM调用"""
+    def __init__(self, message: str = "请求处理时间已用尽，LLM调用未完成"):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _hedge_delay(model: str) -> Optional[float]:
+    """获取模型的对冲延迟（获得槽位后成功调用延迟的分位数），样本不足时返回None"""
+    samples = _latencies.get(model)
+    if not LLM_HEDGING_ENABLED or not samples or len(samples) < LLM_HEDGING_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * LLM_HEDGING_PERCENTILE), len(ordered) - 1)]
+
+
+async def _run_attempt(model: str, attempt: Attempt, started: "asyncio.Future") -> Any:
+    """
+    执行一次调用：在限制器中排队的时间只受请求截止时间约束，获得槽位后才开始计算单次超时，
+    成功时记录获得槽位后的调用延迟
+
+    Args:
+        model: 模型名称
+        attempt: 发起一次调用的协程函数，获得限制器槽位时调用传入的回调
+        started: 获得槽位时设置为当时的 time.monotonic()
+
+    Raises:
+        asyncio.TimeoutError: 获得槽位后超过 LLM_ATTEMPT_TIMEOUT 仍未返回
+        LLMDeadlineExceeded: 排队或调用期间请求剩余时间耗尽
+    """
+    def on_acquired() -> None:
+        if not started.done():
+            started.set_result(time.monotonic())
+
+    task = asyncio.ensure_future(attempt(on_acquired))
+    try:
+        done, _ = await asyncio.wait({task, started}, timeout=get_remaining_seconds(), return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            raise LLMDeadlineExceeded()
+        if not started.done():
+            return task.result()
+
+        remaining = get_remaining_seconds()
+        if remaining is not None and remaining <= 0:
+            raise LLMDeadlineExceeded()
+        timeout = LLM_ATTEMPT_TIMEOUT if remaining is None else min(LLM_ATTEMPT_TIMEOUT, remaining)
+        try:
+            result = await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            if task.done() and not task.cancelled():
+                raise
+            if remaining is not None and timeout >= remaining:
+                raise LLMDeadlineExceeded()
+            raise
+        _latencies.setdefault(model, deque(maxlen=_LATENCY_SAMPLES)).append(time.monotonic() - started.result())
+        return result
+    finally:
+        task.cancel()
+
+
+async def _hedged_attempt(model: str, attempt: Attempt) -> Any:
+    """
+    执行一次带对冲的调用
+
+    首个请求在获得限制器槽位后的对冲延迟内返回时与普通调用完全相同；超过对冲延迟后，
+    若该模型没有排队中的请求且有空闲槽位，再发起一个相同请求，取先成功的结果并取消另一个。
+    限制器有排队或槽位用满时说明容量不足，对冲只会加重排队，因此不发起。两个请求都失败时抛出先完成者的异常。
+
+    Raises:
+        asyncio.TimeoutError: 获得槽位后超过单次超时仍未返回
+        LLMDeadlineExceeded: 请求剩余时间耗尽
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.create_future()
+    primary = asyncio.ensure_future(_run_attempt(model, attempt, started))
+    delay = _hedge_delay(model)
+    if delay is None:
+        return await primary
+
+    pending = {primary}
+    error: Optional[BaseException] = None
+    try:
+        # 从获得槽位开始计算对冲延迟
+        done, _ = await asyncio.wait({primary, started}, return_when=asyncio.FIRST_COMPLETED)
+        if primary in done:
+            return primary.result()
+        done, pending = await asyncio.wait(pending, timeout=max(started.result() + delay - time.monotonic(), 0))
+        if not done:
+            if not has_spare_capacity(model):
+                return await primary
+            _stats["hedged"] += 1
+            logger.info(f"模型 {model} 调用超过 {delay:.1f}s 未返回，发起对冲请求")
+            pending.add(asyncio.ensure_future(_run_attempt(model, attempt, loop.create_future())))
+
+        while True:
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        _stats["hedge_wins"] += 1
+                    return task.result()
+                error = error or task.exception()
+            if not pending:
+                raise error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def resilient_call(model: str, attempt: Attempt) -> Any:
+    """
+    以截止时间、重试和对冲保护一次LLM调用
+
+    每次调用在获得限制器槽位后的超时为 LLM_ATTEMPT_TIMEOUT 与请求剩余时间中的较小值，排队时间只受
+    请求剩余时间约束；临时错误按带抖动的指数退避（full jitter）重试，退避时间超过剩余时间时不再重试；
+    其他错误（如400）直接抛出。
+
+    Args:
+        model: 模型名称，用于按模型统计延迟
+        attempt: 发起一次实际调用的协程函数，接收一个在获得限制器槽位时调用的回调
+
+    Returns:
+        调用结果
+
+    Raises:
+        LLMDeadlineExceeded: 请求剩余时间耗尽
+    """
+    for retry in range(LLM_MAX_RETRIES + 1):
+        remaining = get_remaining_seconds()
+        if remaining is not None and remaining <= 0:
+            _stats["deadline_exceeded"] += 1
+            raise LLMDeadlineExceeded()
+
+        try:
+            return await _hedged_attempt(model, attempt)
+        except LLMDeadlineExceeded:
+            _stats["deadline_exceeded"] += 1
+            raise
+        except TRANSIENT_ERRORS as e:
+            if retry >= LLM_MAX_RETRIES:
+                raise
+
+            backoff = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** retry))
+            remaining = get_remaining_seconds()
+            if remaining is not None and backoff >= remaining:
+                raise
+            _stats["retries"] += 1
+            logger.warning(f"模型 {model} 调用失败（{type(e).__name__}），{backoff:.2f}s 后第 {retry + 1} 次重试")
+            await asyncio.sleep(backoff)
+
+
+def get_resilience_stats() -> Dict[str, Any]:
+    """
+    获取重试、对冲统计以及各模型当前的对冲延迟
+
+    Returns:
+        统计字典
+    """
+    return {
+        **_stats,
+        "hedge_delay": {model: _hedge_delay(model) for model in _latencies}
+    }
@@ -0,0 +1,164 @@
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from langchain_core.messages import convert_to_messages, message_to_dict, messages_from_dict
+
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 请求合并配置
+LLM_SINGLEFLIGHT_ENABLED = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+LLM_SINGLEFLIGHT_REDIS = os.getenv("LLM_SINGLEFLIGHT_REDIS", "false").lower() == "true"  # 跨worker合并
+LLM_SINGLEFLIGHT_LOCK_SECONDS = int(os.getenv("LLM_SINGLEFLIGHT_LOCK_SECONDS", "180"))  # 分布式锁最长持有时间
+LLM_SINGLEFLIGHT_RESULT_SECONDS = int(os.getenv("LLM_SINGLEFLIGHT_RESULT_SECONDS", "10"))  # 结果保留时间，供等待者读取
+
+_POLL_INTERVAL = 0.1
+_KEY_PREFIX = "llm:singleflight"
+
+# 进程内进行中的调用
+_inflight: Dict[str, "asyncio.Task"] = {}
+
+# 合并统计
+# leader: 实际发起的调用数
+# coalesced: 复用进程内进行中调用的请求数
+# remote: 复用其他worker调用结果的请求数
+_stats: Dict[str, int] = {"leader": 0, "coalesced": 0, "remote": 0}
+
+# 仅释放自己持有的锁
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _message_payload(message: Any) -> Dict[str, Any]:
+    """提取消息中参与请求哈希的字段"""
+    return {"type": message.type, "content": message.content}
+
+
+def request_key(llm: Any, messages: Any, **kwargs: Any) -> str:
+    """
+    计算LLM请求的规范化哈希
+
+    由服务地址、模型、采样参数、调用参数（如response_format）和消息内容共同决定，
+    JSON序列化时对键排序，保证内容相同的请求得到相同的哈希。
+
+    Args:
+        llm: ChatOpenAI实例
+        messages: 消息列表或提示词字符串
+        **kwargs: 调用时绑定的额外参数
+
+    Returns:
+        十六进制哈希字符串
+    """
+    payload = {
+        "base_url": str(getattr(llm, "openai_api_base", "") or ""),
+        "model": getattr(llm, "model_name", ""),
+        "temperature": getattr(llm, "temperature", None),
+        "max_tokens": getattr(llm, "max_tokens", None),
+        "kwargs": kwargs,
+        "messages": [_message_payload(m) for m in convert_to_messages(messages)]
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+async def _run_local(key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    进程内合并：同一key只有一个进行中的调用，其余请求等待其结果
+
+    调用在独立的Task中执行并被shield保护，单个等待者被取消（如客户端断开）不会影响其他等待者。
+    """
+    task = _inflight.get(key)
+    if task is None:
+        _stats["leader"] += 1
+        task = asyncio.ensure_future(call())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        _stats["coalesced"] += 1
+        logger.debug(f"合并进行中的LLM请求: {key[:12]}")
+    return await asyncio.shield(task)
+
+
+async def _run_distributed(redis: Any, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    跨worker合并：通过Redis锁选出一个worker发起调用，结果短暂写入Redis供其他worker读取
+
+    锁持有者失败或超时时，等待者自行发起调用。Redis不可用时退回普通调用。
+    """
+    lock_key = f"{_KEY_PREFIX}:lock:{key}"
+    result_key = f"{_KEY_PREFIX}:result:{key}"
+
+    try:
+        cached = await redis.get(result_key)
+        if cached is None:
+            token = uuid.uuid4().hex
+            if await redis.set(lock_key, token, nx=True, ex=LLM_SINGLEFLIGHT_LOCK_SECONDS):
+                try:
+                    response = await call()
+                    await redis.set(
+                        result_key,
+                        json.dumps(message_to_dict(response), ensure_ascii=False),
+                        ex=LLM_SINGLEFLIGHT_RESULT_SECONDS
+                    )
+                    return response
+                finally:
+                    await redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+
+            # 其他worker正在调用，轮询结果直到锁释放
+            while cached is None and await redis.exists(lock_key):
+                await asyncio.sleep(_POLL_INTERVAL)
+                cached = await redis.get(result_key)
+            if cached is None:
+                cached = await redis.get(result_key)
+    except Exception as e:
+        logger.warning(f"Redis请求合并不可用，直接调用: {e}")
+        return await call()
+
+    if cached is None:
+        return await call()
+
+    _stats["remote"] += 1
+    return messages_from_dict([json.loads(cached)])[0]
+
+
+async def singleflight(key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    合并相同key的并发调用
+
+    进程内总是合并；启用 LLM_SINGLEFLIGHT_REDIS 且Redis可用时，进程内的leader再通过Redis锁
+    与其他worker合并。调用失败时异常会传递给所有等待者。
+
+    Args:
+        key: 请求哈希，通常由request_key计算
+        call: 发起实际调用的协程函数，返回LLM响应消息
+
+    Returns:
+        LLM响应消息
+    """
+    if not LLM_SINGLEFLIGHT_ENABLED:
+        return await call()
+
+    redis = get_redis() if LLM_SINGLEFLIGHT_REDIS else None
+    if redis is None:
+        return await _run_local(key, call)
+    return await _run_local(key, lambda: _run_distributed(redis, key, call))
+
+
+def get_singleflight_stats() -> Dict[str, int]:
+    """
+    获取请求合并统计
+
+    Returns:
+        包含 leader、coalesced、remote 的字典
+    """
+    return dict(_stats)
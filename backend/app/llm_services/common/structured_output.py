@@ -0,0 +1,356 @@
+import os
+import re
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import openai
+
+from app.llm_services.common.invoke import ainvoke_llm
+
+logger = logging.getLogger(__name__)
+
+# 结构化输出模式：json_schema（按Schema约束输出）、json_object（JSON模式）、off（仅依赖提示词）
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "json_object").lower()
+
+# JSON合法的转义字符
+_VALID_ESCAPES = set('"\\/bfnrtu')
+
+# 以JSON合法转义字符 b、f、n、r、t 开头的常见LaTeX命令
+# 模型常把 \frac、\theta 直接写进JSON字符串，严格解析会将其误解码为换页符、制表符等控制字符
+_LATEX_COMMANDS = frozenset({
+    "backslash", "bar", "because", "begin", "beta", "big", "bigcap", "bigcup", "bigg", "bigl", "bigr",
+    "binom", "bf", "bmod", "boldsymbol", "bot", "boxed", "breve", "bullet",
+    "flat", "forall", "frac", "frown",
+    "nabla", "ne", "neg", "neq", "newline", "ngeq", "ni", "nleq", "nmid", "nolimits", "not", "notin",
+    "nparallel", "nsubseteq", "nu",
+    "rangle", "rceil", "rfloor", "rho", "right", "rightarrow", "rightleftharpoons", "rm", "rvert",
+    "tan", "tanh", "tau", "tbinom", "text", "textbf", "textit", "textrm", "tfrac", "therefore", "theta",
+    "tilde", "times", "to", "top", "triangle",
+})
+
+# 未被转义的反斜杠（前面有偶数个反斜杠）及其后的字母串
+_LATEX_PATTERN = re.compile(r"(?<!\\)((?:\\\\)*)\\([A-Za-z]+)")
+
+# 解析结果统计
+# strict: 原始文本可直接被json.loads解析（旧实现也能成功）
+# repaired: 旧实现会解析失败，经容错修复后成功
+# failed: 修复后仍无法解析
+_parse_stats: Dict[str, Dict[str, int]] = {}
+
+# 不支持response_format参数的(模型, 模式)组合，避免重复请求失败
+_unsupported_formats: Set[Tuple[str, str]] = set()
+
+
+class JSONRepairError(ValueError):
+    """JSON修复失败异常"""
+    def __init__(self, message: str = "无法从模型输出中解析出JSON"):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _strip_code_fence(text: str) -> str:
+    """
+    去除Markdown代码块标记
+
+    Args:
+        text: 模型输出文本
+
+    Returns:
+        去除代码块标记后的文本
+    """
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def _protect_latex(text: str) -> str:
+    """
+    对与JSON转义冲突的LaTeX命令的反斜杠加倍
+
+    仅处理 _LATEX_COMMANDS 中的完整命令，真正的 \\n、\\t 等转义保持不变。
+
+    Args:
+        text: 模型输出文本
+
+    Returns:
+        处理后的文本
+    """
+    def _escape(match: "re.Match[str]") -> str:
+        if match.group(2) in _LATEX_COMMANDS:
+            return f"{match.group(1)}\\\\{match.group(2)}"
+        return match.group(0)
+
+    return _LATEX_PATTERN.sub(_escape, text)
+
+
+def _loads_strict(text: str) -> Any:
+    """
+    严格解析JSON，解析前保护与JSON转义冲突的LaTeX命令
+
+    Args:
+        text: 去除代码块标记后的文本
+
+    Returns:
+        解析后的Python对象
+
+    Raises:
+        json.JSONDecodeError: 文本不是合法JSON
+    """
+    return json.loads(_protect_latex(text))
+
+
+def _repair(text: str) -> str:
+    """
+    逐字符扫描并修复常见的JSON格式问题
+
+    处理内容：
+    1. 字符串中的非法转义（如LaTeX的 \\alpha、\\frac），只对非法或疑似LaTeX命令的反斜杠加倍
+    2. 注释（// 与 #）、尾随逗号
+    3. Python风格的 True/False/None
+    4. 被截断的输出：补全未闭合的字符串和括号
+    5. 忽略JSON结构之后的多余文本
+
+    Args:
+        text: 以 { 或 [ 开头的文本
+
+    Returns:
+        修复后的JSON文本
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    i = 0
+    n = len(text)
+
+    while i < n:
+        ch = text[i]
+
+        if in_string:
+            if ch == "\\":
+                nxt = text[i + 1] if i + 1 < n else ""
+                if nxt == "u" and len(text) >= i + 6 and all(c in "0123456789abcdefABCDEF" for c in text[i + 2:i + 6]):
+                    out.append(text[i:i + 6])
+                    i += 6
+                    continue
+                # \f、\n、\t、\b、\r 开头的已知LaTeX命令（\frac、\nabla、\times、\beta、\rho）按字面保留
+                if nxt in _VALID_ESCAPES and nxt != "u" and not (nxt in "bfnrt" and _latex_command_at(text, i + 1)):
+                    out.append(ch + nxt)
+                    i += 2
+                    continue
+                out.append("\\\\")
+                i += 1
+                continue
+            if ch == '"':
+                in_string = False
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                break
+        elif ch == "#" or text.startswith("//", i):
+            # 跳过注释直到行尾
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append({"True": "true", "False": "false", "None": "null"}.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    # 补全被截断的输出
+    if in_string:
+        out.append('"')
+    while stack:
+        _drop_trailing_comma(out)
+        if "".join(out).rstrip().endswith(":"):
+            out.append("null")
+        out.append(stack.pop())
+
+    return "".join(out)
+
+
+def _latex_command_at(text: str, start: int) -> bool:
+    """判断 text[start:] 开头的ASCII字母串是否为已知LaTeX命令"""
+    end = start
+    while end < len(text) and text[end].isascii() and text[end].isalpha():
+        end += 1
+    return text[start:end] in _LATEX_COMMANDS
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    """去除输出缓冲区末尾的逗号（忽略空白）"""
+    idx = len(out) - 1
+    while idx >= 0 and out[idx].strip() == "":
+        idx -= 1
+    if idx >= 0 and out[idx] == ",":
+        del out[idx]
+
+
+def repair_json(text: str) -> Any:
+    """
+    容错解析模型输出的JSON
+
+    先尝试严格解析（保护与JSON转义冲突的LaTeX命令），失败后定位第一个JSON结构并进行增量修复。
+
+    Args:
+        text: 模型输出文本
+
+    Returns:
+        解析后的Python对象
+
+    Raises:
+        JSONRepairError: 修复后仍无法解析
+    """
+    cleaned = _strip_code_fence(text or "")
+    try:
+        return _loads_strict(cleaned)
+    except json.JSONDecodeError:
+        pass
+
+    starts = [idx for idx in (cleaned.find("{"), cleaned.find("[")) if idx >= 0]
+    if not starts:
+        raise JSONRepairError()
+
+    try:
+        return json.loads(_repair(cleaned[min(starts):]), strict=False)
+    except json.JSONDecodeError as e:
+        raise JSONRepairError(f"JSON修复失败: {e}")
+
+
+def parse_json_output(text: str, caller: str) -> Optional[Any]:
+    """
+    解析模型输出的JSON并记录解析结果统计
+
+    Args:
+        text: 模型输出文本
+        caller: 调用方名称（review、retriever、extractor等），用于统计
+
+    Returns:
+        解析后的Python对象，解析失败返回None
+    """
+    stats = _parse_stats.setdefault(caller, {"strict": 0, "repaired": 0, "failed": 0})
+
+    try:
+        result = _loads_strict(_strip_code_fence(text or ""))
+        stats["strict"] += 1
+        return result
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        result = repair_json(text)
+        stats["repaired"] += 1
+        logger.info(f"[{caller}] 模型输出经修复后解析成功")
+        return result
+    except JSONRepairError as e:
+        stats["failed"] += 1
+        logger.error(f"[{caller}] {e.message}, content: {text}")
+        return None
+
+
+def get_parse_stats() -> Dict[str, Dict[str, int]]:
+    """
+    获取JSON解析结果统计
+
+    对于审查节点，解析失败会触发一次额外的解题+审查：
+    旧实现下因解析失败触发的重试次数 = repaired + failed，当前为 failed。
+
+    Returns:
+        按调用方分组的统计字典
+    """
+    return {caller: dict(stats) for caller, stats in _parse_stats.items()}
+
+
+def _response_format(mode: str, name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    构建OpenAI格式的response_format参数
+
+    Args:
+        mode: 结构化输出模式
+        name: Schema名称
+        schema: JSON Schema
+
+    Returns:
+        response_format参数字典
+    """
+    if mode == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": name, "schema": schema, "strict": True}
+        }
+    return {"type": "json_object"}
+
+
+def _is_response_format_error(error: openai.BadRequestError) -> bool:
+    """
+    判断400错误是否由服务商不支持response_format参数引起
+
+    依次检查错误的param、code和message，其他参数错误（如上下文超长）不应触发降级。
+
+    Args:
+        error: OpenAI客户端抛出的BadRequestError
+
+    Returns:
+        是否为response_format相关错误
+    """
+    fields = (getattr(error, "param", None), getattr(error, "code", None), getattr(error, "message", None) or str(error))
+    text = " ".join(str(field) for field in fields if field).lower()
+    return any(keyword in text for keyword in ("response_format", "json_schema", "json_object"))
+
+
+async def ainvoke_json(llm: Any, messages: Any, name: str, schema: Dict[str, Any]) -> Tuple[Optional[Any], Any]:
+    """
+    以结构化输出方式调用LLM并解析JSON
+
+    优先使用服务商的JSON模式/Schema约束输出；服务商不支持时自动降级为普通调用，
+    最终统一通过容错解析器解析。
+
+    Args:
+        llm: ChatOpenAI实例
+        messages: 消息列表或提示词字符串
+        name: 调用方名称，同时作为Schema名称
+        schema: 期望输出的JSON Schema（顶层必须为object）
+
+    Returns:
+        (解析结果, 原始响应) 元组，解析失败时解析结果为None
+    """
+    mode = LLM_STRUCTURED_OUTPUT
+    model = getattr(llm, "model_name", "")
+
+    if mode in ("json_schema", "json_object") and (model, mode) not in _unsupported_formats:
+        try:
+            response = await ainvoke_llm(llm, messages, name, response_format=_response_format(mode, name, schema))
+        except openai.BadRequestError as e:
+            if not _is_response_format_error(e):
+                raise
+            logger.warning(f"模型 {model} 不支持 {mode} 结构化输出，降级为普通调用: {e}")
+            _unsupported_formats.add((model, mode))
+            response = await ainvoke_llm(llm, messages, name)
+    else:
+        response = await ainvoke_llm(llm, messages, name)
+
+    return parse_json_output(response.content, name), response
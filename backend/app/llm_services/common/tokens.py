@@ -0,0 +1,47 @@
+import re
+
+# CJK统一表意文字及全角标点
+_CJK_PATTERN = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的token数量
+
+    不依赖具体模型的分词器：中文字符按每字约1个token，其余字符按约4个字符1个token估算。
+
+    Args:
+        text: 待估算的文本
+
+    Returns:
+        估算的token数量
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    other_count = len(text) - cjk_count
+    return cjk_count + (other_count + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    截取估算token数不超过上限的最长前缀
+
+    Args:
+        text: 待截取的文本
+        max_tokens: token上限
+
+    Returns:
+        截取后的文本
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 前缀越长估算值越大，二分查找最长的满足条件的前缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
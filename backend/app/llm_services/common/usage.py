@@ -0,0 +1,80 @@
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# 按调用方汇总的token用量
+_usage_stats: Dict[str, Dict[str, int]] = {}
+
+
+def extract_usage(response: Any) -> Dict[str, int]:
+    """
+    从LLM响应中提取token用量
+
+    优先读取langchain标准化的usage_metadata，缓存命中数缺失时回退到服务商原始字段
+    （OpenAI的prompt_tokens_details.cached_tokens，DeepSeek的prompt_cache_hit_tokens）。
+
+    Args:
+        response: LLM响应消息
+
+    Returns:
+        包含 input_tokens、output_tokens、cached_tokens 的字典
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", 0) or 0
+    output_tokens = usage.get("output_tokens", 0) or 0
+    cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    if not input_tokens:
+        input_tokens = token_usage.get("prompt_tokens", 0) or 0
+    if not output_tokens:
+        output_tokens = token_usage.get("completion_tokens", 0) or 0
+    if not cached_tokens:
+        cached_tokens = (
+            (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            or token_usage.get("prompt_cache_hit_tokens")
+            or 0
+        )
+
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": cached_tokens
+    }
+
+
+def record_usage(caller: str, response: Any) -> Dict[str, int]:
+    """
+    记录一次LLM调用的token用量
+
+    Args:
+        caller: 调用方名称（solve、review、retriever、extractor、vlm等）
+        response: LLM响应消息
+
+    Returns:
+        本次调用的token用量
+    """
+    usage = extract_usage(response)
+    stats = _usage_stats.setdefault(
+        caller, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+    )
+    stats["calls"] += 1
+    for key, value in usage.items():
+        stats[key] += value
+
+    logger.debug(
+        f"[{caller}] 输入 {usage['input_tokens']} tokens（缓存命中 {usage['cached_tokens']}），"
+        f"输出 {usage['output_tokens']} tokens"
+    )
+    return usage
+
+
+def get_usage_stats() -> Dict[str, Dict[str, int]]:
+    """
+    获取按调用方汇总的token用量，cached_tokens / input_tokens 即前缀缓存命中率
+
+    Returns:
+        按调用方分组的用量统计
+    """
+    return {caller: dict(stats) for caller, stats in _usage_stats.items()}
@@ -8,7 +8,7 @@ from typing import Optional, Tuple, Union, Literal
 
 from langchain_openai import ChatOpenAI
 from langchain.schema.messages import HumanMessage, SystemMessage
-from langfuse.callback import CallbackHandler
+from app.llm_services.common import ainvoke_llm, get_http_async_client, langfuse_callbacks, LLMDeadlineExceeded
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -125,12 +125,13 @@ class ImageProcessor:
             max_image_size: 最大处理图片大小（字节），默认20MB
             strict_format_check: 是否启用严格的图像格式检查，启用后对未知格式将抛出异常
         """
-        self.langfuse_handler = CallbackHandler(tags=["VLM"])
         self.vlm = ChatOpenAI(
             api_key=api_key or OPENAI_API_KEY,
             base_url=api_base or OPENAI_API_BASE,
             model_name=model_name or OPENAI_VLM_MODEL,
-            callbacks=[self.langfuse_handler]
+            callbacks=langfuse_callbacks(["VLM"]),
+            http_async_client=get_http_async_client(),
+            max_retries=0  # 重试由 common.resilience 统一处理
         )
         self.max_image_size = max_image_size
         self.strict_format_check = strict_format_check
@@ -285,7 +286,7 @@ class ImageProcessor:
 
             # 异步调用VLM提取文本
             return await self.process_image_base64(base64_image, mime_type, mode)
-        except (ImagePathError, ImageSizeExceededError, ImageFormatError, ImageReadError, InvalidBase64Error) as e:
+        except (ImagePathError, ImageSizeExceededError, ImageFormatError, ImageReadError, InvalidBase64Error, LLMDeadlineExceeded) as e:
             # 已知的特定异常，直接抛出
             raise
         except Exception as e:
@@ -352,10 +353,13 @@ class ImageProcessor:
             ]
 
             # 异步调用VLM
-            response = await self.vlm.ainvoke(messages)
+            response = await ainvoke_llm(self.vlm, messages, "vlm")
 
             # 返回内容
             return response.content
+        except LLMDeadlineExceeded:
+            # 请求时限耗尽，由应用返回504
+            raise
         except Exception as e:
             logger.error(f"处理base64图像时出错: {str(e)}")
             raise ImageProcessingAPIError(str(e))
@@ -393,7 +397,7 @@ class ImageProcessor:
 
             # 异步调用VLM提取文本
             return await self.process_image_base64(base64_image, mime_type, mode)
-        except (ImageSizeExceededError, InvalidBase64Error) as e:
+        except (ImageSizeExceededError, InvalidBase64Error, LLMDeadlineExceeded) as e:
             # 已知的特定异常，直接抛出
             raise
         except Exception as e:
@@ -4,7 +4,7 @@ import logging
 from typing import Dict, List, Optional, Tuple
 from langchain.schema import Document
 from langchain_openai import ChatOpenAI
-from langfuse.callback import CallbackHandler
+from app.llm_services.common import ainvoke_json, build_messages, clean_prompt, render_prompt, get_http_async_client, langfuse_callbacks
 
 logger = logging.getLogger(__name__)
 # 从环境变量获取配置
@@ -12,6 +12,71 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
 OPENAI_LLM_MODEL = os.getenv("OPENAI_LLM_MODEL", "deepseek-v3-250324")
 
+# 知识点标记系统提示词
+LLM_MARK_SYSTEM_PROMPT = os.getenv("LLM_Mark_SYSTEM_PROMPT", "")
+
+# 解题过程知识点提取的任务说明（固定内容，放在系统消息中）
+EXTRACT_INSTRUCTION = clean_prompt("""
+    分析用户给出的题目及其解题过程，识别其中用到的知识点，并区分已有知识点和新知识点。
+
+    请完成两项任务：
+    1. 从已有知识点列表中，识别出解题过程中实际使用到的知识点ID列表
+    2. 识别解题过程中用到但不在已有列表中的新知识点
+
+    请以JSON格式返回：
+    {
+        "used_existing_knowledge_points": [已使用的已有知识点ID列表],
+        "new_knowledge_points": [
+            {
+                "subject": "科目",
+                "chapter": "章节",
+                "section": "小节",
+                "item": "知识点名称",
+                "details": "知识点详细说明"
+            }
+        ]
+    }
+
+    如果没有已有知识点被使用，"used_existing_knowledge_points"应为空数组。
+    如果没有新知识点被识别，"new_knowledge_points"应为空数组。
+    """)
+
+EXTRACT_TASK_TEMPLATE = """
+    题目：
+    {question}
+
+    解题过程：
+    {solution}
+    """
+
+# 解题过程知识点提取结果的JSON Schema
+KNOWLEDGE_EXTRACT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "used_existing_knowledge_points": {
+            "type": "array",
+            "items": {"type": "integer"}
+        },
+        "new_knowledge_points": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "subject": {"type": "string"},
+                    "chapter": {"type": "string"},
+                    "section": {"type": "string"},
+                    "item": {"type": "string"},
+                    "details": {"type": "string"}
+                },
+                "required": ["subject", "chapter", "section", "item", "details"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["used_existing_knowledge_points", "new_knowledge_points"],
+    "additionalProperties": False
+}
+
 class KnowledgeExtractor:
     def __init__(self, api_key: Optional[str] = None, api_base: Optional[str] = None, model_name: Optional[str] = None):
         """
@@ -22,12 +87,13 @@ class KnowledgeExtractor:
             api_base: API基础URL，默认从环境变量获取
             model_name: 模型名称，默认从环境变量获取
         """
-        self.langfuse_handler = CallbackHandler(tags=["知识点提取"])
         self.llm = ChatOpenAI(
             api_key=api_key or OPENAI_API_KEY,
             base_url=api_base or OPENAI_API_BASE,
             model_name=model_name or OPENAI_LLM_MODEL,
-            callbacks=[self.langfuse_handler]
+            callbacks=langfuse_callbacks(["知识点提取"]),
+            http_async_client=get_http_async_client(),
+            max_retries=0  # 重试由 common.resilience 统一处理
         )
     
     def extract_subject_info(self, question_text: str) -> Dict[str, str]:
@@ -243,65 +309,31 @@ class KnowledgeExtractor:
                 for i, point in enumerate(existing_knowledge_points)
             ])
         
-        prompt = f"""分析以下题目的解题过程，识别其中用到的知识点，并区分已有知识点和新知识点。
+        # 固定的任务说明和已有知识点列表在前，题目和解题过程在后，便于服务商前缀缓存命中
+        messages = build_messages(
+            system=f"{LLM_MARK_SYSTEM_PROMPT}\n\n{EXTRACT_INSTRUCTION}",
+            references=[existing_points_text],
+            task=render_prompt(EXTRACT_TASK_TEMPLATE, question=question_text, solution=solution_text)
+        )
 
-题目：
-{question_text}
+        # 异步调用LLM，优先使用结构化输出
+        result, _ = await ainvoke_json(self.llm, messages, "extractor", KNOWLEDGE_EXTRACT_SCHEMA)
 
-解题过程：
-{solution_text}
+        if not isinstance(result, dict):
+            # 如果解析失败，返回空结果
+            return [], []
 
-{existing_points_text}
+        # 查找并返回已使用的已有知识点
+        used_existing_points = []
+        if existing_knowledge_points:
+            # 创建ID到知识点的映射
+            id_to_point = {point['id']: point for point in existing_knowledge_points}
+            # 获取使用的知识点ID
+            used_ids = result.get('used_existing_knowledge_points', [])
+            # 收集已使用的知识点详情
+            used_existing_points = [id_to_point[point_id] for point_id in used_ids if point_id in id_to_point]
 
-请完成两项任务：
-1. 从已有知识点列表中，识别出解题过程中实际使用到的知识点ID列表
-2. 识别解题过程中用到但不在已有列表中的新知识点
+        # 获取新识别的知识点
+        new_points = [point for point in result.get('new_knowledge_points', []) if isinstance(point, dict)]
 
-请以JSON格式返回：
-{{
-    "used_existing_knowledge_points": [已使用的已有知识点ID列表],
-    "new_knowledge_points": [
-        {{
-            "subject": "科目",
-            "chapter": "章节",
-            "section": "小节",
-            "item": "知识点名称",
-            "details": "知识点详细说明"
-        }}
-    ]
-}}
-
-如果没有已有知识点被使用，"used_existing_knowledge_points"应为空数组。
-如果没有新知识点被识别，"new_knowledge_points"应为空数组。
-"""
-        
-        # 确保等待LLM响应完成
-        response = await self.llm.ainvoke(prompt)
-
-        #处理llm响应，使其符合json格式
-        response.content = response.content.replace("```json", "").replace("```", "")
-        
-        # 解析JSON响应
-        try:
-            result = json.loads(response.content)
-            
-            # 查找并返回已使用的已有知识点
-            used_existing_points = []
-            if existing_knowledge_points:
-                # 创建ID到知识点的映射
-                id_to_point = {point['id']: point for point in existing_knowledge_points}
-                # 获取使用的知识点ID
-                used_ids = result.get('used_existing_knowledge_points', [])
-                # 收集已使用的知识点详情
-                used_existing_points = [id_to_point[point_id] for point_id in used_ids if point_id in id_to_point]
-            
-            # 获取新识别的知识点
-            new_points = result.get('new_knowledge_points', [])
-            
-            return used_existing_points, new_points
-            
-        except json.JSONDecodeError:
-            # log
-            logger.error(f"解析失败:result {result}, content {response.content}")
-            # 如果解析失败，返回空结果
-            return [], []
\ No newline at end of file
+        return used_existing_points, new_points
@@ -1,3 +1,27 @@
 from app.llm_services.knowledge_retriever.retriever import LLMKnowledgeRetriever
+from app.llm_services.knowledge_retriever.category_index import (
+    CategoryIndex,
+    get_category_index,
+    refresh_category_index,
+    LLM_RETRIEVER_TOP_K
+)
+from app.llm_services.knowledge_retriever.classifier import (
+    CategoryClassifier,
+    get_category_classifier,
+    train_classifier_sample,
+    warm_category_classifier,
+    LLM_CLASSIFIER_ENABLED
+)
 
-__all__ = ["LLMKnowledgeRetriever"] 
\ No newline at end of file
+__all__ = [
+    "LLMKnowledgeRetriever",
+    "CategoryIndex",
+    "get_category_index",
+    "refresh_category_index",
+    "LLM_RETRIEVER_TOP_K",
+    "CategoryClassifier",
+    "get_category_classifier",
+    "train_classifier_sample",
+    "warm_category_classifier",
+    "LLM_CLASSIFIER_ENABLED"
+]
\ No newline at end of file
@@ -0,0 +1,295 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.knowledge import KnowledgeCategoryEmbedding, KnowledgePoint
+from app.llm_services.common import get_http_async_client
+
+logger = logging.getLogger(__name__)
+
+# 从环境变量获取配置
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "")
+
+# 送入检索LLM的候选知识点类别数量，0表示不做预筛选
+LLM_RETRIEVER_TOP_K = int(os.getenv("LLM_RETRIEVER_TOP_K", "50"))
+# 后台同步数据库中全部知识点类别的间隔（秒），补齐其他worker新建的类别
+LLM_CATEGORY_INDEX_REFRESH_SECONDS = float(os.getenv("LLM_CATEGORY_INDEX_REFRESH_SECONDS", "600"))
+
+# (科目, 章节, 小节)
+Category = Tuple[str, str, str]
+
+
+def category_text(category: Category) -> str:
+    """知识点类别用于向量化的文本"""
+    return " / ".join(category)
+
+
+class CategoryIndex:
+    """
+    知识点类别向量索引
+
+    每个(科目, 章节, 小节)在首次出现时计算一次向量，以float32字节持久化到
+    knowledge_category_embeddings 表，并常驻内存中的NumPy矩阵（行已归一化），
+    检索时通过一次矩阵乘法计算余弦相似度并取top-k。加载持久化向量和补齐全部类别由后台任务完成，
+    请求只调用 search。
+    """
+
+    def __init__(self, embeddings, model_name: str = ""):
+        """
+        初始化类别索引
+
+        Args:
+            embeddings: 实现 aembed_documents / aembed_query 的向量模型（langchain Embeddings接口）
+            model_name: 向量模型名称，用于区分不同模型计算的向量
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self._keys: List[Category] = []
+        self._positions: Dict[Category, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _append(self, keys: Sequence[Category], vectors: np.ndarray) -> None:
+        """
+        追加向量到内存矩阵，容量按倍数扩展以摊销复制开销
+
+        Args:
+            keys: 类别列表
+            vectors: 对应的向量矩阵 (n, d)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        if self._matrix is None:
+            self._matrix = np.empty((max(len(keys), 64), vectors.shape[1]), dtype=np.float32)
+        needed = self._size + len(keys)
+        if needed > self._matrix.shape[0]:
+            grown = np.empty((max(needed, self._matrix.shape[0] * 2), self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+        self._matrix[self._size:needed] = vectors
+        for offset, key in enumerate(keys):
+            self._positions[key] = self._size + offset
+            self._keys.append(key)
+        self._size = needed
+
+    @property
+    def ready(self) -> bool:
+        """是否已加载持久化的向量并补齐数据库中的全部类别"""
+        return self._loaded
+
+    def read_persisted(self, db: Session) -> Tuple[List[Category], Optional[np.ndarray]]:
+        """
+        从数据库读取已持久化的类别向量，不修改索引，可在线程池中执行
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            (类别列表, 向量矩阵)，没有持久化的向量时矩阵为None
+        """
+        rows = db.query(KnowledgeCategoryEmbedding).filter(
+            KnowledgeCategoryEmbedding.model == self.model_name
+        ).all()
+        keys = [(row.subject, row.chapter, row.section) for row in rows]
+        if not rows:
+            return keys, None
+        return keys, np.stack([np.frombuffer(row.embedding, dtype=np.float32) for row in rows])
+
+    def load(self, keys: Sequence[Category], vectors: Optional[np.ndarray]) -> None:
+        """
+        将 read_persisted 读取的向量加入索引，跳过已在索引中的类别
+
+        Args:
+            keys: 类别列表
+            vectors: 对应的向量矩阵
+        """
+        if vectors is not None:
+            rows = [i for i, key in enumerate(keys) if key not in self._positions]
+            if rows:
+                self._append([keys[i] for i in rows], vectors[rows])
+        logger.info(f"已加载 {len(keys)} 个知识点类别向量")
+
+    def mark_ready(self) -> None:
+        """标记已加载持久化的向量并补齐数据库中的全部类别，由后台同步任务调用"""
+        self._loaded = True
+
+    def _persist(self, keys: Sequence[Category], vectors: np.ndarray) -> None:
+        """
+        使用独立的数据库会话持久化类别向量，在线程池中执行
+
+        Args:
+            keys: 类别列表
+            vectors: 对应的向量矩阵
+        """
+        db = SessionLocal()
+        try:
+            for category, vector in zip(keys, vectors):
+                db.add(KnowledgeCategoryEmbedding(
+                    subject=category[0],
+                    chapter=category[1],
+                    section=category[2],
+                    model=self.model_name,
+                    embedding=vector.tobytes()
+                ))
+            db.commit()
+        except Exception as e:
+            # 其他worker可能已写入相同类别，向量仍可在本进程内使用
+            db.rollback()
+            logger.warning(f"持久化知识点类别向量失败: {e}")
+        finally:
+            db.close()
+
+    async def add_categories(self, categories: Sequence[Category], persist: bool = False) -> int:
+        """
+        为尚未建立索引的类别计算向量并加入索引
+
+        Args:
+            categories: 类别列表
+            persist: 是否同时持久化向量（在线程池中使用独立会话写入）
+
+        Returns:
+            新增的类别数量
+        """
+        async with self._lock:
+            missing = list(dict.fromkeys(c for c in categories if c not in self._positions))
+            if not missing:
+                return 0
+
+            vectors = np.asarray(
+                await self.embeddings.aembed_documents([category_text(c) for c in missing]),
+                dtype=np.float32
+            )
+            self._append(missing, vectors)
+
+        if persist:
+            await asyncio.to_thread(self._persist, missing, vectors)
+        return len(missing)
+
+    async def search(
+        self,
+        question_text: str,
+        k: int,
+        candidates: Optional[Sequence[Category]] = None
+    ) -> List[Category]:
+        """
+        按余弦相似度检索与题目最相关的k个类别
+
+        Args:
+            question_text: 题目文本
+            k: 返回数量
+            candidates: 限定的候选类别，None表示索引中的全部类别
+
+        Returns:
+            按相似度从高到低排序的类别列表
+        """
+        if self._size == 0:
+            return []
+
+        query = np.asarray(await self.embeddings.aembed_query(question_text), dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        # 对整个矩阵做一次矩阵-向量乘法，再按候选行取分数，避免复制矩阵
+        scores = self._matrix[:self._size] @ query
+        if candidates is None:
+            keys = self._keys
+        else:
+            keys = [c for c in candidates if c in self._positions]
+            if not keys:
+                return []
+            rows = np.fromiter((self._positions[c] for c in keys), dtype=np.int64, count=len(keys))
+            scores = scores[rows]
+
+        k = min(k, len(keys))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [keys[idx] for idx in top]
+
+
+def _all_categories(db: Session) -> List[Category]:
+    """数据库中全部唯一的 (科目, 章节, 小节)"""
+    return [tuple(row) for row in db.query(
+        KnowledgePoint.subject,
+        KnowledgePoint.chapter,
+        KnowledgePoint.section
+    ).distinct().all()]
+
+
+async def _sync(index: CategoryIndex) -> None:
+    """首次加载持久化向量，并为数据库中尚未建立索引的类别计算向量"""
+    global _synced_at, _syncing
+    db = SessionLocal()
+    try:
+        if not index.ready:
+            index.load(*await asyncio.to_thread(index.read_persisted, db))
+        categories = await asyncio.to_thread(_all_categories, db)
+        added = await index.add_categories(categories, persist=True)
+        if added:
+            logger.info(f"已为 {added} 个知识点类别计算向量")
+        index.mark_ready()
+    except Exception as e:
+        logger.warning(f"知识点类别向量索引同步失败: {e}")
+    finally:
+        db.close()
+        _synced_at = time.monotonic()
+        _syncing = None
+
+
+_category_index: Optional[CategoryIndex] = None
+_synced_at: Optional[float] = None
+_syncing: Optional["asyncio.Future"] = None
+
+
+def refresh_category_index() -> None:
+    """
+    距上次同步超过 LLM_CATEGORY_INDEX_REFRESH_SECONDS 时在后台同步类别索引，启动时及检索前调用，不等待完成
+
+    同一时间只有一个同步任务；同步失败时到下一个间隔再重试。
+    """
+    global _syncing
+    index = get_category_index()
+    if index is None or _syncing is not None:
+        return
+    if _synced_at is not None and time.monotonic() - _synced_at < LLM_CATEGORY_INDEX_REFRESH_SECONDS:
+        return
+    _syncing = asyncio.ensure_future(_sync(index))
+
+
+def get_category_index() -> Optional[CategoryIndex]:
+    """
+    获取进程内共享的类别索引
+
+    Returns:
+        CategoryIndex实例，未配置向量模型或关闭预筛选时返回None
+    """
+    global _category_index
+    if not OPENAI_EMBEDDING_MODEL or LLM_RETRIEVER_TOP_K <= 0:
+        return None
+
+    if _category_index is None:
+        from langchain_openai import OpenAIEmbeddings
+
+        embeddings = OpenAIEmbeddings(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_API_BASE,
+            model=OPENAI_EMBEDDING_MODEL,
+            check_embedding_ctx_length=False,  # 兼容非OpenAI的向量服务，不在本地用tiktoken切分
+            http_async_client=get_http_async_client()
+        )
+        _category_index = CategoryIndex(embeddings, model_name=OPENAI_EMBEDDING_MODEL)
+    return _category_index
@@ -0,0 +1,318 @@
+import os
+import time
+import zlib
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.knowledge import KnowledgePoint, QuestionKnowledgeRelation
+from app.models.question import WrongQuestion
+
+logger = logging.getLogger(__name__)
+
+# 本地分类器配置
+LLM_CLASSIFIER_ENABLED = os.getenv("LLM_CLASSIFIER_ENABLED", "false").lower() == "true"
+LLM_CLASSIFIER_THRESHOLD = float(os.getenv("LLM_CLASSIFIER_THRESHOLD", "0.2"))  # 最高相似度下限
+LLM_CLASSIFIER_MARGIN = float(os.getenv("LLM_CLASSIFIER_MARGIN", "0.05"))  # 第一与第二候选的相似度差下限
+LLM_CLASSIFIER_MIN_SUPPORT = int(os.getenv("LLM_CLASSIFIER_MIN_SUPPORT", "5"))  # 类别最少训练样本数
+LLM_CLASSIFIER_DIM = int(os.getenv("LLM_CLASSIFIER_DIM", "8192"))  # 特征哈希维度
+LLM_CLASSIFIER_RETRAIN_SECONDS = int(os.getenv("LLM_CLASSIFIER_RETRAIN_SECONDS", "3600"))  # 全量重训间隔
+
+# (科目, 章节, 小节)
+Category = Tuple[str, str, str]
+
+
+class CategoryClassifier:
+    """
+    基于字符n-gram TF-IDF与最近质心的知识点类别分类器
+
+    特征为字符2-gram和3-gram经哈希映射到固定维度的对数词频，中文无需分词。
+    每个类别保存词频向量之和与样本数，文档频率全局累计，因此可以逐条增量训练；
+    全量训练结束时按IDF计算全部类别的质心，增量训练只重算涉及类别的质心（IDF保持不变，
+    下次全量训练时更新），预测时与题目向量求余弦相似度。
+    """
+
+    def __init__(self, dim: int = LLM_CLASSIFIER_DIM):
+        """
+        初始化分类器
+
+        Args:
+            dim: 特征哈希维度
+        """
+        self.dim = dim
+        self._labels: List[Category] = []
+        self._label_positions: Dict[Category, int] = {}
+        # 前 len(self._labels) 行有效，容量按倍数扩展以摊销复制开销
+        self._sums = np.zeros((0, dim), dtype=np.float32)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._document_frequency = np.zeros(dim, dtype=np.float32)
+        self._documents = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._idf: Optional[np.ndarray] = None
+        self.trained_at = 0.0
+
+    def __len__(self) -> int:
+        return self._documents
+
+    def _features(self, text: str) -> np.ndarray:
+        """
+        计算文本的哈希字符n-gram对数词频向量
+
+        Args:
+            text: 文本
+
+        Returns:
+            特征向量 (dim,)
+        """
+        text = "".join((text or "").lower().split())
+        indices = [
+            zlib.crc32(text[i:i + n].encode("utf-8")) % self.dim
+            for n in (2, 3)
+            for i in range(len(text) - n + 1)
+        ]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if indices:
+            np.add.at(vector, np.asarray(indices, dtype=np.int64), 1.0)
+            np.log1p(vector, out=vector)
+        return vector
+
+    def _label_position(self, label: Category) -> int:
+        """获取类别所在行，不存在时新增一行"""
+        position = self._label_positions.get(label)
+        if position is None:
+            position = len(self._labels)
+            if position == len(self._counts):
+                capacity = max(64, position * 2)
+                sums = np.zeros((capacity, self.dim), dtype=np.float32)
+                sums[:position] = self._sums
+                counts = np.zeros(capacity, dtype=np.int64)
+                counts[:position] = self._counts
+                self._sums, self._counts = sums, counts
+                if self._centroids is not None:
+                    centroids = np.zeros((capacity, self.dim), dtype=np.float32)
+                    centroids[:position] = self._centroids
+                    self._centroids = centroids
+            self._labels.append(label)
+            self._label_positions[label] = position
+        return position
+
+    def partial_fit(self, text: str, labels: Iterable[Category]) -> None:
+        """
+        增量训练一条样本
+
+        Args:
+            text: 题目内容
+            labels: 该题目确认的知识点类别
+        """
+        labels = list(dict.fromkeys(labels))
+        if not labels:
+            return
+        features = self._features(text)
+        self._document_frequency += features > 0
+        self._documents += 1
+        positions = []
+        for label in labels:
+            position = self._label_position(label)
+            self._sums[position] += features
+            self._counts[position] += 1
+            positions.append(position)
+        if self._centroids is not None:
+            self._update_centroids(positions)
+
+    def fit(self, samples: Iterable[Tuple[str, Sequence[Category]]]) -> None:
+        """
+        全量训练
+
+        Args:
+            samples: (题目内容, 知识点类别列表) 样本
+        """
+        self.__init__(self.dim)
+        for text, labels in samples:
+            self.partial_fit(text, labels)
+        self._prepare()
+        self.trained_at = time.time()
+
+    def _prepare(self) -> None:
+        """按当前文档频率计算IDF和全部类别归一化后的质心"""
+        self._idf = np.log((1 + self._documents) / (1 + self._document_frequency)) + 1
+        self._centroids = np.zeros_like(self._sums)
+        self._update_centroids(range(len(self._labels)))
+
+    def _update_centroids(self, positions: Iterable[int]) -> None:
+        """
+        按当前IDF重算指定类别归一化后的质心
+
+        Args:
+            positions: 类别所在行
+        """
+        rows = np.fromiter(positions, dtype=np.int64)
+        if not len(rows):
+            return
+        centroids = self._sums[rows] / np.maximum(self._counts[rows], 1)[:, None] * self._idf
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self._centroids[rows] = centroids / np.maximum(norms, 1e-12)
+
+    def predict(self, text: str, k: int = 2) -> List[Tuple[Category, float, int]]:
+        """
+        预测题目最相近的k个类别
+
+        Args:
+            text: 题目内容
+            k: 返回数量
+
+        Returns:
+            (类别, 余弦相似度, 训练样本数) 列表，按相似度从高到低排序
+        """
+        if not self._labels:
+            return []
+        if self._centroids is None:
+            self._prepare()
+
+        query = self._features(text) * self._idf
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = self._centroids[:len(self._labels)] @ query
+
+        k = min(k, len(self._labels))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._labels[idx], float(scores[idx]), int(self._counts[idx])) for idx in top]
+
+    def predict_confident(
+        self,
+        text: str,
+        threshold: float = LLM_CLASSIFIER_THRESHOLD,
+        margin: float = LLM_CLASSIFIER_MARGIN,
+        min_support: int = LLM_CLASSIFIER_MIN_SUPPORT
+    ) -> Optional[Category]:
+        """
+        仅在高置信度时返回预测类别
+
+        需同时满足：最高相似度不低于阈值、与第二候选的差距不低于margin、
+        该类别的训练样本数不少于min_support。
+
+        Args:
+            text: 题目内容
+            threshold: 相似度阈值
+            margin: 与第二候选的最小差距
+            min_support: 最少训练样本数
+
+        Returns:
+            预测类别，置信度不足时返回None
+        """
+        predictions = self.predict(text, k=2)
+        if not predictions:
+            return None
+        label, score, support = predictions[0]
+        runner_up = predictions[1][1] if len(predictions) > 1 else 0.0
+        if score >= threshold and score - runner_up >= margin and support >= min_support:
+            return label
+        return None
+
+
+def load_training_samples(db: Session) -> List[Tuple[str, List[Category]]]:
+    """
+    从题目-知识点关联中读取训练样本
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        (题目内容, 知识点类别列表) 样本列表
+    """
+    rows = (
+        db.query(
+            WrongQuestion.id,
+            WrongQuestion.content,
+            KnowledgePoint.subject,
+            KnowledgePoint.chapter,
+            KnowledgePoint.section
+        )
+        .join(QuestionKnowledgeRelation, QuestionKnowledgeRelation.question_id == WrongQuestion.id)
+        .join(KnowledgePoint, KnowledgePoint.id == QuestionKnowledgeRelation.knowledge_point_id)
+        .order_by(WrongQuestion.id)
+        .all()
+    )
+
+    samples: Dict[int, Tuple[str, List[Category]]] = {}
+    for question_id, content, subject, chapter, section in rows:
+        samples.setdefault(question_id, (content, []))[1].append((subject, chapter, section))
+    return list(samples.values())
+
+
+_classifier: Optional[CategoryClassifier] = None
+_trained_at = 0.0
+_training: Optional["asyncio.Future"] = None
+# 全量训练期间增量训练的样本，新模型就绪后补训
+_pending_samples: List[Tuple[str, List[Category]]] = []
+
+
+def _train_classifier() -> CategoryClassifier:
+    """从数据库读取样本全量训练新的分类器，在线程池中执行"""
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        samples = load_training_samples(db)
+    finally:
+        db.close()
+    classifier = CategoryClassifier()
+    classifier.fit(samples)
+    logger.info(f"知识点类别分类器训练完成: {len(classifier)} 条样本，耗时 {time.perf_counter() - start:.2f}s")
+    return classifier
+
+
+async def _retrain() -> None:
+    global _classifier, _trained_at, _training
+    try:
+        classifier = await asyncio.to_thread(_train_classifier)
+        for text, labels in _pending_samples:
+            classifier.partial_fit(text, labels)
+        _classifier = classifier
+    except Exception as e:
+        logger.warning(f"知识点类别分类器训练失败，继续使用旧模型: {e}")
+    finally:
+        _trained_at = time.time()
+        _pending_samples.clear()
+        _training = None
+
+
+def get_category_classifier() -> Optional[CategoryClassifier]:
+    """
+    获取进程内共享的分类器
+
+    首次使用及超过重训间隔时在后台线程中从数据库全量训练，训练完成前继续使用旧模型，
+    从未训练完成时返回None（调用方退回检索LLM），请求不等待训练；训练失败时到下一个间隔再重试。
+
+    Returns:
+        CategoryClassifier实例，未启用或尚未训练完成时返回None
+    """
+    global _training
+    if not LLM_CLASSIFIER_ENABLED:
+        return None
+
+    if _training is None and time.time() - _trained_at > LLM_CLASSIFIER_RETRAIN_SECONDS:
+        _training = asyncio.ensure_future(_retrain())
+    return _classifier
+
+
+def train_classifier_sample(text: str, labels: Sequence[Category]) -> None:
+    """
+    以一条确认的样本增量训练分类器，全量训练进行中时同时记录，新模型就绪后补训
+
+    Args:
+        text: 题目内容
+        labels: 该题目确认的知识点类别
+    """
+    classifier = get_category_classifier()
+    if _training is not None:
+        _pending_samples.append((text, list(labels)))
+    if classifier is not None:
+        classifier.partial_fit(text, labels)
+
+
+def warm_category_classifier() -> None:
+    """启动时在后台开始首次训练"""
+    get_category_classifier()
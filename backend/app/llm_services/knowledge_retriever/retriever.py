@@ -1,8 +1,7 @@
 import os
-import json
 from typing import List, Dict, Optional, Any
 from langchain_openai import ChatOpenAI
-from langfuse.callback import CallbackHandler
+from app.llm_services.common import ainvoke_json, build_messages, clean_prompt, get_http_async_client, langfuse_callbacks
 
 # 从环境变量获取配置
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -16,6 +15,42 @@ LLM_RETRIEVER_MODEL = os.getenv("LLM_Retriever", OPENAI_LLM_MODEL)
 LLM_RETRIEVER_SYSTEM_PROMPT = os.getenv("LLM_Retriever_SYSTEM_PROMPT", "")
 LLM_RETRIEVER_PROMPT = os.getenv("LLM_Retriever_PROMPT", "")
 
+# 知识点类别结果的JSON Schema（JSON模式要求顶层为对象）
+CATEGORY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "categories": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "subject": {"type": "string"},
+                    "chapter": {"type": "string"},
+                    "section": {"type": "string"}
+                },
+                "required": ["subject", "chapter", "section"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["categories"],
+    "additionalProperties": False
+}
+
+# 检索任务说明（固定内容，放在系统消息中）
+RETRIEVER_INSTRUCTION = clean_prompt("""
+    分析用户给出的题目，参考下面的知识点类别，确定其所属的科目、章节和小节。
+
+    请以JSON格式返回可能相关的知识点类别列表：
+    {
+        "categories": [
+            {"subject": "科目名称", "chapter": "章节名称", "section": "小节名称"}
+        ]
+    }
+
+    确保返回的JSON格式正确，只输出JSON数据，不要有其他内容。
+    """)
+
 class LLMKnowledgeRetriever:
     """
     基于LLM的知识点检索器
@@ -34,46 +69,42 @@ class LLMKnowledgeRetriever:
             api_base: API基础URL，默认从环境变量获取
             model_name: LLM模型名称，默认从环境变量获取
         """
-        # 设置Langfuse回调
-        callbacks = []
-        self.langfuse_handler = CallbackHandler(tags=["知识点检索"])
-        callbacks.append(self.langfuse_handler)
-
+        # 设置Langfuse回调（按采样率，未配置或未采样时为空）
+        callbacks = langfuse_callbacks(["知识点检索"])
 
         # 初始化LLM
         self.llm = ChatOpenAI(
             api_key=api_key or OPENAI_API_KEY,
             base_url=api_base or OPENAI_API_BASE,
             model_name=model_name or LLM_RETRIEVER_MODEL,
-            callbacks=callbacks
+            callbacks=callbacks,
+            http_async_client=get_http_async_client(),
+            max_retries=0  # 重试由 common.resilience 统一处理
         )
 
 
-    def _get_task_prompt(self, content: str) -> List:
+    def _get_task_prompt(self, question_text: str, categories_csv: str) -> List:
         """
-        根据任务生成带有系统提示词和用户提示词的消息列表
+        生成带有系统提示词和用户提示词的消息列表
+
+        系统提示词、任务说明和知识点类别等稳定内容放在前面，题目放在最后，便于服务商前缀缓存命中
 
         Args:
-            content: 用户消息内容
+            question_text: 题目文本
+            categories_csv: CSV格式的知识点类别数据
 
         Returns:
             List: 包含系统提示和用户提示的消息列表
         """
-        from langchain_core.messages import SystemMessage, HumanMessage
-
-        messages = []
-
-        # 如果有系统提示词，则添加
-        if LLM_RETRIEVER_SYSTEM_PROMPT:
-            messages.append(SystemMessage(content=LLM_RETRIEVER_SYSTEM_PROMPT))
-
-        # 如果有提示词模板，则使用模板格式化用户消息，否则直接使用内容
+        # 任务说明和知识点类别已移到系统消息和参考内容中，提示词模板的 {content} 只填入带前缀的题目
+        content = f"题目：{question_text}"
         user_content = LLM_RETRIEVER_PROMPT.format(content=content) if LLM_RETRIEVER_PROMPT else content
-        messages.append(HumanMessage(content=user_content))
-
-        return messages
-
 
+        return build_messages(
+            system=f"{LLM_RETRIEVER_SYSTEM_PROMPT}\n\n{RETRIEVER_INSTRUCTION}",
+            references=[f"知识点类别 (CSV格式):\n{categories_csv}"],
+            task=user_content
+        )
 
     async def analyze_knowledge_category(self, question_text: str, categories_csv: str) -> List[Dict[str, str]]:
         """
@@ -86,43 +117,18 @@ class LLMKnowledgeRetriever:
         Returns:
             List[Dict[str, str]]: 可能相关的知识点类别列表
         """
-        # 构建提示词内容
-        prompt_content = f"""分析以下题目，确定其所属的科目、章节和小节。
-
-        题目：{question_text}
-
-        参考以下知识点类别 (CSV格式):
-        {categories_csv}
-
-        请以JSON格式返回可能相关的知识点类别列表：
-        [
-            {{"subject": "科目名称", "chapter": "章节名称", "section": "小节名称"}}
-        ]
-
-        确保返回的JSON格式正确，只输出JSON数据，不要有其他内容。
-        """
-
         # 获取任务特定提示词
-        messages = self._get_task_prompt(prompt_content)
-
-        # 异步调用LLM分析题目
-        response = await self.llm.ainvoke(messages)
-
-
-        # 解析JSON响应
-        try:
-            result_text = response.content
-            # 清理可能的非JSON内容
-            result_text = result_text.strip()
-            if result_text.startswith("```json"):
-                result_text = result_text[7:]
-            if result_text.startswith("```"):
-                result_text = result_text[3:]
-            if result_text.endswith("```"):
-                result_text = result_text[:-3]
-            result_text = result_text.strip()
-
-            result = json.loads(result_text)
-            return result if isinstance(result, list) else []
-        except json.JSONDecodeError:
-            return []
\ No newline at end of file
+        messages = self._get_task_prompt(question_text, categories_csv)
+
+        # 异步调用LLM分析题目，优先使用结构化输出
+        result, _ = await ainvoke_json(self.llm, messages, "retriever", CATEGORY_SCHEMA)
+
+        # 兼容模型直接返回列表的情况
+        if isinstance(result, dict):
+            result = result.get("categories", [])
+        if not isinstance(result, list):
+            return []
+        return [
+            cat for cat in result
+            if isinstance(cat, dict) and all(key in cat for key in ("subject", "chapter", "section"))
+        ]
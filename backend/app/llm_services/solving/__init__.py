@@ -1,5 +1,8 @@
 from .workflow import LLMSolvingWorkflow
+from .routing import RoutingPolicy, get_routing_stats
 
 __all__ = [
-    "LLMSolvingWorkflow"
-] 
\ No newline at end of file
+    "LLMSolvingWorkflow",
+    "RoutingPolicy",
+    "get_routing_stats"
+]
@@ -0,0 +1,135 @@
+import os
+import math
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Set, Tuple
+
+from app.llm_services.common.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# 解题提示词中知识点上下文的token预算，0表示不限制
+LLM_SOLVING_CONTEXT_TOKENS = int(os.getenv("LLM_SOLVING_CONTEXT_TOKENS", "4000"))
+
+
+def _char_ngrams(text: str, n: int = 2) -> Set[str]:
+    """
+    提取字符n-gram集合，中文无需分词即可计算相似度
+
+    Args:
+        text: 文本
+        n: n-gram长度
+
+    Returns:
+        n-gram集合
+    """
+    text = "".join((text or "").lower().split())
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _clean(value: Any) -> str:
+    """将字段值压缩为单行，保证每条知识点占一行"""
+    return " ".join(str(value or "").split())
+
+
+def rank_knowledge_points(question: str, knowledge_points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    按与题目的词面相似度对知识点排序
+
+    使用字符bigram的IDF加权重叠度，按知识点文本长度归一化。
+
+    Args:
+        question: 题目文本
+        knowledge_points: 知识点列表
+
+    Returns:
+        按相关度从高到低排序的知识点列表
+    """
+    question_grams = _char_ngrams(question)
+    point_grams = [
+        _char_ngrams(f"{kp.get('section', '')}{kp.get('item', '')}{kp.get('details', '')}")
+        for kp in knowledge_points
+    ]
+
+    document_frequency = Counter(gram for grams in point_grams for gram in grams)
+    total = len(knowledge_points)
+
+    scores = []
+    for idx, grams in enumerate(point_grams):
+        shared = question_grams & grams
+        score = sum(math.log(1 + total / document_frequency[gram]) for gram in shared)
+        scores.append(score / math.sqrt(len(grams) or 1))
+
+    order = sorted(range(total), key=lambda idx: scores[idx], reverse=True)
+    return [knowledge_points[idx] for idx in order]
+
+
+def _legacy_csv(knowledge_points: List[Dict[str, Any]]) -> str:
+    """按旧版CSV格式拼接知识点，仅用于统计节省的token"""
+    text = "科目,章节,小节,知识点,详情\n"
+    for kp in knowledge_points:
+        text += f"{kp.get('subject', '')},{kp.get('chapter', '')},{kp.get('section', '')},{kp.get('item', '')},{kp.get('details', '')}\n"
+    return text
+
+
+def build_knowledge_context(
+    question: str,
+    knowledge_points: List[Dict[str, Any]],
+    token_budget: int = LLM_SOLVING_CONTEXT_TOKENS
+) -> Tuple[str, Dict[str, int]]:
+    """
+    构建解题提示词中的知识点上下文
+
+    知识点按与题目的相关度排序后在token预算内装填，按"科目/章节/小节"分组，
+    每条知识点压缩为一行，格式为 "- [ID] 知识点：详情"，字段中的换行和逗号不会破坏格式。
+
+    Args:
+        question: 题目文本
+        knowledge_points: 知识点列表
+        token_budget: token预算，0表示不限制
+
+    Returns:
+        (知识点上下文文本, 统计信息) 元组
+    """
+    ranked = rank_knowledge_points(question, knowledge_points)
+
+    groups: Dict[str, List[str]] = {}
+    used_tokens = 0
+    kept = 0
+
+    for kp in ranked:
+        header = f"## {_clean(kp.get('subject'))}/{_clean(kp.get('chapter'))}/{_clean(kp.get('section'))}"
+        line = f"- [{kp.get('id', '')}] {_clean(kp.get('item'))}"
+        details = _clean(kp.get("details"))
+        if details:
+            line += f"：{details}"
+
+        cost = estimate_tokens(line) + (0 if header in groups else estimate_tokens(header))
+        if token_budget and used_tokens + cost > token_budget:
+            if kept:
+                continue
+            # 至少保留相关度最高的一条，超出预算时截断详情
+            line = truncate_to_tokens(line, max(token_budget - estimate_tokens(header), 16))
+            cost = estimate_tokens(line) + estimate_tokens(header)
+
+        groups.setdefault(header, []).append(line)
+        used_tokens += cost
+        kept += 1
+
+    context = "\n".join(f"{header}\n" + "\n".join(lines) for header, lines in groups.items())
+
+    stats = {
+        "total_points": len(knowledge_points),
+        "kept_points": kept,
+        "legacy_tokens": estimate_tokens(_legacy_csv(knowledge_points)),
+        "context_tokens": estimate_tokens(context)
+    }
+    logger.info(
+        f"知识点上下文: 保留 {stats['kept_points']}/{stats['total_points']} 条，"
+        f"约 {stats['context_tokens']} tokens（旧格式约 {stats['legacy_tokens']} tokens，"
+        f"减少 {stats['legacy_tokens'] - stats['context_tokens']} tokens）"
+    )
+
+    return context, stats
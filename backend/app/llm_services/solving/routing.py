@@ -0,0 +1,124 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OPENAI_LLM_MODEL = os.getenv("OPENAI_LLM_MODEL", "deepseek-v3-250324")
+LLM_SOLVING_MODEL = os.getenv("LLM_SOLVING_MODEL", OPENAI_LLM_MODEL)
+LLM_REVIEW_MODEL = os.getenv("LLM_REVIEW_MODEL", OPENAI_LLM_MODEL)
+
+# 分级模型路由策略，按科目配置，"default" 为未匹配科目时的策略，例如：
+# {
+#     "default": {"solve": ["fast-model", "strong-model"], "review": "strong-model", "review_with_answer": "small-model"},
+#     "数学": {"solve": ["math-model", "strong-model"]}
+# }
+# solve 为按尝试次数依次使用的解题模型（超出列表长度时使用最后一个），
+# review_with_answer 为题目有正确答案时使用的审查模型（只需比对答案，可使用小模型）。
+# 未配置的字段使用 LLM_SOLVING_MODEL / LLM_REVIEW_MODEL。
+LLM_ROUTING_POLICY: Dict[str, Dict[str, Any]] = json.loads(os.getenv("LLM_ROUTING_POLICY", "") or "{}")
+
+# 按 (阶段, 尝试次数, 模型) 汇总的调用统计
+_routing_stats: Dict[str, Dict[str, float]] = {}
+
+
+class RoutingPolicy:
+    """
+    解题工作流的模型路由策略
+
+    首次尝试使用快速低价模型，审查不通过后的重试逐级升级到更强的模型；
+    有正确答案时审查只需比对答案，可使用小模型。
+    """
+
+    def __init__(
+        self,
+        solve_models: List[str],
+        review_model: str,
+        review_model_with_answer: Optional[str] = None
+    ):
+        """
+        初始化路由策略
+
+        Args:
+            solve_models: 按尝试次数依次使用的解题模型
+            review_model: 审查模型
+            review_model_with_answer: 有正确答案时的审查模型，默认与review_model相同
+        """
+        self.solve_models = list(solve_models) or [LLM_SOLVING_MODEL]
+        self.review_model = review_model
+        self.review_model_with_answer = review_model_with_answer or review_model
+
+    @classmethod
+    def for_subject(cls, subject: Optional[str] = None) -> "RoutingPolicy":
+        """
+        按科目获取路由策略，科目策略中未配置的字段继承default策略
+
+        Args:
+            subject: 科目名称
+
+        Returns:
+            RoutingPolicy实例
+        """
+        config = {**LLM_ROUTING_POLICY.get("default", {}), **LLM_ROUTING_POLICY.get(subject or "", {})}
+        solve_models = config.get("solve") or [LLM_SOLVING_MODEL]
+        if isinstance(solve_models, str):
+            solve_models = [solve_models]
+        return cls(
+            solve_models=solve_models,
+            review_model=config.get("review") or LLM_REVIEW_MODEL,
+            review_model_with_answer=config.get("review_with_answer")
+        )
+
+    def solve_model(self, attempt: int) -> str:
+        """
+        获取第attempt次尝试（从1开始）使用的解题模型
+
+        Args:
+            attempt: 尝试次数
+
+        Returns:
+            模型名称
+        """
+        return self.solve_models[min(max(attempt, 1), len(self.solve_models)) - 1]
+
+    def review_model_for(self, has_answer: bool) -> str:
+        """
+        获取审查模型
+
+        Args:
+            has_answer: 题目是否有正确答案
+
+        Returns:
+            模型名称
+        """
+        return self.review_model_with_answer if has_answer else self.review_model
+
+
+def record_attempt(record: Dict[str, Any]) -> None:
+    """
+    记录一次解题或审查调用，用于分析各模型的成本与延迟
+
+    Args:
+        record: 包含 stage、attempt、model、input_tokens、output_tokens、latency_ms，
+            审查记录另含 passed
+    """
+    key = f"{record['stage']}:{record['attempt']}:{record['model']}"
+    stats = _routing_stats.setdefault(
+        key, {"calls": 0, "passed": 0, "input_tokens": 0, "output_tokens": 0, "latency_ms": 0.0}
+    )
+    stats["calls"] += 1
+    stats["passed"] += 1 if record.get("passed") else 0
+    stats["input_tokens"] += record.get("input_tokens", 0)
+    stats["output_tokens"] += record.get("output_tokens", 0)
+    stats["latency_ms"] += record.get("latency_ms", 0.0)
+
+
+def get_routing_stats() -> Dict[str, Dict[str, float]]:
+    """
+    获取按 "阶段:尝试次数:模型" 汇总的调用次数、审查通过数、token用量和总延迟
+
+    Returns:
+        统计字典
+    """
+    return {key: dict(stats) for key, stats in _routing_stats.items()}
@@ -1,10 +1,22 @@
 import os
-import json
+import time
 from typing import Dict, List, Optional, Literal, TypedDict, Any, Tuple
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import SystemMessage, HumanMessage
-from langfuse.callback import CallbackHandler
+from app.core.tracing import set_span_attributes, traced
+from app.llm_services.common import (
+    ainvoke_json,
+    ainvoke_llm,
+    build_messages,
+    clean_prompt,
+    render_prompt,
+    extract_usage,
+    get_http_async_client,
+    langfuse_callbacks,
+    LLMDeadlineExceeded
+)
+from app.llm_services.solving.context import build_knowledge_context
+from app.llm_services.solving.routing import RoutingPolicy, record_attempt, LLM_SOLVING_MODEL, LLM_REVIEW_MODEL
 import logging
 
 # 配置日志
@@ -17,20 +29,110 @@ if not OPENAI_API_KEY:
     logger.warning("未设置 OPENAI_API_KEY 环境变量，LLM服务可能无法正常工作")
 
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
-OPENAI_LLM_MODEL = os.getenv("OPENAI_LLM_MODEL", "deepseek-v3-250324")
 
-# 从环境变量获取特定任务的模型配置，如果未设置，则使用OPENAI_LLM_MODEL
-LLM_SOLVING_MODEL = os.getenv("LLM_SOLVING_MODEL", OPENAI_LLM_MODEL)
-LLM_REVIEW_MODEL = os.getenv("LLM_REVIEW_MODEL", OPENAI_LLM_MODEL)
+# 解题与审查模型（LLM_SOLVING_MODEL、LLM_REVIEW_MODEL）及按科目的分级路由策略见 routing.py
 
 # 从环境变量获取特定任务的提示词配置
 LLM_SOLVING_PROMPT = os.getenv("LLM_SOLVING_PROMPT", "你是一个专业的解题助手，能够使用已知的知识点来解答学生的题目。")
 LLM_REVIEW_PROMPT = os.getenv("LLM_REVIEW_PROMPT", "你是一个专业的解题审查员，需要检查解题过程是否正确，并与正确答案对比。")
 
+# 合并模式：解题时同时输出用到的已有知识点ID和新知识点，省去单独的知识点提取调用
+LLM_SOLVING_COMBINED_MODE = os.getenv("LLM_SOLVING_COMBINED_MODE", "false").lower() == "true"
+
+# 合并模式下解题结果的JSON Schema
+SOLVE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "solution": {"type": "string"},
+        "used_existing_knowledge_points": {
+            "type": "array",
+            "items": {"type": "integer"}
+        },
+        "new_knowledge_points": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "subject": {"type": "string"},
+                    "chapter": {"type": "string"},
+                    "section": {"type": "string"},
+                    "item": {"type": "string"},
+                    "details": {"type": "string"}
+                },
+                "required": ["subject", "chapter", "section", "item", "details"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["solution", "used_existing_knowledge_points", "new_knowledge_points"],
+    "additionalProperties": False
+}
+
+# 审查结果的JSON Schema
+REVIEW_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "passed": {"type": "boolean"},
+        "reason": {"type": "string"}
+    },
+    "required": ["passed", "reason"],
+    "additionalProperties": False
+}
+
+# 解题任务说明（固定内容，放在系统消息中）
+SOLVE_INSTRUCTION = clean_prompt("""
+    请根据提供的知识点解答题目。知识点按 科目/章节/小节 分组，格式为 [ID] 知识点：详情。
+    请提供详细的解题过程，并明确指出使用了哪些知识点。
+    """)
+
+SOLVE_COMBINED_INSTRUCTION = clean_prompt("""
+    请根据提供的知识点解答题目。知识点按 科目/章节/小节 分组，格式为 [ID] 知识点：详情。
+
+    请以JSON格式输出结果：
+    {
+        "solution": "markdown格式的详细解题过程和最终答案",
+        "used_existing_knowledge_points": [解题中实际使用到的已有知识点ID列表],
+        "new_knowledge_points": [
+            {"subject": "科目", "chapter": "章节", "section": "小节", "item": "知识点名称", "details": "知识点详细说明"}
+        ]
+    }
+    new_knowledge_points 只包含解题用到但不在提供的知识点列表中的知识点，没有则为空数组。
+    """)
+
+SOLVE_TASK_TEMPLATE = """
+    题目：
+    {question}
+
+    {retry_note}
+    """
+
+# 审查任务说明（固定内容，放在系统消息中）
+REVIEW_INSTRUCTION = clean_prompt("""
+    请审查用户给出的解题过程，判断是否正确，并给出具体的审查意见。如果解题过程中有错误，请明确指出错误之处和改进建议。
+
+    请以JSON格式输出结果：
+    {
+        "passed": true/false,  // 解题过程是否正确
+        "reason": "审查意见和建议"  // 详细的审查意见
+    }
+    """)
+
+REVIEW_TASK_TEMPLATE = """
+    题目：
+    {question}
+
+    解题过程：
+    {solution}
+
+    {correct_answer}
+    """
+
 class SolveState(TypedDict):
     """解题工作流状态类型"""
     question: str  # 题目内容
+    subject: Optional[str]  # 科目，用于选择模型路由策略
     knowledge_points: List[Dict[str, str]]  # 相关知识点列表
+    knowledge_context: Optional[str]  # 按相关度和token预算构建的知识点上下文
     correct_answer: Optional[str]  # 正确答案
     solution: Optional[str]  # 解题过程
     review_passed: Optional[bool]  # 审查是否通过
@@ -38,6 +140,10 @@ class SolveState(TypedDict):
     attempts: int  # 尝试次数
     trace_id: Optional[str]  # Langfuse追踪ID
     error: Optional[str]  # 错误信息
+    parse_failures: int  # 因审查结果解析失败导致的重试次数
+    used_knowledge_point_ids: Optional[List[int]]  # 合并模式下解题用到的已有知识点ID
+    new_knowledge_points: Optional[List[Dict[str, str]]]  # 合并模式下解题用到的新知识点
+    attempt_log: List[Dict[str, Any]]  # 每次解题/审查调用的模型、token用量和延迟
 
 class LLMSolvingWorkflow:
     """
@@ -47,37 +153,94 @@ class LLMSolvingWorkflow:
     1. 使用LLM解题
     2. 审查解题过程与结果
     3. 如果审查不通过，重试解题
+
+    解题与审查模型由 RoutingPolicy 按科目和尝试次数选择：首次使用快速模型，
+    审查不通过后逐级升级；有正确答案时审查可使用小模型。
     """
 
     def __init__(self,
                  api_key: Optional[str] = None,
                  api_base: Optional[str] = None,
                  solving_model: Optional[str] = None,
-                 review_model: Optional[str] = None):
+                 review_model: Optional[str] = None,
+                 combined_mode: Optional[bool] = None,
+                 routing_policy: Optional[RoutingPolicy] = None):
         """
         初始化解题工作流
 
         Args:
             api_key: API密钥，默认从环境变量获取
             api_base: API基础URL，默认从环境变量获取
-            solving_model: 解题模型名称，默认从环境变量获取
-            review_model: 审查模型名称，默认从环境变量获取
+            solving_model: 解题模型名称，指定后所有尝试都使用该模型
+            review_model: 审查模型名称，指定后所有审查都使用该模型
+            combined_mode: 是否在解题时同时输出用到的知识点，默认从环境变量获取
+            routing_policy: 模型路由策略，默认按题目科目从环境变量获取
         """
-        # 初始化异步LLM客户端
-        self.solving_llm = ChatOpenAI(
-            api_key=api_key or OPENAI_API_KEY,
-            base_url=api_base or OPENAI_API_BASE,
-            model_name=solving_model or LLM_SOLVING_MODEL
-        )
+        self.combined_mode = LLM_SOLVING_COMBINED_MODE if combined_mode is None else combined_mode
+        self.api_key = api_key or OPENAI_API_KEY
+        self.api_base = api_base or OPENAI_API_BASE
+
+        self.routing_policy = routing_policy
+        if solving_model or review_model:
+            self.routing_policy = RoutingPolicy(
+                solve_models=[solving_model or LLM_SOLVING_MODEL],
+                review_model=review_model or LLM_REVIEW_MODEL
+            )
 
-        self.review_llm = ChatOpenAI(
-            api_key=api_key or OPENAI_API_KEY,
-            base_url=api_base or OPENAI_API_BASE,
-            model_name=review_model or LLM_REVIEW_MODEL
-        )
+        # 按模型名称缓存的异步LLM客户端
+        self._llms: Dict[str, ChatOpenAI] = {}
 
         self.graph = self._build_graph()
 
+    def _get_llm(self, model: str) -> ChatOpenAI:
+        """
+        获取指定模型的LLM客户端，同一模型复用同一个客户端
+
+        Args:
+            model: 模型名称
+
+        Returns:
+            ChatOpenAI实例
+        """
+        if model not in self._llms:
+            self._llms[model] = ChatOpenAI(
+                api_key=self.api_key,
+                base_url=self.api_base,
+                model_name=model,
+                http_async_client=get_http_async_client(),
+                max_retries=0  # 重试由 common.resilience 统一处理
+            )
+        return self._llms[model]
+
+    def _get_policy(self, state: SolveState) -> RoutingPolicy:
+        """获取本次解题使用的路由策略"""
+        return self.routing_policy or RoutingPolicy.for_subject(state.get("subject"))
+
+    @staticmethod
+    def _log_attempt(
+        state: SolveState,
+        stage: str,
+        attempt: int,
+        model: str,
+        response: Any,
+        start: float,
+        **extra: Any
+    ) -> None:
+        """记录一次解题或审查调用的模型、token用量和延迟"""
+        usage = extract_usage(response) if response is not None else {}
+        record = {
+            "stage": stage,
+            "attempt": attempt,
+            "model": model,
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cached_tokens": usage.get("cached_tokens", 0),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            **extra
+        }
+        state["attempt_log"] = state.get("attempt_log", []) + [record]
+        record_attempt(record)
+
     async def _solve_node(self, state: SolveState) -> SolveState:
         """
         解题节点，使用LLM和知识点解答题目
@@ -96,39 +259,66 @@ class LLMSolvingWorkflow:
 
 
 
-            #构建csv格式的知识点文本
-            knowledge_text_csv = "科目,章节,小节,知识点,详情\n"
-            for idx, kp in enumerate(knowledge_points, 1):
-                knowledge_text_csv += f"{kp.get('subject', '')},{kp.get('chapter', '')},{kp.get('section', '')},{kp.get('item', '')},{kp.get('details', '')}\n"
-
-            # 构建解题提示词
-            solving_prompt = f"""请根据以下知识点解答题目。
-
-            题目：
-            {question}
+            # 按与题目的相关度在token预算内构建知识点上下文，重试时复用
+            knowledge_context = state.get("knowledge_context")
+            if knowledge_context is None:
+                knowledge_context, _ = build_knowledge_context(question, knowledge_points)
+                state["knowledge_context"] = knowledge_context
 
-            可能相关的知识点：
-            {knowledge_text_csv}
+            retry_note = ""
+            if attempts > 1:
+                retry_note = f"这是第 {attempts} 次尝试解答。请特别注意审查意见并改进：{state.get('review_reason', '')}"
 
-            {'这是第 ' + str(attempts) + ' 次尝试解答。请特别注意审查意见并改进：' + state.get('review_reason', '') if attempts > 1 else ''}
-
-            请提供详细的解题过程，并明确指出使用了哪些知识点。
-            """
+            # 稳定内容（系统提示词、任务说明、知识点）在前，题目和审查意见在后，便于服务商前缀缓存
+            instruction = SOLVE_COMBINED_INSTRUCTION if self.combined_mode else SOLVE_INSTRUCTION
+            messages = build_messages(
+                system=f"{LLM_SOLVING_PROMPT}\n\n{instruction}",
+                references=[f"可能相关的知识点：\n{knowledge_context}"],
+                task=render_prompt(SOLVE_TASK_TEMPLATE, question=question, retry_note=retry_note)
+            )
 
-            # 创建消息
-            messages = [
-                SystemMessage(content=LLM_SOLVING_PROMPT),
-                HumanMessage(content=solving_prompt)
-            ]
+            # 按尝试次数选择解题模型，审查不通过后升级到更强的模型
+            model = self._get_policy(state).solve_model(attempts)
+            llm = self._get_llm(model)
+            set_span_attributes(attempt=attempts, model=model)
+            start = time.perf_counter()
+
+            if self.combined_mode:
+                # 合并模式：结构化输出解题过程和用到的知识点
+                result, response = await ainvoke_json(llm, messages, "solve", SOLVE_SCHEMA)
+                self._log_attempt(state, "solve", attempts, model, response, start)
+                if isinstance(result, dict) and isinstance(result.get("solution"), str):
+                    known_ids = {kp.get("id") for kp in knowledge_points}
+                    state["solution"] = result["solution"]
+                    state["used_knowledge_point_ids"] = [
+                        kp_id for kp_id in result.get("used_existing_knowledge_points", [])
+                        if kp_id in known_ids
+                    ]
+                    state["new_knowledge_points"] = [
+                        {key: str(point.get(key) or "") for key in ("subject", "chapter", "section", "item", "details")}
+                        for point in result.get("new_knowledge_points", [])
+                        if isinstance(point, dict) and point.get("item")
+                    ]
+                else:
+                    # 解析失败时退回使用原始文本作为解题过程，知识点交由提取接口处理
+                    state["solution"] = response.content
+                    state["used_knowledge_point_ids"] = None
+                    state["new_knowledge_points"] = None
+                state["attempts"] = state["attempts"] + 1
+                return state
 
             # 异步调用LLM
-            response = await self.solving_llm.ainvoke(messages)
+            response = await ainvoke_llm(llm, messages, "solve")
+            self._log_attempt(state, "solve", attempts, model, response, start)
 
             # 更新状态
             state["solution"] = response.content
             state["attempts"] = state["attempts"] + 1
 
             return state
+        except LLMDeadlineExceeded:
+            # 请求时限耗尽时不再继续工作流，由应用返回504
+            raise
         except Exception as e:
             # 记录错误信息
             logger.error(f"解题过程出错: {str(e)}")
@@ -150,63 +340,47 @@ class LLMSolvingWorkflow:
             question = state["question"]
             solution = state["solution"]
             correct_answer = state.get("correct_answer", "")
+            correct_answer_text = f"正确答案：\n{correct_answer}" if correct_answer else ""
+
+            # 稳定的审查说明在前，题目和解题过程在后
+            messages = build_messages(
+                system=f"{LLM_REVIEW_PROMPT}\n\n{REVIEW_INSTRUCTION}",
+                task=render_prompt(
+                    REVIEW_TASK_TEMPLATE,
+                    question=question,
+                    solution=solution,
+                    correct_answer=correct_answer_text
+                )
+            )
 
-            # 构建审查提示词
-            review_prompt = f"""请审查以下解题过程，判断是否正确。
-
-            题目：
-            {question}
-
-            解题过程：
-            {solution}
-
-            {'正确答案：\n' + correct_answer if correct_answer else ''}
-
-            请判断解题过程是否正确，并给出具体的审查意见。如果解题过程中有错误，请明确指出错误之处和改进建议。
-
-            请以JSON格式输出结果：
-            {{
-                "passed": true/false,  // 解题过程是否正确
-                "reason": "审查意见和建议"  // 详细的审查意见
-            }}
-            """
-
-            # 创建消息
-            messages = [
-                SystemMessage(content=LLM_REVIEW_PROMPT),
-                HumanMessage(content=review_prompt)
-            ]
-
-            # 异步调用LLM审查
-            response = await self.review_llm.ainvoke(messages)
-
-            # 解析JSON响应
-            try:
-                result_text = response.content
-                # 清理可能的非JSON内容
-                result_text = result_text.strip()
-                if result_text.startswith("```json"):
-                    result_text = result_text[7:]
-                if result_text.startswith("```"):
-                    result_text = result_text[3:]
-                if result_text.endswith("```"):
-                    result_text = result_text[:-3]
-                result_text = result_text.strip()
-
-                result_text=result_text.replace("\\","\\\\")
-
-                result = json.loads(result_text)
-
-                # 更新状态
-                state["review_passed"] = result.get("passed", False)
-                state["review_reason"] = result.get("reason", "未提供审查意见")
+            # 有正确答案时审查只需比对答案，可使用小模型
+            model = self._get_policy(state).review_model_for(bool(correct_answer))
+            set_span_attributes(attempt=state["attempts"] - 1, model=model)
+            start = time.perf_counter()
+
+            # 异步调用LLM审查，优先使用结构化输出
+            result, response = await ainvoke_json(self._get_llm(model), messages, "review", REVIEW_SCHEMA)
+            # 解题节点已将尝试次数加1，审查记录归属于刚完成的那次解题
+            self._log_attempt(
+                state, "review", state["attempts"] - 1, model, response, start,
+                passed=isinstance(result, dict) and bool(result.get("passed", False))
+            )
 
-                return state
-            except json.JSONDecodeError:
+            if not isinstance(result, dict):
                 # JSON解析失败，设置为审查不通过
                 state["review_passed"] = False
                 state["review_reason"] = "JSON解析失败"
+                state["parse_failures"] = state.get("parse_failures", 0) + 1
                 return state
+
+            # 更新状态
+            state["review_passed"] = bool(result.get("passed", False))
+            state["review_reason"] = result.get("reason", "未提供审查意见")
+
+            return state
+        except LLMDeadlineExceeded:
+            # 请求时限耗尽时不再继续工作流，由应用返回504
+            raise
         except Exception as e:
             # 记录错误信息
             logger.error(f"审查过程出错: {str(e)}")
@@ -246,9 +420,9 @@ class LLMSolvingWorkflow:
         # 创建工作流图
         workflow = StateGraph(SolveState)
 
-        # 添加节点
-        workflow.add_node("solve", self._solve_node)
-        workflow.add_node("review", self._review_node)
+        # 添加节点，每次节点执行对应一个追踪span
+        workflow.add_node("solve", traced("solving.solve")(self._solve_node))
+        workflow.add_node("review", traced("solving.review")(self._review_node))
 
         # 添加边
         workflow.add_edge("solve", "review")
@@ -286,22 +460,26 @@ class LLMSolvingWorkflow:
         # 确保状态包含尝试次数字段
         if "attempts" not in initial_state:
             initial_state["attempts"] = 1
+        if "parse_failures" not in initial_state:
+            initial_state["parse_failures"] = 0
+        if "attempt_log" not in initial_state:
+            initial_state["attempt_log"] = []
 
         try:
-            # 创建Langfuse回调处理器
-            langfuse_handler = CallbackHandler(
+            # 运行工作流，按采样率使用langfuse回调，整个工作流归入同一条链路
+            callbacks = langfuse_callbacks(
+                ["解题工作流"],
                 session_id=str(initial_state.get("trace_id", "")),
-                user_id=str(initial_state.get("user_id", "")),
-                tags=["解题工作流"]
+                user_id=str(initial_state.get("user_id", ""))
             )
-
-            # 运行工作流，使用langfuse回调
             result = await self.graph.ainvoke(
                 initial_state,
-                config={"callbacks": [langfuse_handler]}
+                config={"callbacks": callbacks}
             )
 
             return result
+        except LLMDeadlineExceeded:
+            raise
         except Exception as e:
             # 记录错误信息
             logger.error(f"解题工作流执行出错: {str(e)}")
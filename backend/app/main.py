@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
@@ -6,12 +7,33 @@ from fastapi.staticfiles import StaticFiles
 import logging
 
 from app.api.routes.api import api_router
+from app.core.admission import AdmissionMiddleware, get_admission_stats
 from app.core.config import settings
+from app.core.deadline import DeadlineMiddleware
+from app.core.metrics import MetricsMiddleware, instrument_engine, render_metrics, CONTENT_TYPE
+from app.core.query_tracker import QueryTrackerMiddleware, track_queries
+from app.core.rate_limit import RateLimitMiddleware, get_rate_limit_stats
+from app.core.tracing import TracingMiddleware, setup_tracing, shutdown_tracing, trace_engine
 from app.db.create_tables import create_tables
 from app.db.init_db import init_db
 from app.db.create_index import create_indexes
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, engine
 from app.db.reset_sequence import reset_all_sequences
+from app.llm_services.common import (
+    get_limiter_stats,
+    get_resilience_stats,
+    get_singleflight_stats,
+    get_usage_stats,
+    get_parse_stats,
+    get_langfuse_stats,
+    shutdown_langfuse,
+    get_accounting_stats,
+    start_usage_flusher,
+    stop_usage_flusher,
+    LLMDeadlineExceeded
+)
+from app.llm_services.solving import get_routing_stats
+from app.llm_services.knowledge_retriever import refresh_category_index, warm_category_classifier
 
 # 加载环境变量
 load_dotenv()
@@ -27,6 +49,14 @@ app = FastAPI(
     version="0.1.0"
 )
 
+# 过载保护：LLM接口与读取接口使用各自的并发容量和有界队列，预计等待过长时返回503；位于限流之内，被限流的请求不占用队列
+if settings.ADMISSION_ENABLED.lower() == "true":
+    app.add_middleware(AdmissionMiddleware)
+
+# 调用LLM的接口按用户限流，位于CORS之内使429响应同样带有CORS头
+if settings.RATE_LIMIT_ENABLED.lower() == "true":
+    app.add_middleware(RateLimitMiddleware)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -36,6 +66,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 为每个请求设置处理时限，LLM调用的超时与重试受其约束
+app.add_middleware(DeadlineMiddleware)
+
+# 每个请求的SQL语句数统计、N+1检测与慢查询日志
+app.add_middleware(QueryTrackerMiddleware)
+track_queries(engine)
+
+# 链路追踪：每个请求一个根span，SQL语句、图片写入、解题工作流节点与LLM调用为其子span
+if setup_tracing():
+    app.add_middleware(TracingMiddleware)
+    trace_engine(engine)
+
+# 请求延迟指标（最外层，包含其他中间件的耗时）与数据库语句计时
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+
 # 配置静态文件服务
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -44,6 +90,11 @@ app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 # 添加API路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.exception_handler(LLMDeadlineExceeded)
+async def llm_deadline_exceeded_handler(request: Request, exc: LLMDeadlineExceeded):
+    """请求处理时限内LLM调用未完成时返回504"""
+    return JSONResponse(status_code=504, content={"detail": exc.message})
+
 @app.on_event("startup")
 async def startup_db_client():
     """应用启动时创建数据库表并初始化数据"""
@@ -71,6 +122,20 @@ async def startup_db_client():
     else:
         logger.info("跳过数据库初始化 (设置 RUN_DB_INIT=true 以启用)")
 
+    # 定期将LLM用量写入数据库
+    start_usage_flusher()
+
+    # 在后台训练本地知识点类别分类器并同步知识点类别向量索引，完成前分析请求不经过二者
+    warm_category_classifier()
+    refresh_category_index()
+
+@app.on_event("shutdown")
+async def shutdown_observability():
+    """应用关闭时写入剩余的LLM用量，导出剩余的追踪数据和Langfuse事件"""
+    await stop_usage_flusher()
+    shutdown_tracing()
+    shutdown_langfuse()
+
 @app.get("/")
 async def root():
     return {"message": "欢迎使用GradNote API"}
@@ -79,6 +144,27 @@ async def root():
 async def health_check():
     return {"status": "i guess it's healthy"}
 
+@app.get("/health/llm")
+async def llm_health_check():
+    """LLM调用状态：各模型的并发上限、排队深度与等待时间，重试与对冲，请求合并、token用量、JSON解析统计、解题各尝试的模型路由统计、Langfuse上报统计、LLM用量写入与配额统计、接口限流统计以及过载保护的并发与排队状态"""
+    return {
+        "limiters": get_limiter_stats(),
+        "resilience": get_resilience_stats(),
+        "singleflight": get_singleflight_stats(),
+        "usage": get_usage_stats(),
+        "parse": get_parse_stats(),
+        "routing": get_routing_stats(),
+        "langfuse": get_langfuse_stats(),
+        "accounting": get_accounting_stats(),
+        "rate_limit": get_rate_limit_stats(),
+        "admission": get_admission_stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus格式指标：路由延迟、LLM调用延迟/token/错误、数据库语句耗时、连接池与线程池占用"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -1,6 +1,7 @@
 from app.models.user import User
 from app.models.question import WrongQuestion
-from app.models.knowledge import KnowledgePoint, QuestionKnowledgeRelation, UserMark
+from app.models.knowledge import KnowledgePoint, QuestionKnowledgeRelation, UserMark, KnowledgeCategoryEmbedding
+from app.models.usage import LLMUsage
 
 # 方便导入所有模型
 __all__ = [
@@ -8,5 +9,7 @@ __all__ = [
     "WrongQuestion",
     "KnowledgePoint",
     "QuestionKnowledgeRelation",
-    "UserMark"
+    "UserMark",
+    "KnowledgeCategoryEmbedding",
+    "LLMUsage"
 ] 
\ No newline at end of file
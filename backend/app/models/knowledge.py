@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, LargeBinary, UniqueConstraint
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -29,4 +29,16 @@ class UserMark(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     knowledge_point_id = Column(Integer, ForeignKey("knowledge_points.id"))
     question_id = Column(Integer, ForeignKey("wrong_questions.id"))
-    marked_at = Column(DateTime(timezone=True), server_default=func.now()) 
\ No newline at end of file
+    marked_at = Column(DateTime(timezone=True), server_default=func.now()) 
+
+class KnowledgeCategoryEmbedding(Base):
+    __tablename__ = "knowledge_category_embeddings"
+    __table_args__ = (UniqueConstraint("subject", "chapter", "section", "model"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    subject = Column(String(50), nullable=False)
+    chapter = Column(String(100), nullable=False)
+    section = Column(String(100), nullable=False)
+    model = Column(String(100), nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # float32向量的原始字节
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
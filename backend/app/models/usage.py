@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class LLMUsage(Base):
+    __tablename__ = "llm_usage"
+    __table_args__ = (UniqueConstraint("day", "user_id", "endpoint", "model"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)  # 0 表示不在用户请求中的调用
+    endpoint = Column(String(200), nullable=False)  # 路由模板，如 /api/v1/solving/{question_id}
+    model = Column(String(100), nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(BigInteger, nullable=False, default=0)
+    output_tokens = Column(BigInteger, nullable=False, default=0)
+    cached_tokens = Column(BigInteger, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0.0)  # 按 LLM_PRICES 计算的费用
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -2,6 +2,7 @@ import os
 from typing import Dict, Optional
 import aiofiles
 import uuid
+from app.core.tracing import span
 from app.llm_services.image_processing import (
     ImageProcessor,
     ImageProcessorError,
@@ -12,6 +13,7 @@ from app.llm_services.image_processing import (
     InvalidBase64Error,
     ImagePathError
 )
+from app.llm_services.common import LLMDeadlineExceeded
 
 # 从环境变量获取配置
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
@@ -45,8 +47,9 @@ async def save_uploaded_image(file_content: bytes, filename: str) -> str:
     file_path = os.path.join(UPLOAD_DIR, unique_filename)
 
     # 保存文件
-    async with aiofiles.open(file_path, 'wb') as f:
-        await f.write(file_content)
+    with span("save_uploaded_image", file_path=file_path, file_size=len(file_content)):
+        async with aiofiles.open(file_path, 'wb') as f:
+            await f.write(file_content)
 
     return file_path
 
@@ -141,6 +144,9 @@ async def process_question_image(file_content: bytes, filename: str) -> Dict:
             "error_code": "PROCESSING_ERROR",
             "image_url": None
         }
+    except LLMDeadlineExceeded:
+        # 请求时限耗尽，由应用返回504
+        raise
     except Exception as e:
         return {
             "status": "error",
@@ -240,6 +246,9 @@ async def process_answer_image(file_content: bytes, filename: str) -> Dict:
             "error_code": "PROCESSING_ERROR",
             "image_url": None
         }
+    except LLMDeadlineExceeded:
+        # 请求时限耗尽，由应用返回504
+        raise
     except Exception as e:
         return {
             "status": "error",
@@ -1,7 +1,21 @@
+from sqlalchemy import case, func, text, tuple_
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from app.models.knowledge import KnowledgePoint, UserMark
+from app.models.question import WrongQuestion
+from app.services.knowledge_autocomplete import invalidate_item_index
+from app.llm_services.knowledge_retriever import LLMKnowledgeRetriever, get_category_index, refresh_category_index, get_category_classifier, train_classifier_sample, LLM_RETRIEVER_TOP_K, LLM_CLASSIFIER_ENABLED
 from datetime import datetime
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 是否已安装pg_trgm扩展，首次按名称搜索知识点时检查
+_pg_trgm: Optional[bool] = None
+
+# 进行中的类别向量计算任务，保留引用避免任务被回收
+_indexing: Set["asyncio.Task"] = set()
 
 def get_knowledge_points_by_structure(
     db: Session,
@@ -90,15 +104,47 @@ def get_knowledge_points_by_params(
     if "item" in params and params["item"]:
         query = query.filter(KnowledgePoint.item.ilike(f"%{params['item']}%"))
     
-    # 添加排序
-    if "sort_by" in params:
-        if params["sort_by"] == "mark_count":
-            query = query.order_by(KnowledgePoint.mark_count.desc())
-        elif params["sort_by"] == "created_at":
-            query = query.order_by(KnowledgePoint.created_at.desc())
+    # 添加排序，未指定排序字段时按知识点名称与搜索词的相似度（pg_trgm）排序，相似度相同时标记次数多的在前
+    sort_by = params.get("sort_by")
+    if sort_by == "mark_count":
+        query = query.order_by(KnowledgePoint.mark_count.desc())
+    elif sort_by == "created_at":
+        query = query.order_by(KnowledgePoint.created_at.desc())
+    elif params.get("item"):
+        query = query.order_by(*_item_relevance(db, params["item"]), KnowledgePoint.mark_count.desc(), KnowledgePoint.id)
     
     return query.offset(skip).limit(limit).all()
 
+def _pg_trgm_installed(db: Session) -> bool:
+    """数据库是否已安装pg_trgm扩展（由 create_index 安装），结果在进程内缓存"""
+    global _pg_trgm
+    if _pg_trgm is None:
+        try:
+            _pg_trgm = db.get_bind().dialect.name == "postgresql" and db.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first() is not None
+        except Exception as e:
+            logger.warning(f"检查pg_trgm扩展失败，知识点搜索不按相似度排序: {e}")
+            _pg_trgm = False
+    return _pg_trgm
+
+def _item_relevance(db: Session, item: str) -> list:
+    """
+    知识点名称与搜索词的相关度排序表达式
+
+    安装了pg_trgm时按三元组相似度降序；否则依次按 完全相同、前缀匹配、名称长度 排序作为近似。
+    """
+    if _pg_trgm_installed(db):
+        return [func.similarity(KnowledgePoint.item, item).desc()]
+    return [
+        case(
+            (func.lower(KnowledgePoint.item) == item.lower(), 0),
+            (KnowledgePoint.item.ilike(f"{item}%"), 1),
+            else_=2
+        ),
+        func.length(KnowledgePoint.item)
+    ]
+
 def get_subjects(db: Session) -> List[str]:
     """
     获取所有科目列表
@@ -227,17 +273,16 @@ def get_user_marks(db: Session, user_id: int) -> List[UserMark]:
     """
     return db.query(UserMark).filter(UserMark.user_id == user_id).all()
 
-def get_all_categories_csv(db: Session) -> str:
+def get_all_categories(db: Session) -> List[Tuple[str, str, str]]:
     """
-    获取所有知识点类别的CSV格式表示
-    
+    获取所有唯一的科目-章节-小节组合
+
     Parameters:
     - db: 数据库会话
-    
+
     Returns:
-    - CSV格式的知识点类别字符串
+    - (科目, 章节, 小节) 元组列表
     """
-    # 获取所有唯一的科目-章节-小节组合
     query = db.query(
         KnowledgePoint.subject,
         KnowledgePoint.chapter,
@@ -247,14 +292,171 @@ def get_all_categories_csv(db: Session) -> str:
         KnowledgePoint.chapter,
         KnowledgePoint.section
     )
-    
-    # 生成CSV格式的表头和内容
+    return [tuple(row) for row in query.all()]
+
+def categories_to_csv(categories: List[Tuple[str, str, str]]) -> str:
+    """
+    将知识点类别转换为CSV格式
+
+    Parameters:
+    - categories: (科目, 章节, 小节) 元组列表
+
+    Returns:
+    - CSV格式的知识点类别字符串
+    """
     result = "科目,章节,小节\n"
-    for subject, chapter, section in query.all():
+    for subject, chapter, section in categories:
         result += f"{subject},{chapter},{section}\n"
-    
     return result
 
+def get_all_categories_csv(db: Session) -> str:
+    """
+    获取所有知识点类别的CSV格式表示
+    
+    Parameters:
+    - db: 数据库会话
+    
+    Returns:
+    - CSV格式的知识点类别字符串
+    """
+    return categories_to_csv(get_all_categories(db))
+
+async def get_candidate_categories_csv(db: Session, question_text: str) -> str:
+    """
+    获取送入检索LLM的候选知识点类别CSV
+
+    配置了向量模型且索引中的类别数超过 LLM_RETRIEVER_TOP_K 时，通过向量索引筛选出
+    与题目最相关的top-k个类别，否则返回全部类别；索引尚在后台加载或向量服务出错时退回全部类别。
+    索引的加载与补齐在后台进行，这里只做检索。
+
+    Parameters:
+    - db: 数据库会话
+    - question_text: 题目文本
+
+    Returns:
+    - CSV格式的候选知识点类别字符串
+    """
+    index = get_category_index()
+    if index is None:
+        return get_all_categories_csv(db)
+    refresh_category_index()
+    if not index.ready or len(index) <= LLM_RETRIEVER_TOP_K:
+        return get_all_categories_csv(db)
+
+    try:
+        candidates = await index.search(question_text, LLM_RETRIEVER_TOP_K)
+    except Exception as e:
+        logger.warning(f"知识点类别向量检索失败，使用全部类别: {e}")
+        return get_all_categories_csv(db)
+
+    return categories_to_csv(candidates) if candidates else get_all_categories_csv(db)
+
+async def _index_categories(categories: List[Tuple[str, str, str]]) -> None:
+    """后台计算类别向量，失败时仅记录日志"""
+    try:
+        await get_category_index().add_categories(categories, persist=True)
+    except Exception as e:
+        logger.warning(f"知识点类别向量计算失败: {e}")
+    finally:
+        _indexing.discard(asyncio.current_task())
+
+def index_categories(categories: List[Tuple[str, str, str]]) -> None:
+    """
+    在后台为新出现的知识点类别计算向量，不等待完成，失败时下次后台同步会自动补齐
+
+    向量计算和持久化不使用请求的数据库会话，避免提交后请求中已加载的对象过期重新查询。
+
+    Parameters:
+    - categories: (科目, 章节, 小节) 元组列表
+    """
+    if get_category_index() is None:
+        return
+    _indexing.add(asyncio.ensure_future(_index_categories(categories)))
+
+async def analyze_question_categories(db: Session, question_text: str) -> List[Tuple[str, str, str]]:
+    """
+    分析题目所属的知识点类别
+
+    本地分类器高置信度命中时直接返回，否则经向量索引预筛选候选类别后调用检索LLM。
+
+    Parameters:
+    - db: 数据库会话
+    - question_text: 题目文本
+
+    Returns:
+    - (科目, 章节, 小节) 元组列表
+    """
+    predicted = predict_question_category(question_text)
+    if predicted is not None:
+        return [predicted]
+
+    categories_csv = await get_candidate_categories_csv(db, question_text)
+    retriever = LLMKnowledgeRetriever()
+    categories_data = await retriever.analyze_knowledge_category(
+        question_text=question_text,
+        categories_csv=categories_csv
+    )
+    return [(cat["subject"], cat["chapter"], cat["section"]) for cat in categories_data]
+
+def get_knowledge_points_by_categories(
+    db: Session,
+    categories: List[Tuple[str, str, str]]
+) -> List[KnowledgePoint]:
+    """
+    一次查询获取多个（科目、章节、小节）下的全部知识点，按标记次数降序排列
+
+    Parameters:
+    - db: 数据库会话
+    - categories: (科目, 章节, 小节) 元组列表
+
+    Returns:
+    - 知识点列表
+    """
+    categories = list(dict.fromkeys(categories))
+    if not categories:
+        return []
+
+    return db.query(KnowledgePoint).filter(
+        tuple_(KnowledgePoint.subject, KnowledgePoint.chapter, KnowledgePoint.section).in_(categories)
+    ).order_by(KnowledgePoint.mark_count.desc(), KnowledgePoint.id).all()
+
+def predict_question_category(question_text: str) -> Optional[Tuple[str, str, str]]:
+    """
+    使用本地分类器预测题目所属的知识点类别，仅在高置信度时返回结果
+
+    Parameters:
+    - question_text: 题目文本
+
+    Returns:
+    - (科目, 章节, 小节) 元组，未启用分类器或置信度不足时返回None
+    """
+    try:
+        classifier = get_category_classifier()
+        if classifier is None:
+            return None
+        return classifier.predict_confident(question_text)
+    except Exception as e:
+        logger.warning(f"知识点类别分类器预测失败: {e}")
+        return None
+
+def train_category_classifier(db: Session, question_id: int, categories: List[Tuple[str, str, str]]) -> None:
+    """
+    用户确认知识点标记后，以该题目增量训练本地分类器
+
+    Parameters:
+    - db: 数据库会话
+    - question_id: 题目ID
+    - categories: 确认的 (科目, 章节, 小节) 元组列表
+    """
+    try:
+        if not LLM_CLASSIFIER_ENABLED or not categories:
+            return
+        question = db.query(WrongQuestion).filter(WrongQuestion.id == question_id).first()
+        if question:
+            train_classifier_sample(question.content, categories)
+    except Exception as e:
+        logger.warning(f"知识点类别分类器增量训练失败: {e}")
+
 def create_knowledge_point(
     db: Session,
     knowledge_point_data: Dict[str, Any]
@@ -281,6 +483,7 @@ def create_knowledge_point(
     db.add(knowledge_point)
     db.commit()
     db.refresh(knowledge_point)
+    invalidate_item_index()
     return knowledge_point
 
 def get_knowledge_points_by_ids(db: Session, knowledge_point_ids: List[int]) -> List[KnowledgePoint]:
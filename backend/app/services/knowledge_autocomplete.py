@@ -0,0 +1,195 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.db.session import SessionLocal
+from app.models.knowledge import KnowledgePoint
+
+logger = logging.getLogger(__name__)
+
+# 索引重建间隔（秒），期间新建的知识点和标记次数变化在下次重建后生效
+KNOWLEDGE_AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv("KNOWLEDGE_AUTOCOMPLETE_REFRESH_SECONDS", "300"))
+
+# 命中区间超过该大小的前缀（通常为1~2个字符）缓存其查询结果，索引重建时随之丢弃
+_CACHE_MIN_RANGE = 500
+_MAX_CACHED_PREFIXES = 10_000
+
+
+class ItemPrefixIndex:
+    """
+    知识点名称的前缀索引
+
+    名称（小写）排序后存于列表，前缀匹配为一次二分查找得到的连续区间，区间内按标记次数取前N个，
+    区间较大的前缀缓存结果；ID、标记次数和类别下标存于紧凑数组，科目/章节/小节只保存一份。
+    """
+
+    def __init__(self, rows: List[Tuple[int, str, str, str, str, int]]):
+        """
+        构建索引
+
+        Args:
+            rows: (ID, 名称, 科目, 章节, 小节, 标记次数) 列表
+        """
+        # 按 (小写名称, ID) 排序，ID唯一，行本身不参与比较
+        keyed = sorted((row[1].lower(), row[0], row) for row in rows)
+        categories: Dict[Tuple[str, str, str], int] = {}
+        self.keys: List[str] = []
+        self.items: List[str] = []
+        self.ids = array("q")
+        self.marks = array("q")
+        self.category_of = array("l")
+        for key, _, (knowledge_point_id, item, subject, chapter, section, mark_count) in keyed:
+            self.keys.append(key)
+            # 名称本身为小写时与排序键共用同一字符串
+            self.items.append(key if key == item else item)
+            self.ids.append(knowledge_point_id)
+            self.marks.append(mark_count or 0)
+            # 相同类别只保留首次出现的字符串
+            self.category_of.append(categories.setdefault((subject, chapter, section), len(categories)))
+        self.categories = list(categories)
+        self._cache: Dict[Tuple[int, int, int], List[Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """
+        名称以前缀开头（不区分大小写）的知识点在排序列表中的区间
+
+        Args:
+            prefix: 前缀
+
+        Returns:
+            [起始, 结束) 下标
+        """
+        prefix = prefix.strip().lower()
+        start = bisect_left(self.keys, prefix)
+        # 前缀后接最大码位字符，二分得到区间右端
+        return start, bisect_left(self.keys, prefix + "\U0010ffff", start)
+
+    def search(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        查找名称以指定前缀开头的知识点（不区分大小写）
+
+        Args:
+            prefix: 前缀
+            limit: 返回数量
+
+        Returns:
+            按标记次数降序（相同时按名称）排列的知识点字典列表
+        """
+        if not prefix.strip():
+            return []
+        start, end = self.prefix_range(prefix)
+        cached = end - start > _CACHE_MIN_RANGE
+        if cached and (start, end, limit) in self._cache:
+            return self._cache[(start, end, limit)]
+        if end - start <= limit:
+            positions = sorted(range(start, end), key=lambda i: -self.marks[i])
+        else:
+            positions = heapq.nlargest(limit, range(start, end), key=self.marks.__getitem__)
+
+        results = []
+        for i in positions:
+            subject, chapter, section = self.categories[self.category_of[i]]
+            results.append({
+                "id": self.ids[i],
+                "item": self.items[i],
+                "subject": subject,
+                "chapter": chapter,
+                "section": section,
+                "mark_count": self.marks[i]
+            })
+        if cached:
+            if len(self._cache) >= _MAX_CACHED_PREFIXES:
+                self._cache.clear()
+            self._cache[(start, end, limit)] = results
+        return results
+
+
+_index: Optional[ItemPrefixIndex] = None
+_built_at = 0.0
+_building: Optional["asyncio.Future"] = None
+# 每次 invalidate_item_index 加1，重建期间发生的失效使新索引仍视为过期
+_generation = 0
+
+
+def _load_index() -> ItemPrefixIndex:
+    """从数据库读取全部知识点名称构建索引，在线程池中执行"""
+    start = time.monotonic()
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            KnowledgePoint.id,
+            KnowledgePoint.item,
+            KnowledgePoint.subject,
+            KnowledgePoint.chapter,
+            KnowledgePoint.section,
+            KnowledgePoint.mark_count
+        ).all()
+    finally:
+        db.close()
+    index = ItemPrefixIndex([tuple(row) for row in rows])
+    logger.info(f"知识点名称前缀索引已构建: {len(index)} 个知识点，耗时 {time.monotonic() - start:.2f}s")
+    return index
+
+
+async def _rebuild(generation: int) -> Optional[ItemPrefixIndex]:
+    global _index, _built_at, _building
+    try:
+        _index = await asyncio.to_thread(_load_index)
+    except Exception as e:
+        logger.warning(f"知识点名称前缀索引构建失败，继续使用旧索引: {e}")
+    finally:
+        _built_at = time.monotonic() if generation == _generation else 0.0
+        _building = None
+    return _index
+
+
+async def get_item_index() -> Optional[ItemPrefixIndex]:
+    """
+    获取进程内共享的前缀索引
+
+    首次调用时构建并等待；索引过期后由后台任务重建，重建完成前继续使用旧索引，请求不等待数据库。
+    同一时间只有一个重建任务，重建失败时旧索引继续使用到下一个周期。
+
+    Returns:
+        ItemPrefixIndex实例，从未构建成功时返回None
+    """
+    global _building
+    if _index is not None and time.monotonic() - _built_at < KNOWLEDGE_AUTOCOMPLETE_REFRESH_SECONDS:
+        return _index
+    if _building is None:
+        _building = asyncio.ensure_future(_rebuild(_generation))
+    if _index is None:
+        return await asyncio.shield(_building)
+    return _index
+
+
+def invalidate_item_index() -> None:
+    """标记索引过期，下一次查询时在后台重建，新建知识点的事务提交后调用"""
+    global _built_at, _generation
+    _built_at = 0.0
+    _generation += 1
+
+
+async def autocomplete_items(prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    按名称前缀补全知识点
+
+    Args:
+        prefix: 用户已输入的前缀
+        limit: 返回数量
+
+    Returns:
+        按标记次数降序排列的知识点字典列表
+    """
+    index = await get_item_index()
+    if index is None:
+        return []
+    return index.search(prefix, limit)
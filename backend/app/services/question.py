@@ -0,0 +1,153 @@
+import re
+import html
+import base64
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, or_, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.question import WrongQuestion
+
+# 参与搜索的字段及命中时的得分：题目内容 > 备注 > 解答
+SEARCH_FIELDS = (("content", 4), ("remark", 2), ("solution", 1))
+MAX_SEARCH_TERMS = 5
+# 高亮片段中首个命中词前后保留的字符数
+SNIPPET_CHARS = 40
+
+
+def parse_search_terms(query: str) -> List[str]:
+    """
+    将搜索词按空白拆分为多个词，忽略大小写去重
+
+    Parameters:
+    - query: 搜索词
+
+    Returns:
+    - 词列表，最多 MAX_SEARCH_TERMS 个
+    """
+    terms = {}
+    for term in query.split():
+        terms.setdefault(term.lower(), term)
+    return list(terms.values())[:MAX_SEARCH_TERMS]
+
+
+def _like_pattern(term: str) -> str:
+    """子串匹配的LIKE模式，转义通配符"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def encode_cursor(score: int, question_id: int) -> str:
+    """将上一页最后一条结果的 (得分, ID) 编码为分页游标"""
+    return base64.urlsafe_b64encode(f"{score}:{question_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    解析分页游标
+
+    Parameters:
+    - cursor: encode_cursor 生成的游标
+
+    Returns:
+    - (得分, 错题ID)
+
+    Raises:
+    - ValueError: 游标格式无效
+    """
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        score, question_id = decoded.split(":")
+        return int(score), int(question_id)
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
+
+
+def highlight(text: Optional[str], terms: List[str]) -> Optional[str]:
+    """
+    截取首个命中词附近的片段，命中词以 <mark></mark> 标出，其余文本做HTML转义
+
+    Parameters:
+    - text: 字段内容
+    - terms: 搜索词列表
+
+    Returns:
+    - 高亮片段，未命中时返回None
+    """
+    if not text:
+        return None
+    # 较长的词优先匹配，避免被其中包含的短词截断
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(text)
+    if first is None:
+        return None
+
+    start = max(0, first.start() - SNIPPET_CHARS)
+    end = min(len(text), first.end() + SNIPPET_CHARS)
+    parts = ["…" if start > 0 else ""]
+    position = start
+    for match in pattern.finditer(text, start, end):
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+    parts.append("…" if end < len(text) else "")
+    return "".join(parts)
+
+
+def search_questions(
+    db: Session,
+    user_id: int,
+    query: str,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Tuple[List[Tuple[WrongQuestion, int, Dict[str, str]]], Optional[str]]:
+    """
+    在用户的错题中搜索题目内容、解答和备注
+
+    每个词需在任一字段中以子串出现（不区分大小写），结果按命中得分（各词在各字段的命中权重之和）降序、
+    错题ID降序排列，按 (得分, ID) 游标分页。子串匹配由 content/solution/remark 上的pg_trgm GIN索引支持，
+    按字符n-gram匹配，中文无需分词；不足3个字符的词无法使用三元组索引，由用户ID索引限定范围后过滤。
+
+    Parameters:
+    - db: 数据库会话
+    - user_id: 用户ID
+    - query: 搜索词，多个词以空格分隔
+    - limit: 每页数量
+    - cursor: 上一页返回的游标，为空时返回第一页
+
+    Returns:
+    - (结果列表, 下一页游标)，结果为 (错题, 得分, 各字段的高亮片段)，没有下一页时游标为None
+
+    Raises:
+    - ValueError: 游标格式无效
+    """
+    terms = parse_search_terms(query)
+    if not terms:
+        return [], None
+
+    conditions = []
+    weights = []
+    for term in terms:
+        pattern = _like_pattern(term)
+        matches = [(getattr(WrongQuestion, field).ilike(pattern, escape="\\"), weight) for field, weight in SEARCH_FIELDS]
+        conditions.append(or_(*(match for match, _ in matches)))
+        weights.extend(case((match, weight), else_=0) for match, weight in matches)
+    score = sum(weights[1:], weights[0])
+
+    statement = db.query(WrongQuestion, score.label("score")).filter(WrongQuestion.user_id == user_id, *conditions)
+    if cursor:
+        last_score, last_id = decode_cursor(cursor)
+        statement = statement.filter(tuple_(score, WrongQuestion.id) < tuple_(last_score, last_id))
+    rows = statement.order_by(score.desc(), WrongQuestion.id.desc()).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0].id) if len(rows) > limit else None
+    results = []
+    for question, question_score in rows[:limit]:
+        highlights = {}
+        for field, _ in SEARCH_FIELDS:
+            snippet = highlight(getattr(question, field), terms)
+            if snippet is not None:
+                highlights[field] = snippet
+        results.append((question, question_score, highlights))
+    return results, next_cursor
@@ -1,17 +1,114 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from sqlalchemy.orm import Session
 from app.models.question import WrongQuestion
 from app.models.knowledge import KnowledgePoint, QuestionKnowledgeRelation
 from app.llm_services.solving import LLMSolvingWorkflow
 from app.services.knowledge import get_knowledge_points_by_ids, get_all_categories_csv
 from app.llm_services.knowledge_retriever import LLMKnowledgeRetriever
+from app.llm_services.common import LLMDeadlineExceeded
+from app.core.redis_client import get_redis
+from collections import OrderedDict
+import hashlib
+import json
 import logging
+import os
+import time
 from datetime import datetime
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 解题结果中知识点信息的保存时长（秒）和进程内最大条目数
+SOLUTION_STORE_TTL = int(os.getenv("SOLUTION_STORE_TTL", "86400"))
+SOLUTION_STORE_MAX_SIZE = 1024
+
+# 进程内存储：key -> (过期时间, 知识点信息)，未启用Redis时使用
+_solution_store: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+
+def _solution_key(question_text: str, solution_text: str) -> str:
+    """
+    根据题目和解题过程生成存储键
+
+    Args:
+        question_text: 题目文本
+        solution_text: 解题过程文本
+
+    Returns:
+        存储键
+    """
+    digest = hashlib.sha256(f"{question_text}\0{solution_text}".encode("utf-8")).hexdigest()
+    return f"solution_knowledge:{digest}"
+
+
+async def save_solution_knowledge(
+    question_text: str,
+    solution_text: str,
+    used_knowledge_point_ids: List[int],
+    new_knowledge_points: List[Dict[str, Any]]
+) -> None:
+    """
+    保存合并模式下解题步骤输出的知识点信息，供知识点提取接口直接复用
+
+    Args:
+        question_text: 题目文本
+        solution_text: 解题过程文本
+        used_knowledge_point_ids: 解题用到的已有知识点ID列表
+        new_knowledge_points: 解题用到的新知识点列表
+    """
+    key = _solution_key(question_text, solution_text)
+    value = {
+        "used_knowledge_point_ids": used_knowledge_point_ids,
+        "new_knowledge_points": new_knowledge_points
+    }
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            await redis.set(key, json.dumps(value, ensure_ascii=False), ex=SOLUTION_STORE_TTL)
+            return
+        except Exception as e:
+            logger.warning(f"Redis写入解题知识点失败，使用进程内存储: {e}")
+
+    _solution_store[key] = (time.monotonic() + SOLUTION_STORE_TTL, value)
+    _solution_store.move_to_end(key)
+    while len(_solution_store) > SOLUTION_STORE_MAX_SIZE:
+        _solution_store.popitem(last=False)
+
+
+async def get_solution_knowledge(question_text: str, solution_text: str) -> Optional[Dict[str, Any]]:
+    """
+    获取解题步骤保存的知识点信息
+
+    Args:
+        question_text: 题目文本
+        solution_text: 解题过程文本
+
+    Returns:
+        包含 used_knowledge_point_ids 和 new_knowledge_points 的字典，不存在则返回None
+    """
+    key = _solution_key(question_text, solution_text)
+
+    redis = get_redis()
+    if redis is not None:
+        try:
+            value = await redis.get(key)
+            if value is not None:
+                return json.loads(value)
+        except Exception as e:
+            logger.warning(f"Redis读取解题知识点失败，使用进程内存储: {e}")
+
+    entry = _solution_store.get(key)
+    if entry is None:
+        return None
+    expires_at, value = entry
+    if expires_at < time.monotonic():
+        _solution_store.pop(key, None)
+        return None
+    return value
+
+
 async def solve_question(db: Session, question_id: int, knowledge_points_data: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     解答错题
@@ -71,8 +168,13 @@ async def solve_question(db: Session, question_id: int, knowledge_points_data: L
             })
         
         # 初始化工作流状态
+        # 题目未填写科目时按知识点中出现最多的科目选择模型路由策略
+        subjects = [kp.subject for kp in db_knowledge_points if kp.subject]
+        subject = question.subject or (max(set(subjects), key=subjects.count) if subjects else None)
+
         initial_state = {
             "question": question.content,
+            "subject": subject,
             "knowledge_points": llm_knowledge_points,
             "correct_answer": question.answer,
             "attempts": 1
@@ -81,6 +183,12 @@ async def solve_question(db: Session, question_id: int, knowledge_points_data: L
         # 创建并异步运行工作流
         workflow = LLMSolvingWorkflow()
         result = await workflow.invoke(initial_state)
+
+        for record in result.get("attempt_log", []):
+            logger.info(f"错题 ID {question_id} 解题调用: {record}")
+
+        if result.get("parse_failures"):
+            logger.info(f"错题 ID {question_id} 因审查结果解析失败重试 {result['parse_failures']} 次")
         
         if result.get("error"):
             return {
@@ -88,6 +196,15 @@ async def solve_question(db: Session, question_id: int, knowledge_points_data: L
                 "message": result.get("error", "解题过程出错")
             }
         
+        # 合并模式下保存解题用到的知识点，知识点提取接口可直接复用而无需再次调用LLM
+        if result.get("used_knowledge_point_ids") is not None:
+            await save_solution_knowledge(
+                question_text=question.content,
+                solution_text=result.get("solution", ""),
+                used_knowledge_point_ids=result["used_knowledge_point_ids"],
+                new_knowledge_points=result.get("new_knowledge_points") or []
+            )
+        
         # 为响应准备完整的知识点数据
         complete_knowledge_points = []
         for kp in db_knowledge_points:
@@ -112,8 +229,13 @@ async def solve_question(db: Session, question_id: int, knowledge_points_data: L
                 "review_passed": result.get("review_passed", False),
                 "review_reason": result.get("review_reason", ""),
                 "knowledge_points": complete_knowledge_points,
+                "used_knowledge_point_ids": result.get("used_knowledge_point_ids"),
+                "new_knowledge_points": result.get("new_knowledge_points"),
             }
         }
+    except LLMDeadlineExceeded:
+        # 请求时限耗尽，由应用返回504
+        raise
     except Exception as e:
         # 记录错误信息
         logger.error(f"解题过程出错: {str(e)}")
@@ -0,0 +1,85 @@
+"""
+知识点名称前缀补全基准测试
+
+构建 ItemPrefixIndex 并测量：构建耗时、索引占用内存，以及按1~4个字符前缀查询的p50/p99延迟
+（前缀从知识点名称中随机截取，模拟逐键输入；命中区间较大的前缀首次查询后使用缓存）。
+
+默认从 .env 配置的数据库读取知识点（可先用 generate_scale_data 生成规模数据），
+--synthetic 时使用 generate_scale_data 的词表合成指定数量的知识点，不需要数据库。
+
+用法（在backend目录下）:
+    python -m benchmarks.bench_autocomplete
+    python -m benchmarks.bench_autocomplete --synthetic 300000 --queries 20000
+"""
+import os
+import time
+import random
+import argparse
+import tracemalloc
+from typing import List, Tuple
+
+# 合成数据时不连接数据库，仅满足配置加载
+os.environ.setdefault("POSTGRES_SERVER", "localhost")
+os.environ.setdefault("POSTGRES_PASSWORD", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.services.knowledge_autocomplete import ItemPrefixIndex, _load_index
+from benchmarks.generate_scale_data import SUBJECTS, SUFFIXES, TERMS
+
+
+def synthetic_rows(count: int, rng: random.Random) -> List[Tuple[int, str, str, str, str, int]]:
+    """按 generate_scale_data 的命名方式合成知识点：名称为 术语+后缀，标记次数长尾分布"""
+    rows = []
+    for i in range(count):
+        term = TERMS[rng.randrange(len(TERMS))]
+        item = f"{term}的{SUFFIXES[rng.randrange(len(SUFFIXES))]}（{i}）"
+        subject = SUBJECTS[rng.randrange(len(SUBJECTS))]
+        chapter = f"{subject}第{rng.randrange(30)}章"
+        section = f"{chapter}第{rng.randrange(10)}节"
+        rows.append((i + 1, item, subject, chapter, section, int(rng.paretovariate(1.2)) - 1))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="合成的知识点数量，0表示从数据库读取")
+    parser.add_argument("--queries", type=int, default=10000, help="每种前缀长度的查询次数")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    def build() -> ItemPrefixIndex:
+        return ItemPrefixIndex(synthetic_rows(args.synthetic, random.Random(0))) if args.synthetic else _load_index()
+
+    rows = synthetic_rows(args.synthetic, random.Random(0)) if args.synthetic else None
+    start = time.perf_counter()
+    index = ItemPrefixIndex(rows) if rows is not None else _load_index()
+    build_seconds = time.perf_counter() - start
+
+    # 内存为索引构建完成、原始行释放后仍保留的部分（tracemalloc会拖慢构建，单独构建一次测量）
+    del index, rows
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index = build()
+    memory = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"知识点: {len(index):,}，构建 {build_seconds:.2f}s，索引内存约 {memory / 1024 / 1024:.1f}MB")
+    if not len(index):
+        return
+
+    print(f"{'前缀长度':<8}{'平均命中区间':>12}{'p50(us)':>10}{'p99(us)':>10}")
+    for length in range(1, 5):
+        prefixes = [item[:length] for item in rng.choices(index.items, k=args.queries)]
+        timings = []
+        for prefix in prefixes:
+            begin = time.perf_counter()
+            index.search(prefix, args.limit)
+            timings.append((time.perf_counter() - begin) * 1e6)
+        timings.sort()
+        span = sum(end - start for start, end in map(index.prefix_range, prefixes)) / len(prefixes)
+        print(f"{length:<8}{span:>12.0f}{timings[len(timings) // 2]:>10.1f}{timings[int(len(timings) * 0.99)]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
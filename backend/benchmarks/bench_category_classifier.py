@@ -0,0 +1,165 @@
+"""
+知识点类别本地分类器基准测试
+
+按时间顺序切分历史样本（前80%训练、后20%评估），对不同的相似度阈值与margin组合报告：
+    覆盖率   —— 分类器给出高置信度预测（从而跳过检索LLM）的题目比例
+    精确率   —— 高置信度预测中，预测小节属于该题确认小节的比例
+    召回率   —— 全部评估题目中，被分类器正确处理的比例（= 覆盖率 × 精确率）
+以及全量训练、增量训练和单次预测的延迟。
+
+默认使用合成数据（少数热门小节占大部分题目的长尾分布），完全离线运行；
+指定 --from-db 时从数据库的题目-知识点关联读取真实样本，可据此调整
+LLM_CLASSIFIER_THRESHOLD 与 LLM_CLASSIFIER_MARGIN。
+
+用法（在backend目录下）:
+    python -m benchmarks.bench_category_classifier
+    python -m benchmarks.bench_category_classifier --from-db
+"""
+import os
+import time
+import random
+import argparse
+from typing import List, Sequence, Tuple
+
+# 离线运行不连接数据库，仅满足配置加载
+os.environ.setdefault("POSTGRES_SERVER", "localhost")
+os.environ.setdefault("POSTGRES_PASSWORD", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.llm_services.knowledge_retriever.classifier import (
+    CategoryClassifier,
+    Category,
+    load_training_samples,
+    LLM_CLASSIFIER_MIN_SUPPORT
+)
+
+SUBJECT_TERMS = ["高等数学", "线性代数", "概率论"]
+TERMS = list(
+    "极限导数积分级数矩阵向量特征值行列式概率分布期望方差收敛连续可微偏导梯度曲面曲线"
+    "方程变换空间映射秩逆迹正交投影估计检验假设随机变量条件独立样本函数区间单调极值凹凸"
+)
+TEMPLATES = [
+    "已知{a}，求{b}，并说明{c}成立的条件",
+    "设{a}满足{b}，证明{c}",
+    "计算{a}在{b}上的{c}",
+    "讨论{a}的{b}与{c}之间的关系"
+]
+
+
+def build_dataset(sections: int, questions: int, rng: random.Random) -> List[Tuple[str, List[Category]]]:
+    """
+    生成合成样本：同一章节下的小节共享一部分特征词，小节出现频率服从Zipf分布，
+    约10%的题目同时关联同章节的另一个小节
+    """
+    chapters = {}
+    categories = []
+    keywords = {}
+    while len(categories) < sections:
+        subject = rng.choice(SUBJECT_TERMS)
+        chapter = "".join(rng.sample(TERMS, 4))
+        shared = chapters.setdefault((subject, chapter), ["".join(rng.sample(TERMS, 2)) for _ in range(6)])
+        for _ in range(rng.randint(3, 8)):
+            category = (subject, chapter, "".join(rng.sample(TERMS, 6)))
+            keywords[category] = rng.sample(shared, 3) + ["".join(rng.sample(TERMS, 2)) for _ in range(3)]
+            categories.append(category)
+    categories = categories[:sections]
+    rng.shuffle(categories)
+
+    weights = [1 / (rank + 1) for rank in range(len(categories))]
+    samples = []
+    for _ in range(questions):
+        category = rng.choices(categories, weights)[0]
+        labels = [category]
+        if rng.random() < 0.1:
+            siblings = [c for c in categories if c[:2] == category[:2] and c != category]
+            if siblings:
+                labels.append(rng.choice(siblings))
+        words = rng.sample(keywords[category], 2) + ["".join(rng.sample(TERMS, 2))]
+        rng.shuffle(words)
+        text = rng.choice(TEMPLATES).format(a=words[0], b=words[1], c=words[2])
+        samples.append((text, labels))
+    return samples
+
+
+def load_db_samples() -> List[Tuple[str, List[Category]]]:
+    """从数据库读取真实样本"""
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return load_training_samples(db)
+    finally:
+        db.close()
+
+
+def evaluate(predictions, samples: Sequence[Tuple[str, List[Category]]], threshold: float, margin: float):
+    """
+    计算给定阈值下的覆盖率、精确率和召回率，判定规则与 CategoryClassifier.predict_confident 一致
+
+    Args:
+        predictions: 每条样本的 CategoryClassifier.predict(text, k=2) 结果
+        samples: 评估样本
+        threshold: 相似度阈值
+        margin: 与第二候选的最小差距
+    """
+    answered = correct = 0
+    for top, (_, labels) in zip(predictions, samples):
+        if not top:
+            continue
+        label, score, support = top[0]
+        runner_up = top[1][1] if len(top) > 1 else 0.0
+        if score >= threshold and score - runner_up >= margin and support >= LLM_CLASSIFIER_MIN_SUPPORT:
+            answered += 1
+            correct += label in labels
+    total = max(len(samples), 1)
+    precision = correct / answered if answered else 0.0
+    return answered / total, precision, correct / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-db", action="store_true", help="从数据库读取样本")
+    parser.add_argument("--sections", type=int, default=300)
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.from_db:
+        samples = load_db_samples()
+    else:
+        samples = build_dataset(args.sections, args.questions, random.Random(args.seed))
+    split = int(len(samples) * 0.8)
+    train, test = samples[:split], samples[split:]
+    if not train or not test:
+        print(f"样本不足: {len(samples)} 条")
+        return
+
+    classifier = CategoryClassifier()
+    start = time.perf_counter()
+    classifier.fit(train)
+    fit_seconds = time.perf_counter() - start
+
+    classifier.predict(test[0][0])  # 首次预测时计算质心
+    start = time.perf_counter()
+    predictions = [classifier.predict(text, k=2) for text, _ in test]
+    predict_ms = (time.perf_counter() - start) * 1000 / len(test)
+
+    print(f"样本: 训练 {len(train)} 条，评估 {len(test)} 条，类别 {len(classifier._labels)} 个，特征维度 {classifier.dim}")
+    print(f"全量训练耗时: {fit_seconds:.2f}s，单次预测: {predict_ms:.2f}ms")
+    print(f"{'阈值':>6} {'margin':>8} {'覆盖率':>8} {'精确率':>8} {'召回率':>8}")
+    for threshold in (0.15, 0.2, 0.25, 0.3):
+        for margin in (0.02, 0.05, 0.1):
+            coverage, precision, recall = evaluate(predictions, test, threshold, margin)
+            print(f"{threshold:>8.2f} {margin:>8.2f} {coverage:>10.1%} {precision:>10.1%} {recall:>10.1%}")
+
+    # 增量训练：逐条加入评估样本，每次加入后下一次预测需重新计算质心
+    start = time.perf_counter()
+    for text, labels in test[:200]:
+        classifier.partial_fit(text, labels)
+        classifier.predict(text)
+    incremental_ms = (time.perf_counter() - start) * 1000 / min(len(test), 200)
+    print(f"增量训练+重新计算质心+预测: {incremental_ms:.2f}ms/条")
+
+
+if __name__ == "__main__":
+    main()
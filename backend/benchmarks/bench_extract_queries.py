@@ -0,0 +1,150 @@
+"""
+/knowledge/extract-from-solution 查询数基准测试
+
+对不同数量的候选知识点，统计 extract_knowledge_from_solution 路由每次请求发出的SQL语句数和数据库耗时，
+并与逐个ID查询的旧实现对比：旧实现候选知识点和LLM判定用到的知识点各查询一次（O(n)），
+新实现一次批量查询后从内存中取出用到的子集（O(1)）。
+
+LLM调用替换为固定选择（用到一半候选知识点），耗时只累计SQL语句执行时间，不含提取器初始化等开销；
+候选知识点取标记次数最多的知识点，所有调用在最终回滚的事务中执行。
+
+用法（在backend目录下，使用 .env 中的数据库配置）:
+    python -m benchmarks.bench_extract_queries --sizes 1 10 50 200 --repeat 5
+"""
+import time
+import uuid
+import asyncio
+import argparse
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.api.routes.knowledge import extract_knowledge_from_solution
+from app.api.schemas.knowledge import KnowledgeExtractRequest
+from app.db.session import engine
+from app.llm_services.knowledge_mark import KnowledgeExtractor
+from app.models.knowledge import KnowledgePoint
+from app.services import knowledge as knowledge_service
+from benchmarks.bench_queries import StatementCapture
+
+
+class StatementTimer:
+    """累计执行期间SQL语句的耗时"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._start = 0.0
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        self._start = time.perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        self.seconds += time.perf_counter() - self._start
+
+
+async def fake_extract(self, question_text: str, solution_text: str, existing_knowledge_points: List[Dict[str, Any]]):
+    """代替LLM：固定判定用到一半候选知识点，无新知识点"""
+    return existing_knowledge_points[::2], []
+
+
+async def legacy_extract(db: Session, request: KnowledgeExtractRequest) -> List[KnowledgePoint]:
+    """旧实现：候选知识点和用到的知识点逐个按ID查询"""
+    existing_knowledge_points = []
+    for kp_id in request.existing_knowledge_point_ids:
+        kp = knowledge_service.get_knowledge_point_by_id(db, kp_id)
+        if kp:
+            existing_knowledge_points.append({
+                "id": kp.id, "subject": kp.subject, "chapter": kp.chapter,
+                "section": kp.section, "item": kp.item, "details": kp.details
+            })
+    used_existing_points, _ = await fake_extract(
+        None, request.question_text, request.solution_text, existing_knowledge_points
+    )
+    used = []
+    for point in used_existing_points:
+        kp = knowledge_service.get_knowledge_point_by_id(db, point["id"])
+        if kp:
+            used.append(kp)
+    return used
+
+
+async def current_extract(db: Session, request: KnowledgeExtractRequest) -> List[KnowledgePoint]:
+    """当前路由实现"""
+    response = await extract_knowledge_from_solution(request=request, db=db, current_user=None)
+    return response.existing_knowledge_points
+
+
+def measure(
+    db: Session,
+    capture: StatementCapture,
+    timer: StatementTimer,
+    call: Callable[[Session, KnowledgeExtractRequest], Any],
+    ids: List[int],
+    repeat: int
+) -> Dict[str, Any]:
+    """执行repeat次，返回每次请求的SQL语句数和数据库耗时分位数"""
+    statements = []
+    timings = []
+    for _ in range(repeat):
+        # 每次使用不同的解题文本，避免命中合并模式保存的解题知识点
+        request = KnowledgeExtractRequest(
+            question_text="基准测试题目",
+            solution_text=f"基准测试解题过程 {uuid.uuid4().hex}",
+            existing_knowledge_point_ids=ids
+        )
+        db.expire_all()
+        capture.statements = []
+        capture.enabled = True
+        timer.seconds = 0.0
+        used = asyncio.run(call(db, request))
+        timings.append(timer.seconds * 1000)
+        capture.enabled = False
+        statements.append(len(capture.statements))
+    timings.sort()
+    return {
+        "statements": max(statements),
+        "used": len(used),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200], help="候选知识点数量")
+    parser.add_argument("--repeat", type=int, default=5, help="每种规模的执行次数")
+    args = parser.parse_args()
+
+    KnowledgeExtractor.extract_knowledge_points_from_solution = fake_extract
+
+    capture = StatementCapture()
+    timer = StatementTimer()
+    connection = engine.connect()
+    transaction = connection.begin()
+    event.listen(connection, "before_cursor_execute", capture)
+    event.listen(connection, "before_cursor_execute", timer.before)
+    event.listen(connection, "after_cursor_execute", timer.after)
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    try:
+        ids = [row[0] for row in db.query(KnowledgePoint.id).order_by(KnowledgePoint.mark_count.desc()).limit(max(args.sizes))]
+        if len(ids) < max(args.sizes):
+            print(f"知识点只有 {len(ids)} 个，超出的规模按实际数量执行")
+
+        print(f"{'候选数':>6}{'用到':>6}{'旧SQL数':>10}{'新SQL数':>10}{'旧p50(ms)':>12}{'新p50(ms)':>12}{'旧p95(ms)':>12}{'新p95(ms)':>12}")
+        for size in args.sizes:
+            legacy = measure(db, capture, timer, legacy_extract, ids[:size], args.repeat)
+            current = measure(db, capture, timer, current_extract, ids[:size], args.repeat)
+            print(
+                f"{size:>6}{current['used']:>6}{legacy['statements']:>10}{current['statements']:>10}"
+                f"{legacy['p50_ms']:>12.2f}{current['p50_ms']:>12.2f}{legacy['p95_ms']:>12.2f}{current['p95_ms']:>12.2f}"
+            )
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
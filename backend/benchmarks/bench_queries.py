@@ -0,0 +1,260 @@
+"""
+服务层查询基准测试
+
+在 generate_scale_data 生成的规模数据上逐个执行 services（及直接查询数据库的路由）中的查询，
+测量每次调用的p50/p95耗时和SQL语句数，并对每条语句执行 EXPLAIN (ANALYZE, BUFFERS) 输出查询计划摘要：
+根节点、实际耗时、各表的扫描方式（Seq Scan / Index Scan）和缓冲区命中。
+
+所有调用在一个最终回滚的事务中执行，写操作（标记、创建知识点等）不会改变数据。
+查询参数从数据中选取：知识点最多的科目、标记最多的知识点及其类别、标记最多的用户等。
+
+用法（在backend目录下，使用 .env 中的数据库配置）:
+    python -m benchmarks.bench_queries --repeat 5
+    python -m benchmarks.bench_queries --plans --output results/queries.json
+    python -m benchmarks.bench_queries --only get_user_marks --plans
+"""
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.api.routes.questions import read_question, read_questions
+from app.db.session import engine
+from app.llm_services.knowledge_retriever.classifier import load_training_samples
+from app.models.knowledge import KnowledgePoint
+from app.models.user import User
+from app.services import knowledge as knowledge_service
+from app.services import question as question_service
+from app.services.knowledge_marking import apply_confirmed_markings, get_related_knowledge_points
+
+
+class StatementCapture:
+    """记录执行期间发出的SQL语句"""
+
+    def __init__(self):
+        self.enabled = False
+        self.statements: List[Tuple[str, Any]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            self.statements.append((statement, parameters))
+
+
+def pick_parameters(db: Session) -> Dict[str, Any]:
+    """从数据中选取有代表性的查询参数"""
+    subject = db.execute(text(
+        "SELECT subject FROM knowledge_points GROUP BY subject ORDER BY COUNT(*) DESC LIMIT 1"
+    )).scalar()
+    hottest = db.query(KnowledgePoint).order_by(KnowledgePoint.mark_count.desc()).first()
+    top_ids = [row[0] for row in db.query(KnowledgePoint.id).order_by(KnowledgePoint.mark_count.desc()).limit(20)]
+    categories = [tuple(row) for row in db.execute(text(
+        "SELECT subject, chapter, section FROM knowledge_points "
+        "GROUP BY subject, chapter, section ORDER BY SUM(mark_count) DESC LIMIT 3"
+    ))]
+    heavy_user_id = db.execute(text(
+        "SELECT user_id FROM wrong_questions GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1"
+    )).scalar()
+    question = db.execute(text(
+        "SELECT question_id, MAX(q.user_id) FROM question_knowledge_relation r "
+        "JOIN wrong_questions q ON q.id = r.question_id "
+        "GROUP BY question_id ORDER BY question_id DESC LIMIT 1"
+    )).first()
+    # 用户对象脱离会话，避免服务函数commit后访问属性时重新加载产生额外查询
+    user = db.get(User, heavy_user_id)
+    question_user = db.get(User, question[1])
+    db.expunge(user)
+    if question_user is not user:
+        db.expunge(question_user)
+    return {
+        "subject": subject,
+        "chapter": hottest.chapter,
+        "section": hottest.section,
+        "item": hottest.item.split("的")[0],
+        "knowledge_point_id": hottest.id,
+        "top_ids": top_ids,
+        "categories": categories,
+        "user": user,
+        "question_id": question[0],
+        "question_user": question_user
+    }
+
+
+def build_cases(params: Dict[str, Any], include_full_scans: bool) -> List[Tuple[str, Callable[[Session], Any]]]:
+    """待测查询列表：(名称, 以数据库会话为参数的调用)"""
+    ks = knowledge_service
+    p = params
+    new_point = {
+        "subject": p["subject"], "chapter": p["chapter"], "section": p["section"],
+        "item": "基准测试新知识点", "details": "bench"
+    }
+    cases = [
+        ("get_knowledge_points_by_structure(subject)", lambda db: ks.get_knowledge_points_by_structure(db, p["subject"])),
+        ("get_knowledge_points_by_structure(section)",
+         lambda db: ks.get_knowledge_points_by_structure(db, p["subject"], p["chapter"], p["section"])),
+        ("get_knowledge_point_by_id", lambda db: ks.get_knowledge_point_by_id(db, p["knowledge_point_id"])),
+        ("get_popular_knowledge_points", lambda db: ks.get_popular_knowledge_points(db, 10)),
+        ("get_knowledge_points_by_params(item)",
+         lambda db: ks.get_knowledge_points_by_params(db, {"item": p["item"], "sort_by": "mark_count"})),
+        ("get_knowledge_points_by_params(item, relevance)",
+         lambda db: ks.get_knowledge_points_by_params(db, {"item": p["item"]}, limit=20)),
+        ("get_subjects", lambda db: ks.get_subjects(db)),
+        ("get_chapters_by_subject", lambda db: ks.get_chapters_by_subject(db, p["subject"])),
+        ("get_sections_by_chapter", lambda db: ks.get_sections_by_chapter(db, p["subject"], p["chapter"])),
+        ("get_user_marks", lambda db: ks.get_user_marks(db, p["user"].id)),
+        ("get_all_categories", lambda db: ks.get_all_categories(db)),
+        ("get_knowledge_points_by_categories", lambda db: ks.get_knowledge_points_by_categories(db, p["categories"])),
+        ("get_knowledge_points_by_ids", lambda db: ks.get_knowledge_points_by_ids(db, p["top_ids"])),
+        ("get_related_knowledge_points", lambda db: get_related_knowledge_points(db, p["question_id"])),
+        ("questions.read_questions",
+         lambda db: asyncio.run(read_questions(skip=0, limit=100, db=db, current_user=p["user"]))),
+        ("search_questions(term)", lambda db: question_service.search_questions(db, p["user"].id, p["item"], 20)[0]),
+        ("search_questions(phrase)",
+         lambda db: question_service.search_questions(db, p["user"].id, f"{p['item']}的性质", 20)[0]),
+        ("questions.read_question",
+         lambda db: asyncio.run(read_question(question_id=p["question_id"], db=db, current_user=p["question_user"]))),
+        ("increment_knowledge_point_mark_count",
+         lambda db: ks.increment_knowledge_point_mark_count(db, p["knowledge_point_id"])),
+        ("create_user_mark",
+         lambda db: ks.create_user_mark(db, p["question_user"].id, p["knowledge_point_id"], p["question_id"])),
+        ("apply_confirmed_markings",
+         lambda db: apply_confirmed_markings(db, p["question_user"].id, p["question_id"], p["top_ids"][:5], [new_point])),
+        ("create_knowledge_point", lambda db: ks.create_knowledge_point(db, new_point)),
+    ]
+    if include_full_scans:
+        cases.append(("classifier.load_training_samples", load_training_samples))
+    return cases
+
+
+def _plan_nodes(node: Dict[str, Any], depth: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+    nodes = [(depth, node)]
+    for child in node.get("Plans", []):
+        nodes.extend(_plan_nodes(child, depth + 1))
+    return nodes
+
+
+def _describe(node: Dict[str, Any]) -> str:
+    label = node["Node Type"]
+    if node.get("Index Name"):
+        label += f" using {node['Index Name']}"
+    if node.get("Relation Name"):
+        label += f" on {node['Relation Name']}"
+    return label
+
+
+def explain(db: Session, statement: str, parameters: Any) -> Dict[str, Any]:
+    """执行 EXPLAIN (ANALYZE, BUFFERS) 并汇总查询计划"""
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], dict):
+        parameters = parameters[0]  # executemany只分析第一组参数
+    result = db.connection().exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters or {}
+    ).scalar()
+    plan = (json.loads(result) if isinstance(result, str) else result)[0]
+    nodes = _plan_nodes(plan["Plan"])
+    root = plan["Plan"]
+    return {
+        "statement": " ".join(statement.split())[:300],
+        "planning_ms": round(plan.get("Planning Time", 0.0), 3),
+        "execution_ms": round(plan.get("Execution Time", 0.0), 3),
+        "root": _describe(root),
+        "rows": root.get("Actual Rows"),
+        "scans": sorted({_describe(node) for _, node in nodes if "Scan" in node["Node Type"]}),
+        "seq_scans": sorted({node["Relation Name"] for _, node in nodes if node["Node Type"] == "Seq Scan"}),
+        "shared_hit_blocks": root.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": root.get("Shared Read Blocks", 0),
+        "tree": [
+            f"{'  ' * depth}{_describe(node)} (rows={node.get('Actual Rows')}, "
+            f"time={node.get('Actual Total Time', 0):.2f}ms)"
+            for depth, node in nodes
+        ]
+    }
+
+
+def run_case(db: Session, capture: StatementCapture, call: Callable[[Session], Any], repeat: int) -> Dict[str, Any]:
+    """执行一个查询：预热一次并记录SQL，再计时执行repeat次，最后对记录的SQL执行EXPLAIN"""
+    capture.statements = []
+    capture.enabled = True
+    result = call(db)
+    capture.enabled = False
+    # 同一语句和参数只分析一次，跳过保存点等事务控制语句
+    unique: Dict[Tuple[str, str], Any] = {}
+    for statement, parameters in capture.statements:
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            unique.setdefault((statement, json.dumps(parameters, default=str, sort_keys=True)), parameters)
+
+    timings = []
+    for _ in range(repeat):
+        db.expire_all()
+        start = time.perf_counter()
+        call(db)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    return {
+        "statements": len(unique),
+        "rows": len(result) if isinstance(result, list) else (0 if result is None else 1),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p95_ms": round(timings[min(int(len(timings) * 0.95), len(timings) - 1)], 2),
+        "plans": [explain(db, statement, parameters) for (statement, _), parameters in unique.items()]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询的计时次数")
+    parser.add_argument("--only", action="append", default=[], help="只运行名称包含该字符串的查询，可指定多次")
+    parser.add_argument("--plans", action="store_true", help="输出完整查询计划树")
+    parser.add_argument("--include-full-scans", action="store_true", help="包含读取全部关联数据的查询（如分类器训练样本）")
+    parser.add_argument("--output", help="结果JSON路径")
+    args = parser.parse_args()
+
+    capture = StatementCapture()
+    connection = engine.connect()
+    transaction = connection.begin()
+    event.listen(connection, "before_cursor_execute", capture)
+    # 服务函数中的commit只释放保存点，所有修改随外层事务回滚
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+
+    results: Dict[str, Any] = {}
+    try:
+        counts = {
+            table: db.execute(text(f"SELECT reltuples::bigint FROM pg_class WHERE relname = '{table}'")).scalar()
+            for table in ("users", "knowledge_points", "wrong_questions", "question_knowledge_relation", "user_marks")
+        }
+        print("数据量（估计）: " + "，".join(f"{table} {count:,}" for table, count in counts.items()))
+        params = pick_parameters(db)
+
+        print(f"\n{'查询':<46}{'SQL数':>6}{'行数':>9}{'p50(ms)':>10}{'p95(ms)':>10}  计划")
+        for name, call in build_cases(params, args.include_full_scans):
+            if args.only and not any(part in name for part in args.only):
+                continue
+            result = run_case(db, capture, call, args.repeat)
+            results[name] = result
+            summary = "; ".join(
+                plan["root"] + (f" [Seq Scan: {', '.join(plan['seq_scans'])}]" if plan["seq_scans"] else "")
+                for plan in result["plans"]
+            )
+            print(f"{name:<46}{result['statements']:>6}{result['rows']:>9}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}  {summary}")
+            if args.plans:
+                for plan in result["plans"]:
+                    print(f"    {plan['statement']}")
+                    print(f"    planning {plan['planning_ms']}ms, execution {plan['execution_ms']}ms, "
+                          f"shared hit {plan['shared_hit_blocks']}, read {plan['shared_read_blocks']}")
+                    for line in plan["tree"]:
+                        print(f"      {line}")
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"row_counts": counts, "queries": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
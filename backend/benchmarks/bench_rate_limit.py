@@ -0,0 +1,86 @@
+"""
+限流中间件开销基准测试
+
+直接以ASGI方式调用 RateLimitMiddleware 包装的空应用，测量每个请求增加的耗时：
+受限接口（验签JWT + 令牌桶）与不受限接口（只做方法和路径判断）分别统计。
+REDIS_ENABLED=true 时令牌桶走Redis Lua脚本，否则为进程内令牌桶。
+
+用法（在backend目录下）:
+    python -m benchmarks.bench_rate_limit --requests 20000
+    REDIS_ENABLED=true python -m benchmarks.bench_rate_limit --requests 5000
+"""
+import os
+import time
+import asyncio
+import argparse
+
+# 不连接数据库，仅满足配置加载
+os.environ.setdefault("POSTGRES_SERVER", "localhost")
+os.environ.setdefault("POSTGRES_PASSWORD", "benchmark")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.core.config import settings
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.redis_client import get_redis
+from app.core.security import create_access_token
+
+
+async def empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def make_scope(method: str, path: str, token: str) -> dict:
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 50000),
+    }
+
+
+async def measure(app, scopes, requests: int) -> float:
+    """返回每个请求的平均耗时（微秒）"""
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % len(scopes)], receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000, help="轮流发起请求的用户数")
+    args = parser.parse_args()
+
+    # 每个用户的令牌桶足够大，测量的是放行路径的开销
+    settings.RATE_LIMIT_BURST = args.requests
+    settings.RATE_LIMIT_PER_MINUTE = args.requests * 60
+    limited = RateLimitMiddleware(empty_app)
+    tokens = [create_access_token(user_id) for user_id in range(1, args.users + 1)]
+    api = settings.API_V1_STR
+
+    baseline = await measure(empty_app, [make_scope("POST", f"{api}/solving/1", tokens[0])], args.requests)
+    cases = {
+        "受限接口 POST /solving/{id}": [make_scope("POST", f"{api}/solving/{i}", token) for i, token in enumerate(tokens)],
+        "不受限接口 GET /questions/": [make_scope("GET", f"{api}/questions/", token) for token in tokens],
+    }
+
+    backend = "Redis" if get_redis() is not None else "进程内"
+    print(f"令牌桶: {backend}，请求数: {args.requests}，用户数: {args.users}")
+    print(f"空应用: {baseline:.1f}us/请求")
+    for name, scopes in cases.items():
+        elapsed = await measure(limited, scopes, args.requests)
+        print(f"{name}: {elapsed:.1f}us/请求，中间件开销 {elapsed - baseline:.1f}us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
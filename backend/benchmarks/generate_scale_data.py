@@ -0,0 +1,314 @@
+"""
+规模测试数据生成器
+
+通过PostgreSQL COPY批量写入合成数据，用于在接近生产规模的数据量下测试 services 中的查询：
+    users                        默认 10万
+    knowledge_points             默认 30万，科目/章节/小节规模呈长尾分布
+    wrong_questions              默认 200万，用户活跃度服从Zipf分布
+    question_knowledge_relation  每题 1~6 个知识点，默认约 700万
+    user_marks                   每条关联平均被标记约 2.5 次，默认约 1700万
+
+知识点的热度服从Zipf分布（少数知识点被大量标记），同一题目关联的知识点集中在同一小节内。
+写入完成后按 user_marks 回填 knowledge_points.mark_count，创建 app.db.create_index 中的索引，
+重置各表ID序列并执行 ANALYZE。
+
+用法（在backend目录下，使用 .env 中的数据库配置）:
+    python -m benchmarks.generate_scale_data --scale 1.0
+    python -m benchmarks.generate_scale_data --scale 0.01 --truncate   # 约2万题目的快速数据集
+"""
+import io
+import csv
+import time
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.security import get_password_hash
+from app.db.create_index import create_indexes
+from app.db.reset_sequence import reset_sequence
+from app.db.session import engine
+
+SUBJECTS = [
+    "高等数学", "线性代数", "概率论与数理统计", "大学物理", "数据结构", "计算机组成原理",
+    "操作系统", "计算机网络", "有机化学", "无机化学", "英语", "政治", "理论力学",
+    "电路原理", "信号与系统", "复变函数", "离散数学", "数值分析", "微观经济学", "宏观经济学"
+]
+TERMS = [
+    "极限", "导数", "积分", "级数", "矩阵", "向量", "特征值", "行列式", "概率", "分布", "期望", "方差",
+    "收敛", "连续", "偏导", "梯度", "曲面", "曲线", "方程", "变换", "空间", "映射", "秩", "正交",
+    "投影", "估计", "检验", "随机变量", "样本", "函数", "区间", "单调", "极值", "凹凸", "栈", "队列",
+    "树", "图", "排序", "查找", "进程", "线程", "内存", "缓存", "协议", "路由", "反应", "平衡",
+    "电场", "磁场", "动量", "能量", "波动", "电路", "频谱", "采样", "滤波", "供给", "需求", "均衡"
+]
+SUFFIXES = ["定义", "性质", "定理", "推论", "计算方法", "几何意义", "应用", "判别法", "常见题型", "易错点"]
+QUESTION_TEMPLATES = [
+    "已知{a}满足{b}条件，求{c}的取值范围。",
+    "设{a}在区间上{b}，证明{c}成立。",
+    "计算下列{a}：利用{b}的性质化简后求{c}。",
+    "判断{a}是否{b}，并说明{c}的理由。",
+    "根据{a}与{b}的关系，求{c}。"
+]
+
+CHUNK_SIZE = 100_000
+
+
+def zipf_weights(n: int, s: float) -> np.ndarray:
+    """长度为n的Zipf权重（归一化）"""
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+
+def sample_zipf(rng: np.random.Generator, n: int, s: float, size: int) -> np.ndarray:
+    """按Zipf分布采样 [0, n) 中的下标，下标0最热门"""
+    cumulative = np.cumsum(zipf_weights(n, s))
+    return np.minimum(np.searchsorted(cumulative, rng.random(size)), n - 1)
+
+
+def copy_rows(connection, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """以CSV格式COPY写入一批行，返回写入行数"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return count
+
+
+def next_id(connection, table: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+        return cursor.fetchone()[0]
+
+
+def build_taxonomy(rng: np.random.Generator, knowledge_points: int) -> List[Tuple[str, str, str, int]]:
+    """
+    生成长尾分布的知识点体系
+
+    小节数约为知识点数的1/20；小节按Zipf权重分配到科目，每个科目的章节数随其小节数增长，
+    每个小节的知识点数服从对数正态分布。
+
+    Returns:
+        (科目, 章节, 小节, 知识点数) 列表
+    """
+    section_count = max(knowledge_points // 20, 1)
+    subject_count = min(len(SUBJECTS) + max(section_count // 2000, 0), 200)
+    subjects = SUBJECTS + [f"专业课{i}" for i in range(1, subject_count - len(SUBJECTS) + 1)]
+    per_subject = np.maximum(np.round(zipf_weights(len(subjects), 1.0) * section_count).astype(int), 1)
+
+    sections = []
+    for subject, count in zip(subjects, per_subject):
+        chapters = max(int(np.sqrt(count) * 1.5), 1)
+        chapter_of = np.sort(rng.integers(0, chapters, count))
+        section_no: Dict[int, int] = {}
+        for chapter_no in chapter_of:
+            section_no[chapter_no] = section_no.get(chapter_no, 0) + 1
+            chapter = f"第{chapter_no + 1}章 {TERMS[(chapter_no * 7 + len(subject)) % len(TERMS)]}"
+            section = f"{chapter_no + 1}.{section_no[chapter_no]} {TERMS[rng.integers(len(TERMS))]}与{TERMS[rng.integers(len(TERMS))]}"
+            sections.append((subject, chapter, section))
+
+    sizes = rng.lognormal(mean=0.0, sigma=0.8, size=len(sections))
+    sizes = np.maximum(np.round(sizes / sizes.sum() * knowledge_points).astype(int), 1)
+    return [(subject, chapter, section, int(size)) for (subject, chapter, section), size in zip(sections, sizes)]
+
+
+def timestamps(rng: np.random.Generator, count: int = 20_000, days: int = 730) -> List[str]:
+    """预先生成一批时间戳字符串，按下标取用，避免逐行格式化"""
+    now = datetime.now()
+    offsets = np.sort(rng.integers(0, days * 86400, count))[::-1]
+    return [(now - timedelta(seconds=int(offset))).strftime("%Y-%m-%d %H:%M:%S+00") for offset in offsets]
+
+
+def generate_users(connection, rng: np.random.Generator, count: int) -> Tuple[int, int]:
+    """写入用户，所有用户使用同一个密码哈希"""
+    start = next_id(connection, "users")
+    password = get_password_hash("scale-test-password")
+    stamps = timestamps(rng)
+    rows = (
+        (start + i, f"scale_user_{start + i}", password, f"scale_user_{start + i}@example.com", stamps[i % len(stamps)])
+        for i in range(count)
+    )
+    copy_rows(connection, "users", ("id", "username", "password", "email", "created_at"), rows)
+    return start, count
+
+
+def generate_knowledge_points(connection, rng: np.random.Generator, count: int) -> Tuple[int, np.ndarray, np.ndarray, List[str]]:
+    """
+    写入知识点，同一小节的知识点ID连续
+
+    Returns:
+        (起始ID, 每个知识点所属小节下标, 每个小节的起始偏移, 每个小节的科目)
+    """
+    taxonomy = build_taxonomy(rng, count)
+    start = next_id(connection, "knowledge_points")
+    stamps = timestamps(rng)
+
+    section_of: List[int] = []
+    offsets = []
+    rows = []
+    for section_index, (subject, chapter, section, size) in enumerate(taxonomy):
+        offsets.append(len(section_of))
+        for i in range(size):
+            term = TERMS[(section_index + i) % len(TERMS)]
+            suffix = SUFFIXES[i % len(SUFFIXES)]
+            item = f"{term}的{suffix}" if i < len(SUFFIXES) else f"{term}的{suffix}({i // len(SUFFIXES)})"
+            rows.append((
+                start + len(section_of), subject, chapter, section, item,
+                f"{subject}·{section}：关于{term}的{suffix}说明。", 0, stamps[len(section_of) % len(stamps)]
+            ))
+            section_of.append(section_index)
+        if len(rows) >= CHUNK_SIZE:
+            copy_rows(connection, "knowledge_points", ("id", "subject", "chapter", "section", "item", "details", "mark_count", "created_at"), rows)
+            rows = []
+    copy_rows(connection, "knowledge_points", ("id", "subject", "chapter", "section", "item", "details", "mark_count", "created_at"), rows)
+    return start, np.array(section_of), np.array(offsets + [len(section_of)]), [entry[0] for entry in taxonomy]
+
+
+def generate_questions(
+    connection,
+    rng: np.random.Generator,
+    count: int,
+    users: Tuple[int, int],
+    knowledge: Tuple[int, np.ndarray, np.ndarray, List[str]],
+    marks_per_relation: float
+) -> Dict[str, int]:
+    """
+    分批写入错题、题目-知识点关联和用户标记
+
+    每道题先按Zipf热度选一个主知识点，再在同一小节内补充其余知识点；
+    每条关联由题目所属用户标记，标记次数服从均值为 marks_per_relation 的泊松分布（至少1次）。
+    """
+    user_start, user_count = users
+    kp_start, section_of, section_offsets, section_subjects = knowledge
+    kp_count = len(section_of)
+    # 热度排名到知识点下标的随机映射，避免热门知识点集中在ID最小的小节
+    popularity = rng.permutation(kp_count)
+    stamps = timestamps(rng)
+    question_start = next_id(connection, "wrong_questions")
+    relation_id = next_id(connection, "question_knowledge_relation")
+    mark_id = next_id(connection, "user_marks")
+    totals = {"wrong_questions": 0, "question_knowledge_relation": 0, "user_marks": 0}
+
+    for chunk_start in range(0, count, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, count - chunk_start)
+        question_ids = question_start + chunk_start + np.arange(size)
+        owners = user_start + sample_zipf(rng, user_count, 0.8, size)
+        primary = popularity[sample_zipf(rng, kp_count, 1.05, size)]
+        per_question = rng.integers(1, 7, size)
+        stamp_index = rng.integers(0, len(stamps), size)
+        repeats = np.maximum(rng.poisson(marks_per_relation, size * 6), 1)
+        repeat_index = 0
+
+        questions = []
+        relations = []
+        marks = []
+        for i in range(size):
+            kp = int(primary[i])
+            section = section_of[kp]
+            low, high = section_offsets[section], section_offsets[section + 1]
+            extra = rng.integers(low, high, per_question[i] - 1) if high - low > 1 else []
+            kp_ids = list(dict.fromkeys([kp, *map(int, extra)]))
+            subject_terms = [TERMS[(kp + k) % len(TERMS)] for k in range(3)]
+            template = QUESTION_TEMPLATES[(kp + i) % len(QUESTION_TEMPLATES)]
+            content = template.format(a=subject_terms[0], b=subject_terms[1], c=subject_terms[2])
+            stamp = stamps[stamp_index[i]]
+            questions.append((
+                int(question_ids[i]), int(owners[i]), section_subjects[section] if i % 2 else None, content,
+                f"利用{subject_terms[1]}的性质求解。" if i % 3 else None,
+                None, None, f"{subject_terms[0]}相关，需复习" if i % 4 == 0 else None, stamp
+            ))
+            for kp_index in kp_ids:
+                relations.append((relation_id, kp_start + kp_index, int(question_ids[i]), stamp))
+                relation_id += 1
+                for _ in range(repeats[repeat_index]):
+                    marks.append((mark_id, int(owners[i]), kp_start + kp_index, int(question_ids[i]), stamp))
+                    mark_id += 1
+                repeat_index += 1
+
+        totals["wrong_questions"] += copy_rows(
+            connection, "wrong_questions",
+            ("id", "user_id", "subject", "content", "solution", "answer", "image_url", "remark", "created_at"), questions
+        )
+        totals["question_knowledge_relation"] += copy_rows(
+            connection, "question_knowledge_relation", ("id", "knowledge_point_id", "question_id", "created_at"), relations
+        )
+        totals["user_marks"] += copy_rows(
+            connection, "user_marks", ("id", "user_id", "knowledge_point_id", "question_id", "marked_at"), marks
+        )
+        connection.commit()
+        print(f"  错题 {chunk_start + size:,}/{count:,}，关联 {totals['question_knowledge_relation']:,}，标记 {totals['user_marks']:,}")
+
+    return totals
+
+
+def finalize(connection) -> None:
+    """回填标记次数、创建索引、重置序列并更新统计信息"""
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE knowledge_points k SET mark_count = m.count
+            FROM (SELECT knowledge_point_id, COUNT(*) AS count FROM user_marks GROUP BY knowledge_point_id) m
+            WHERE k.id = m.knowledge_point_id
+        """)
+    connection.commit()
+    create_indexes()
+    for table in ("users", "knowledge_points", "wrong_questions", "question_knowledge_relation", "user_marks"):
+        reset_sequence(table)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE users, knowledge_points, wrong_questions, question_knowledge_relation, user_marks")
+    connection.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="整体缩放系数，按比例调整下列默认数量")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--knowledge-points", type=int, default=300_000)
+    parser.add_argument("--questions", type=int, default=2_000_000)
+    parser.add_argument("--marks-per-relation", type=float, default=2.5, help="每条题目-知识点关联的平均标记次数")
+    parser.add_argument("--truncate", action="store_true", help="写入前清空相关表（会删除全部现有数据）")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    users = max(int(args.users * args.scale), 1)
+    knowledge_points = max(int(args.knowledge_points * args.scale), 20)
+    questions = max(int(args.questions * args.scale), 1)
+
+    connection = engine.raw_connection()
+    try:
+        if args.truncate:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "TRUNCATE user_marks, question_knowledge_relation, wrong_questions, knowledge_points, users "
+                    "RESTART IDENTITY CASCADE"
+                )
+            connection.commit()
+
+        start = time.perf_counter()
+        print(f"写入用户 {users:,}")
+        user_range = generate_users(connection, rng, users)
+        connection.commit()
+
+        print(f"写入知识点 约{knowledge_points:,}")
+        knowledge = generate_knowledge_points(connection, rng, knowledge_points)
+        connection.commit()
+        print(f"  实际 {len(knowledge[1]):,} 个知识点，{len(knowledge[2]) - 1:,} 个小节")
+
+        print(f"写入错题 {questions:,} 及关联、标记")
+        totals = generate_questions(connection, rng, questions, user_range, knowledge, args.marks_per_relation)
+        load_seconds = time.perf_counter() - start
+
+        print("回填标记次数、创建索引、ANALYZE")
+        finalize(connection)
+        print(f"完成: 写入 {load_seconds:.0f}s，总计 {time.perf_counter() - start:.0f}s，{totals}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
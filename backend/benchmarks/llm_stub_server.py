@@ -0,0 +1,378 @@
+"""
+本地OpenAI兼容LLM桩服务
+
+实现后端通过 OPENAI_API_BASE 使用的接口子集，用于在单机上对整个FastAPI应用做端到端压测：
+    POST /v1/chat/completions  支持 stream、图片消息、response_format
+    POST /v1/embeddings        确定性的哈希向量
+    GET  /v1/models
+    GET/POST /_stub/config     运行时查看/修改场景配置（只需提交要修改的字段）
+    GET  /_stub/stats          各类请求的次数、错误数和平均注入延迟
+
+按系统消息内容识别调用方，返回各调用方期望的结构：
+    vlm        含图片的请求 → 题目/答案文本
+    review     {"passed": bool, "reason": str}，通过率由 review_pass_rate 控制
+    retriever  {"categories": [...]}，从提示词中的类别CSV里随机选取，保证后续查询命中真实数据
+    extractor  {"used_existing_knowledge_points": [...], "new_knowledge_points": [...]}
+    solve      合并模式输出 {"solution", "used_existing_knowledge_points", "new_knowledge_points"}，否则输出markdown文本
+
+场景配置（--scenario 指定JSON文件，未提供的字段使用默认值）:
+    {
+        "latency": {
+            "default": {"dist": "lognormal", "median_ms": 800, "sigma": 0.5},
+            "vlm": {"dist": "lognormal", "median_ms": 2500, "sigma": 0.4},
+            "solve": {"dist": "uniform", "min_ms": 3000, "max_ms": 8000}
+        },
+        "error_rates": {"429": 0.02, "500": 0.01, "hang": 0.0},
+        "review_pass_rate": 0.7,
+        "stream_chunks": 20
+    }
+    dist 可为 fixed（ms）、uniform（min_ms/max_ms）、lognormal（median_ms/sigma）；
+    error_rates 可按调用方覆盖，如 {"default": {...}, "vlm": {"429": 0.1}}；hang 表示长时间不返回，用于测试超时。
+
+用法（在backend目录下）:
+    python -m benchmarks.llm_stub_server --port 9000 [--scenario scenario.json]
+    OPENAI_API_BASE=http://127.0.0.1:9000/v1 OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_SCENARIO: Dict[str, Any] = {
+    "latency": {
+        "default": {"dist": "lognormal", "median_ms": 800, "sigma": 0.5},
+        "vlm": {"dist": "lognormal", "median_ms": 2500, "sigma": 0.4},
+        "solve": {"dist": "lognormal", "median_ms": 5000, "sigma": 0.5}
+    },
+    "error_rates": {"429": 0.0, "500": 0.0, "hang": 0.0},
+    "hang_seconds": 600,
+    "review_pass_rate": 0.7,
+    "stream_chunks": 20,
+    "embedding_dim": 256
+}
+
+QUESTION_TEXT = "已知函数 $f(x)=x^3-3x+1$，求 $f(x)$ 在区间 $[-2, 2]$ 上的最大值和最小值。"
+ANSWER_TEXT = "最大值为 $3$，最小值为 $-1$。"
+SOLUTION_TEXT = (
+    "**解**：$f'(x)=3x^2-3$，令 $f'(x)=0$ 得 $x=\\pm 1$。\n\n"
+    "比较 $f(-2)=-1$，$f(-1)=3$，$f(1)=-1$，$f(2)=3$，"
+    "故最大值为 $3$，最小值为 $-1$。"
+)
+
+app = FastAPI(title="LLM Stub")
+scenario: Dict[str, Any] = json.loads(json.dumps(DEFAULT_SCENARIO))
+stats: Dict[str, Dict[str, float]] = {}
+
+
+def _merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """递归合并场景配置"""
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def _text(content: Any) -> str:
+    """提取消息中的文本内容"""
+    if isinstance(content, str):
+        return content
+    return "\n".join(part.get("text", "") for part in content or [] if isinstance(part, dict))
+
+
+def _has_image(messages: List[Dict[str, Any]]) -> bool:
+    return any(
+        isinstance(m.get("content"), list) and any(p.get("type") == "image_url" for p in m["content"] if isinstance(p, dict))
+        for m in messages
+    )
+
+
+def classify(body: Dict[str, Any]) -> str:
+    """根据请求内容识别调用方"""
+    messages = body.get("messages", [])
+    if _has_image(messages):
+        return "vlm"
+    system = "\n".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+    if '"passed"' in system:
+        return "review"
+    if '"categories"' in system:
+        return "retriever"
+    if '"solution"' in system:
+        return "solve_combined"
+    if "used_existing_knowledge_points" in system:
+        return "extractor"
+    return "solve"
+
+
+def _categories_from_prompt(system: str) -> List[Dict[str, str]]:
+    """从提示词中的类别CSV随机选取1~2个类别"""
+    rows = []
+    in_csv = False
+    for line in system.splitlines():
+        if line.startswith("科目,章节,小节"):
+            in_csv = True
+            continue
+        if in_csv:
+            parts = line.split(",")
+            if len(parts) != 3:
+                break
+            rows.append({"subject": parts[0], "chapter": parts[1], "section": parts[2]})
+    if not rows:
+        return [{"subject": "数学", "chapter": "高等数学", "section": "导数应用"}]
+    return random.sample(rows, min(len(rows), random.randint(1, 2)))
+
+
+def _ids_from_prompt(system: str) -> List[int]:
+    """从提示词中的知识点列表（[ID] 格式）随机选取一部分ID"""
+    ids = [int(i) for i in dict.fromkeys(re.findall(r"^\s*-?\s*\[(\d+)\]", system, re.M))]
+    return random.sample(ids, min(len(ids), random.randint(1, 3))) if ids else []
+
+
+def build_content(kind: str, body: Dict[str, Any]) -> str:
+    """生成调用方期望格式的回复内容"""
+    messages = body.get("messages", [])
+    system = "\n".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+    new_point = {"subject": "数学", "chapter": "高等数学", "section": "导数应用", "item": "闭区间上的最值", "details": "比较驻点与端点处的函数值"}
+
+    if kind == "vlm":
+        # 答案提取的要求写在用户消息中
+        prompt = "\n".join(_text(m.get("content")) for m in messages)
+        return ANSWER_TEXT if "提取答案" in prompt else QUESTION_TEXT
+    if kind == "review":
+        passed = random.random() < scenario["review_pass_rate"]
+        return json.dumps({"passed": passed, "reason": "解题过程正确" if passed else "未比较区间端点处的函数值"}, ensure_ascii=False)
+    if kind == "retriever":
+        return json.dumps({"categories": _categories_from_prompt(system)}, ensure_ascii=False)
+    if kind == "extractor":
+        return json.dumps({
+            "used_existing_knowledge_points": _ids_from_prompt(system),
+            "new_knowledge_points": [new_point] if random.random() < 0.3 else []
+        }, ensure_ascii=False)
+    if kind == "solve_combined":
+        return json.dumps({
+            "solution": SOLUTION_TEXT,
+            "used_existing_knowledge_points": _ids_from_prompt(system),
+            "new_knowledge_points": [new_point] if random.random() < 0.3 else []
+        }, ensure_ascii=False)
+    return SOLUTION_TEXT
+
+
+def sample_latency(kind: str) -> float:
+    """按场景配置采样注入延迟（秒）"""
+    latency = scenario["latency"]
+    config = latency.get(kind) or latency.get(kind.split("_")[0]) or latency["default"]
+    dist = config.get("dist", "fixed")
+    if dist == "uniform":
+        ms = random.uniform(config.get("min_ms", 0), config.get("max_ms", 0))
+    elif dist == "lognormal":
+        ms = config.get("median_ms", 0) * random.lognormvariate(0, config.get("sigma", 0.5))
+    else:
+        ms = config.get("ms", config.get("median_ms", 0))
+    return max(ms, 0) / 1000
+
+
+def sample_error(kind: str) -> Optional[str]:
+    """按场景配置决定是否注入错误"""
+    rates = scenario["error_rates"]
+    if "default" in rates or kind in rates:
+        rates = {**rates.get("default", {}), **rates.get(kind, {})}
+    roll = random.random()
+    for error in ("429", "500", "hang"):
+        rate = float(rates.get(error, 0) or 0)
+        if roll < rate:
+            return error
+        roll -= rate
+    return None
+
+
+def _usage(body: Dict[str, Any], content: str) -> Dict[str, Any]:
+    """粗略估算token用量：中文每字约1个token，其余约4个字符1个token"""
+    def estimate(text: str) -> int:
+        cjk = sum(1 for c in text if "一" <= c <= "鿿")
+        return cjk + (len(text) - cjk) // 4 + 1
+
+    prompt = sum(estimate(_text(m.get("content"))) for m in body.get("messages", []))
+    prompt += 1000 if _has_image(body.get("messages", [])) else 0
+    completion = estimate(content)
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "prompt_tokens_details": {"cached_tokens": 0}
+    }
+
+
+def _record(kind: str, latency: float, error: Optional[str]) -> None:
+    entry = stats.setdefault(kind, {"requests": 0, "errors": 0, "latency_total": 0.0})
+    entry["requests"] += 1
+    entry["errors"] += 1 if error else 0
+    entry["latency_total"] += latency
+
+
+def _error_response(error: str) -> JSONResponse:
+    if error == "429":
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_exceeded", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": "1"}
+        )
+    return JSONResponse({"error": {"message": "Internal error (stub)", "type": "server_error"}}, status_code=500)
+
+
+def _chunks(text: str, count: int) -> List[str]:
+    size = max(len(text) // max(count, 1), 1)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    kind = classify(body)
+    latency = sample_latency(kind)
+    error = sample_error(kind)
+    _record(kind, latency, error)
+
+    if error == "hang":
+        await asyncio.sleep(scenario["hang_seconds"])
+        error = "500"
+    if error:
+        await asyncio.sleep(latency * random.uniform(0.05, 0.2))
+        return _error_response(error)
+
+    content = build_content(kind, body)
+    completion_id = f"chatcmpl-stub-{random.getrandbits(48):x}"
+    created = int(time.time())
+    model = body.get("model", "stub")
+    usage = _usage(body, content)
+
+    if not body.get("stream"):
+        await asyncio.sleep(latency)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def stream():
+        pieces = _chunks(content, scenario["stream_chunks"])
+        # 首个token前等待约三分之一的延迟，其余均匀分布在各分片之间
+        await asyncio.sleep(latency / 3)
+        for index, piece in enumerate(pieces):
+            delta = {"content": piece}
+            if index == 0:
+                delta["role"] = "assistant"
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(latency * 2 / 3 / len(pieces))
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        if include_usage:
+            yield f"data: {json.dumps({**final, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    """字符bigram哈希向量，相同文本得到相同向量"""
+    vector = [0.0] * dim
+    text = "".join(text.split())
+    for i in range(max(len(text) - 1, 1)):
+        digest = hashlib.md5(text[i:i + 2].encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0
+    return vector
+
+
+@app.post("/embeddings")
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    latency = sample_latency("embedding")
+    _record("embedding", latency, None)
+    await asyncio.sleep(latency / 4)
+    dim = scenario["embedding_dim"]
+    return {
+        "object": "list",
+        "model": body.get("model", "stub"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": _embedding(str(text), dim)}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": sum(len(str(t)) for t in inputs), "total_tokens": sum(len(str(t)) for t in inputs)}
+    }
+
+
+@app.get("/models")
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+
+@app.get("/_stub/config")
+async def get_config():
+    return scenario
+
+
+@app.post("/_stub/config")
+async def update_config(request: Request):
+    return _merge(scenario, await request.json())
+
+
+@app.get("/_stub/stats")
+async def get_stats():
+    return {
+        kind: {**entry, "latency_avg": entry["latency_total"] / entry["requests"] if entry["requests"] else 0.0}
+        for kind, entry in stats.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--scenario", help="场景配置JSON文件")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    args = parser.parse_args()
+
+    if args.scenario:
+        with open(args.scenario, encoding="utf-8") as f:
+            _merge(scenario, json.load(f))
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
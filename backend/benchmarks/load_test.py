@@ -0,0 +1,351 @@
+"""
+端到端压测工具
+
+模拟多个用户并发走完错题处理的完整流程，直接请求运行中的后端API：
+    登录 → 上传题目图片(/image/process) → 创建错题(/questions/) → 分析知识点类别(/knowledge/analyze-from-question)
+    → 查询类别下的知识点(/knowledge/structure) → 解题(/solving/{id}) → 提取知识点(/knowledge/extract-from-solution)
+    → 确认标记(/knowledge/mark-confirmed)
+
+每个虚拟用户独立注册/登录后循环执行流程，步骤之间按指数分布等待思考时间。结束后按端点输出
+吞吐量、p50/p95/p99延迟和错误率，并保存为JSON（含git提交号），可用 --compare 与历史结果对比。
+
+不依赖真实LLM时，先启动 benchmarks.llm_stub_server 并将后端的 OPENAI_API_BASE 指向它。
+后端默认对调用LLM的接口按用户限流，压测吞吐时设置 RATE_LIMIT_ENABLED=false 或调大 RATE_LIMIT_BURST。
+超出 ADMISSION_* 配置的并发与排队容量时后端直接返回503，计入对应端点的错误率。
+
+用法（在backend目录下）:
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --users 20 --duration 300 --think-time 2
+    python -m benchmarks.load_test --users 5 --iterations 3 --image question.png --output results/run.json
+    python -m benchmarks.load_test --users 20 --duration 300 --compare results/baseline.json
+"""
+import json
+import time
+import zlib
+import random
+import struct
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+API_PREFIX = "/api/v1"
+
+
+def make_png(width: int = 320, height: int = 120) -> bytes:
+    """生成一张带横线的灰度PNG，用于没有提供题目图片时的上传"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    rows = b"".join(
+        b"\x00" + (b"\x30" if y % 24 in (10, 11) else b"\xff") * width
+        for y in range(height)
+    )
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """已排序样本的分位数（线性插值）"""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Recorder:
+    """按端点汇总请求延迟与结果"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+        self.flows: List[float] = []
+        self.flow_errors = 0
+
+    def record(self, endpoint: str, latency: float, error: Optional[str] = None) -> None:
+        self.latencies.setdefault(endpoint, [])
+        errors = self.errors.setdefault(endpoint, {})
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+        else:
+            self.latencies[endpoint].append(latency)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, samples in self.latencies.items():
+            ordered = sorted(samples)
+            failed = sum(self.errors.get(endpoint, {}).values())
+            total = len(ordered) + failed
+            endpoints[endpoint] = {
+                "requests": total,
+                "errors": failed,
+                "error_rate": round(failed / total, 4) if total else 0.0,
+                "error_types": self.errors.get(endpoint, {}),
+                "throughput_rps": round(len(ordered) / elapsed, 3) if elapsed else 0.0,
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0,
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0
+            }
+
+        flows = sorted(self.flows)
+        requests = sum(item["requests"] for item in endpoints.values())
+        errors = sum(item["errors"] for item in endpoints.values())
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": requests,
+            "errors": errors,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "throughput_rps": round((requests - errors) / elapsed, 3) if elapsed else 0.0,
+            "flows": {
+                "completed": len(flows),
+                "failed": self.flow_errors,
+                "throughput_per_minute": round(len(flows) / elapsed * 60, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(flows, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(flows, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(flows, 0.99) * 1000, 1)
+            },
+            "endpoints": endpoints
+        }
+
+
+class FlowError(Exception):
+    """流程中某一步失败，结束本轮流程"""
+
+
+class VirtualUser:
+    """一个虚拟用户：注册/登录后循环执行完整流程"""
+
+    def __init__(self, index: int, client: httpx.AsyncClient, recorder: Recorder, args: argparse.Namespace, images: List[bytes]):
+        self.index = index
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.images = images
+        self.username = f"{args.user_prefix}{index}"
+        self.headers: Dict[str, str] = {}
+
+    async def think(self) -> None:
+        if self.args.think_time > 0:
+            await asyncio.sleep(random.expovariate(1 / self.args.think_time))
+
+    async def request(self, endpoint: str, method: str, path: str, expected=(200, 201), **kwargs) -> Any:
+        """发送请求并记录延迟，endpoint为统计用的端点名（路径参数替换为占位符）"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, API_PREFIX + path, headers=self.headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(endpoint, time.perf_counter() - start, type(e).__name__)
+            raise FlowError(f"{endpoint}: {type(e).__name__}")
+        latency = time.perf_counter() - start
+        if response.status_code not in expected:
+            self.recorder.record(endpoint, latency, str(response.status_code))
+            raise FlowError(f"{endpoint}: HTTP {response.status_code} {response.text[:200]}")
+        self.recorder.record(endpoint, latency)
+        return response.json()
+
+    async def login(self) -> None:
+        if self.args.register:
+            # 用户已存在时返回400，直接登录即可
+            await self.request(
+                "POST /auth/register", "POST", "/auth/register", expected=(200, 201, 400),
+                json={"username": self.username, "password": self.args.password}
+            )
+        token = await self.request(
+            "POST /auth/login", "POST", "/auth/login",
+            data={"username": self.username, "password": self.args.password}
+        )
+        self.headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    async def run_flow(self) -> None:
+        """执行一轮完整流程"""
+        image = random.choice(self.images)
+        processed = await self.request(
+            "POST /image/process", "POST", "/image/process",
+            files={"file": ("question.png", image, "image/png")}
+        )
+        await self.think()
+
+        question = await self.request(
+            "POST /questions/", "POST", "/questions/",
+            json={"content": processed.get("text") or "压测题目", "image_url": processed.get("image_url")}
+        )
+        question_text = question["content"]
+
+        analyzed = await self.request(
+            "POST /knowledge/analyze-from-question", "POST", "/knowledge/analyze-from-question",
+            json={"question_text": question_text}
+        )
+        knowledge_point_ids: List[int] = []
+        for category in analyzed.get("categories", [])[:self.args.max_categories]:
+            points = await self.request("GET /knowledge/structure", "GET", "/knowledge/structure", params=category)
+            knowledge_point_ids.extend(point["id"] for point in points)
+        await self.think()
+
+        solved = await self.request(
+            "POST /solving/{id}", "POST", f"/solving/{question['id']}",
+            json={"knowledge_points": knowledge_point_ids[:self.args.max_knowledge_points]}
+        )
+        solution_text = (solved.get("data") or {}).get("solution") or ""
+        await self.think()
+
+        extracted = await self.request(
+            "POST /knowledge/extract-from-solution", "POST", "/knowledge/extract-from-solution",
+            json={
+                "question_text": question_text,
+                "solution_text": solution_text,
+                "existing_knowledge_point_ids": knowledge_point_ids[:self.args.max_knowledge_points]
+            }
+        )
+        await self.think()
+
+        await self.request(
+            "POST /knowledge/mark-confirmed", "POST", "/knowledge/mark-confirmed",
+            json={
+                "question_id": question["id"],
+                "existing_knowledge_point_ids": [point["id"] for point in extracted.get("existing_knowledge_points", [])],
+                "new_knowledge_points": extracted.get("new_knowledge_points", [])
+            }
+        )
+
+    async def run(self, stop_at: Optional[float]) -> None:
+        await asyncio.sleep(self.args.ramp_up * self.index / max(self.args.users, 1))
+        try:
+            await self.login()
+        except FlowError as e:
+            print(f"[用户{self.index}] 登录失败: {e}")
+            return
+
+        iteration = 0
+        while True:
+            if stop_at is not None and time.monotonic() >= stop_at:
+                break
+            if stop_at is None and iteration >= self.args.iterations:
+                break
+            iteration += 1
+            start = time.perf_counter()
+            try:
+                await self.run_flow()
+                self.recorder.flows.append(time.perf_counter() - start)
+            except FlowError as e:
+                self.recorder.flow_errors += 1
+                if self.args.verbose:
+                    print(f"[用户{self.index}] 第{iteration}轮失败: {e}")
+            await self.think()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"\n耗时 {summary['elapsed_seconds']}s，请求 {summary['requests']}，错误率 {summary['error_rate']:.2%}，"
+          f"吞吐量 {summary['throughput_rps']} req/s")
+    flows = summary["flows"]
+    print(f"完整流程: 完成 {flows['completed']}，失败 {flows['failed']}，{flows['throughput_per_minute']} 次/分钟，"
+          f"p50 {flows['p50_ms']:.0f}ms  p95 {flows['p95_ms']:.0f}ms  p99 {flows['p99_ms']:.0f}ms")
+    print(f"\n{'端点':<40}{'请求':>8}{'错误率':>9}{'req/s':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for endpoint, item in summary["endpoints"].items():
+        print(f"{endpoint:<40}{item['requests']:>8}{item['error_rate']:>9.2%}{item['throughput_rps']:>9.2f}"
+              f"{item['p50_ms']:>10.0f}{item['p95_ms']:>10.0f}{item['p99_ms']:>10.0f}")
+
+
+def print_comparison(summary: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """按端点输出与基线结果的p50/p95和错误率差异"""
+    base_summary = baseline.get("summary", baseline)
+    print(f"\n与基线对比（{baseline.get('commit') or '未知提交'}，{baseline.get('timestamp', '')}）:")
+    print(f"{'端点':<40}{'p50变化':>12}{'p95变化':>12}{'错误率':>18}")
+    for endpoint, item in summary["endpoints"].items():
+        base = base_summary.get("endpoints", {}).get(endpoint)
+        if not base:
+            print(f"{endpoint:<40}{'(基线中无此端点)':>12}")
+            continue
+
+        def change(key: str) -> str:
+            return f"{(item[key] - base[key]) / base[key]:+.1%}" if base[key] else "n/a"
+
+        print(f"{endpoint:<40}{change('p50_ms'):>12}{change('p95_ms'):>12}"
+              f"{base['error_rate']:>8.2%} → {item['error_rate']:<8.2%}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    images = [Path(path).read_bytes() for path in args.image] or [make_png()]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        users = [VirtualUser(i, client, recorder, args, images) for i in range(args.users)]
+        start = time.monotonic()
+        stop_at = start + args.ramp_up + args.duration if args.duration else None
+        await asyncio.gather(*(user.run(stop_at) for user in users))
+        elapsed = time.monotonic() - start
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {
+            "base_url": args.base_url,
+            "users": args.users,
+            "duration": args.duration,
+            "iterations": args.iterations,
+            "think_time": args.think_time,
+            "ramp_up": args.ramp_up
+        },
+        "summary": recorder.summary(elapsed)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10, help="并发虚拟用户数")
+    parser.add_argument("--duration", type=float, default=0, help="持续时间（秒，不含爬坡），为0时按 --iterations 执行")
+    parser.add_argument("--iterations", type=int, default=1, help="每个用户执行的流程轮数")
+    parser.add_argument("--think-time", type=float, default=1.0, help="步骤之间的平均思考时间（秒，指数分布），0表示不等待")
+    parser.add_argument("--ramp-up", type=float, default=0, help="在该时间内（秒）逐个启动用户")
+    parser.add_argument("--image", action="append", default=[], help="题目图片，可指定多次；未指定时使用生成的PNG")
+    parser.add_argument("--user-prefix", default="loadtest_user_")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--no-register", dest="register", action="store_false", help="不自动注册，用户需已存在")
+    parser.add_argument("--max-categories", type=int, default=2, help="每题最多查询几个类别的知识点")
+    parser.add_argument("--max-knowledge-points", type=int, default=10, help="解题时最多传入的知识点数")
+    parser.add_argument("--timeout", type=float, default=300, help="单个请求超时（秒）")
+    parser.add_argument("--output", help="结果JSON路径，默认 load_test_results/<时间>_<提交>.json")
+    parser.add_argument("--compare", help="与之对比的历史结果JSON")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    parser.add_argument("--verbose", action="store_true", help="输出每轮流程的失败原因")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    result = asyncio.run(run(args))
+    print_summary(result["summary"])
+
+    output = Path(args.output) if args.output else Path("load_test_results") / (
+        f"{datetime.now():%Y%m%d_%H%M%S}_{result['commit'] or 'nogit'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n结果已保存到 {output}")
+
+    if args.compare:
+        print_comparison(result["summary"], json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
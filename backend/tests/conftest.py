@@ -0,0 +1,8 @@
+import os
+
+# 测试不连接数据库，仅满足配置加载
+os.environ.setdefault("POSTGRES_SERVER", "localhost")
+os.environ.setdefault("POSTGRES_PASSWORD", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+
+pytest_plugins = ["pytester"]
@@ -0,0 +1,82 @@
+"""
+请求时限耗尽时LLM调用的错误处理测试
+
+解题和图像识别路由在 X-Request-Timeout 时限内未完成LLM调用时应返回504，
+而不是被工作流或图像服务当作解题失败（404）或服务不可用处理。
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_db, get_llm_user
+from app.llm_services.solving import workflow
+from app.main import app
+from app.services import solving as solving_service
+
+
+class SlowLLM:
+    """调用耗时远超请求时限的LLM"""
+    model_name = "slow-model"
+    max_tokens = None
+
+    def bind(self, **kwargs):
+        return self
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(5)
+
+
+class FakeQuery:
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return SimpleNamespace(id=1, content="1+1=?", subject="数学", answer=None)
+
+
+class FakeSession:
+    def query(self, *args):
+        return FakeQuery()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    knowledge_point = SimpleNamespace(
+        id=1, subject="数学", chapter="算术", section="加法", item="整数加法", details=None, mark_count=0, created_at=None
+    )
+    monkeypatch.setattr(solving_service, "get_knowledge_points_by_ids", lambda db, ids: [knowledge_point])
+    monkeypatch.setattr(workflow.LLMSolvingWorkflow, "_get_llm", lambda self, model: SlowLLM())
+    app.dependency_overrides[get_db] = lambda: FakeSession()
+    app.dependency_overrides[get_llm_user] = lambda: SimpleNamespace(id=1)
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_solve_past_deadline_returns_504(client):
+    response = client.post("/api/v1/solving/1", json={"knowledge_points": [1]}, headers={"X-Request-Timeout": "0.3"})
+    assert response.status_code == 504
+    assert response.json()["detail"] == "请求处理时间已用尽，LLM调用未完成"
+
+
+def test_image_process_past_deadline_returns_504(client, monkeypatch):
+    from app.services import image as image_service
+
+    async def save_uploaded_image(file_content, filename):
+        return "uploads/test.png"
+
+    processor = image_service.ImageProcessor(api_key="test")
+    processor.vlm = SlowLLM()
+    monkeypatch.setattr(image_service, "save_uploaded_image", save_uploaded_image)
+    monkeypatch.setattr(image_service, "get_image_processor", lambda: processor)
+
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+    response = client.post(
+        "/api/v1/image/process",
+        files={"file": ("question.png", png, "image/png")},
+        headers={"X-Request-Timeout": "0.3"}
+    )
+    assert response.status_code == 504
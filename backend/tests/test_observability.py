@@ -0,0 +1,69 @@
+"""
+Langfuse上报队列的测试
+
+get_langfuse 依赖 Langfuse SDK TaskManager 的内部属性收紧上报队列并统计丢弃的事件，
+升级SDK后内部结构变化时这里的测试会失败，需要重新验证 _bound_ingestion_queue。
+"""
+import queue
+from importlib import metadata
+
+import pytest
+from langfuse import Langfuse
+
+from app.llm_services.common import observability
+
+
+@pytest.fixture
+def langfuse_client():
+    """不连接服务端的客户端，上报线程已停止，事件留在队列中"""
+    client = Langfuse(public_key="pk-test", secret_key="sk-test", host="http://127.0.0.1:9", flush_interval=0.05)
+    task_manager = client.task_manager
+    for consumer in task_manager._ingestion_consumers:
+        consumer.pause()
+    for consumer in task_manager._ingestion_consumers:
+        consumer.join()
+    yield client
+    # 清空队列，避免退出时 shutdown 等待上报
+    while True:
+        try:
+            task_manager._ingestion_queue.get_nowait()
+        except queue.Empty:
+            break
+        task_manager._ingestion_queue.task_done()
+    client.shutdown()
+
+
+def test_installed_version_is_supported():
+    assert metadata.version("langfuse").split(".")[0] in observability._SUPPORTED_LANGFUSE_MAJOR_VERSIONS
+
+
+def test_bound_ingestion_queue_limits_queue_and_counts_drops(langfuse_client, monkeypatch):
+    monkeypatch.setitem(observability._stats, "dropped", 0)
+    assert observability._bound_ingestion_queue(langfuse_client, 2)
+
+    task_manager = langfuse_client.task_manager
+    assert task_manager._ingestion_queue.maxsize == 2
+    for i in range(5):
+        task_manager.add_task({"id": str(i), "type": "trace-create", "body": {}})
+    assert task_manager._ingestion_queue.qsize() == 2
+    assert observability._stats["dropped"] == 3
+
+
+def test_trace_events_go_through_bounded_queue(langfuse_client, monkeypatch):
+    monkeypatch.setitem(observability._stats, "dropped", 0)
+    observability._bound_ingestion_queue(langfuse_client, 1)
+
+    langfuse_client.trace(name="first")
+    langfuse_client.trace(name="second")
+    assert observability._stats["dropped"] == 1
+
+
+def test_unsupported_version_is_left_untouched(langfuse_client, monkeypatch):
+    monkeypatch.setattr(observability.metadata, "version", lambda name: "3.0.0")
+    task_manager = langfuse_client.task_manager
+    add_task = task_manager.add_task
+    maxsize = task_manager._ingestion_queue.maxsize
+
+    assert not observability._bound_ingestion_queue(langfuse_client, 2)
+    assert task_manager.add_task == add_task
+    assert task_manager._ingestion_queue.maxsize == maxsize
@@ -0,0 +1,142 @@
+"""
+查询预算pytest插件（app.core.query_budget）与慢查询日志的测试
+
+插件测试通过 pytester 在子会话中运行使用插件的测试文件：应用为挂载了 QueryTrackerMiddleware 的
+最小FastAPI应用，/items/{n} 在SQLite内存库上执行 n 条语句。
+"""
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.core import query_tracker
+from app.core.config import settings
+
+# 子会话中的测试文件
+APP_MODULE = """
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.core.query_tracker import QueryTrackerMiddleware, track_queries
+
+engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+track_queries(engine)
+
+app = FastAPI()
+app.add_middleware(QueryTrackerMiddleware)
+
+
+@app.get("/items/{n}")
+def items(n: int):
+    with engine.connect() as conn:
+        for _ in range(n):
+            conn.execute(text("SELECT 1"))
+    return {"n": n}
+
+
+client = TestClient(app)
+"""
+
+
+def _run(pytester, body: str, *args: str):
+    pytester.makepyfile(test_budget=APP_MODULE + body)
+    return pytester.runpytest_inprocess("-p", "app.core.query_budget", *args)
+
+
+def test_marker_budget_passes_within_budget(pytester):
+    result = _run(pytester, """
+@pytest.mark.query_budget(3)
+def test_within():
+    client.get("/items/3")
+""")
+    result.assert_outcomes(passed=1)
+
+
+def test_marker_budget_fails_over_budget(pytester):
+    result = _run(pytester, """
+@pytest.mark.query_budget(2)
+def test_over():
+    client.get("/items/5")
+""")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*GET /items/{n}: 5 条SQL，超出预算 2*SELECT 1*"])
+
+
+def test_marker_endpoint_budget_only_applies_to_that_endpoint(pytester):
+    result = _run(pytester, """
+@pytest.mark.query_budget({"GET /other": 1})
+def test_other_endpoint():
+    client.get("/items/5")
+""")
+    result.assert_outcomes(passed=1)
+
+
+def test_budget_file(pytester):
+    budget_file = pytester.path / "budgets.json"
+    budget_file.write_text(json.dumps({"GET /items/{n}": 4, "default": 100}), encoding="utf-8")
+    result = _run(pytester, """
+def test_within():
+    client.get("/items/4")
+
+def test_over():
+    client.get("/items/6")
+""", f"--query-budget={budget_file}")
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*GET /items/{n}: 6 条SQL，超出预算 4*"])
+
+
+def test_marker_overrides_budget_file(pytester):
+    budget_file = pytester.path / "budgets.json"
+    budget_file.write_text(json.dumps({"default": 1}), encoding="utf-8")
+    result = _run(pytester, """
+@pytest.mark.query_budget(10)
+def test_raised():
+    client.get("/items/5")
+""", f"--query-budget={budget_file}")
+    result.assert_outcomes(passed=1)
+
+
+def test_default_budget_option(pytester):
+    result = _run(pytester, """
+def test_over():
+    client.get("/items/3")
+""", "--query-budget-default=2")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*GET /items/{n}: 3 条SQL，超出预算 2*"])
+
+
+def test_no_budget_configured(pytester):
+    result = _run(pytester, """
+def test_unlimited():
+    client.get("/items/50")
+""")
+    result.assert_outcomes(passed=1)
+
+
+def test_slow_query_log_omits_parameters(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0)
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    query_tracker.track_queries(engine)
+
+    app = FastAPI()
+    app.add_middleware(query_tracker.QueryTrackerMiddleware)
+
+    @app.get("/users")
+    def users():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT :hashed_password"), {"hashed_password": "secret-hash"})
+        return {}
+
+    with caplog.at_level(logging.WARNING, logger=query_tracker.logger.name):
+        TestClient(app).get("/users")
+
+    slow = [record.getMessage() for record in caplog.records if "慢查询" in record.getMessage()]
+    assert slow and "[GET /users]" in slow[0]
+    assert "secret-hash" not in "\n".join(slow)
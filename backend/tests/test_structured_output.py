@@ -0,0 +1,113 @@
+"""
+结构化输出解析（app.llm_services.common.structured_output）的测试
+
+覆盖模型输出中LaTeX命令与JSON转义冲突的处理，以及JSON模式不被支持时的降级判断。
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.llm_services.common import structured_output
+from app.llm_services.common.structured_output import JSONRepairError, parse_json_output, repair_json
+
+
+@pytest.mark.parametrize("command", ["frac", "theta", "beta", "nabla", "rho", "times", "text"])
+def test_latex_command_in_valid_json_is_kept_literally(command):
+    result = repair_json('{"review": "\\%s{a}"}' % command)
+
+    assert result == {"review": "\\%s{a}" % command}
+
+
+def test_latex_commands_are_not_decoded_as_control_characters():
+    result = repair_json(r'{"review": "用 \frac{a}{b} 和 \theta, \beta"}')
+
+    assert result == {"review": "用 \\frac{a}{b} 和 \\theta, \\beta"}
+
+
+def test_real_escapes_followed_by_letters_are_decoded():
+    result = repair_json(r'{"solution": "第一步\nthen\tx = 1\nabla"}')
+
+    assert result == {"solution": "第一步\nthen\tx = 1\\nabla"}
+
+
+def test_escaped_backslash_before_command_is_left_alone():
+    result = repair_json(r'{"a": "\\frac", "b": "\\\theta"}')
+
+    assert result == {"a": "\\frac", "b": "\\\\theta"}
+
+
+def test_repair_keeps_real_escapes_and_latex_commands():
+    # \alpha 为非法转义，需走修复流程；同一字符串中的 \next 仍是换行加 ext
+    result = repair_json('```json\n{"a": "\\alpha \\next \\times", "ok": True,}\n```')
+
+    assert result == {"a": "\\alpha \next \\times", "ok": True}
+
+
+def test_repair_completes_truncated_output():
+    result = repair_json(r'{"review": "\frac{1}{2} 正确", "items": [1, 2')
+
+    assert result == {"review": "\\frac{1}{2} 正确", "items": [1, 2]}
+
+
+def test_repair_fails_without_json_structure():
+    with pytest.raises(JSONRepairError):
+        repair_json("无法给出结果")
+
+
+def test_parse_json_output_protects_latex_in_strict_parse():
+    result = parse_json_output(r'{"reason": "\rho = \frac{m}{V}"}', "test_strict")
+
+    assert result == {"reason": "\\rho = \\frac{m}{V}"}
+    assert structured_output.get_parse_stats()["test_strict"]["strict"] == 1
+
+
+def _bad_request(body):
+    response = httpx.Response(400, request=httpx.Request("POST", "https://api.example.com/v1/chat/completions"))
+    return openai.BadRequestError(body["message"], response=response, body=body)
+
+
+class FakeInvoke:
+    """依次返回预设结果的 ainvoke_llm 替身"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    async def __call__(self, llm, messages, name, **kwargs):
+        self.calls.append(kwargs)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    monkeypatch.setattr(structured_output, "LLM_STRUCTURED_OUTPUT", "json_object")
+    monkeypatch.setattr(structured_output, "_unsupported_formats", set())
+    return SimpleNamespace(model_name="test-model")
+
+
+def test_unsupported_response_format_downgrades(llm, monkeypatch):
+    error = _bad_request({"message": "response_format json_object is not supported", "param": "response_format"})
+    fake = FakeInvoke(error, SimpleNamespace(content='{"ok": true}'))
+    monkeypatch.setattr(structured_output, "ainvoke_llm", fake)
+
+    result, _ = asyncio.run(structured_output.ainvoke_json(llm, "prompt", "test_downgrade", {}))
+
+    assert result == {"ok": True}
+    assert "response_format" in fake.calls[0] and fake.calls[1] == {}
+    assert ("test-model", "json_object") in structured_output._unsupported_formats
+
+
+def test_other_bad_request_is_raised_without_downgrade(llm, monkeypatch):
+    error = _bad_request({"message": "maximum context length exceeded", "code": "context_length_exceeded"})
+    monkeypatch.setattr(structured_output, "ainvoke_llm", FakeInvoke(error))
+
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(structured_output.ainvoke_json(llm, "prompt", "test_downgrade", {}))
+
+    assert not structured_output._unsupported_formats